@@ -0,0 +1,294 @@
+"""
+Benchmarks of rcdata
+
+    python benchmarks/bench.py                       run every benchmark
+    python benchmarks/bench.py --quick               small sizes, for a smoke run
+    python benchmarks/bench.py --only io             benchmarks whose name starts with io
+    python benchmarks/bench.py --save base.json      store the results as a baseline
+    python benchmarks/bench.py --compare base.json   compare the median with a baseline
+    python benchmarks/bench.py --quick --compare     compare with benchmarks/baseline.json
+
+benchmarks/baseline.json is the committed baseline, a --quick run: refresh it with
+`--quick --save benchmarks/baseline.json` on the reference machine when a change
+moves the numbers on purpose. Timings only compare on the same machine.
+
+Every benchmark reports its latency percentiles, throughput (operations or bytes per
+second) and the peak memory traced during one more run.
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from generators import make_data_class, make_doc, make_resources, make_values
+
+from rcdata import ResourceIndex
+from rcdata.compress import get_compressor, list_compressors
+from rcdata.io import load, sync
+
+KB = 1024
+MB = 1024 * KB
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# a benchmark: name, function to time, bytes handled by one call (0 to count calls)
+Case = Tuple[str, Callable[[], object], int]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def measure(func: Callable[[], object], size: int, min_time: float, max_runs: int) -> dict:
+    """
+    Time `func` until `min_time` seconds or `max_runs` runs, then trace its memory once.
+    """
+    func()  # warm up caches and lazy imports
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < max_runs and (time.perf_counter() - start < min_time or len(timings) < 3):
+        gc.collect()
+        begin = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - begin)
+    timings.sort()
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    mean = sum(timings) / len(timings)
+    result = {
+        "runs": len(timings),
+        "mean": mean,
+        "p50": percentile(timings, 50),
+        "p90": percentile(timings, 90),
+        "p99": percentile(timings, 99),
+        "peak_bytes": peak,
+    }
+    if size:
+        result["bytes_per_s"] = size / mean
+    else:
+        result["ops_per_s"] = 1 / mean
+    return result
+
+
+def base_cases(quick: bool) -> Iterator[Case]:
+    for fields in [10, 100] if quick else [10, 100, 1000]:
+        cls = make_data_class(fields)
+        values = make_values(fields)
+        yield f"base/init/{fields}_fields", lambda cls=cls, values=values: cls(**values), 0
+
+    # every priority sets a third of the fields, the file and init override the env
+    fields = 100 if quick else 1000
+    cls = make_data_class(fields)
+    values = make_values(fields, seed=1)
+    names = list(values)
+    env = {name: str(values[name]) for name in names[1::4]}
+    from_file = {name: values[name] for name in names[: fields // 3]}
+    from_init = {name: values[name] for name in names[fields // 3 : 2 * fields // 3]}
+    tmp = tempfile.mkdtemp(prefix="rcdata-bench-")
+    path = os.path.join(tmp, "merge.data")
+    sync({"data": from_file}, path=path)
+    old_env = dict(os.environ)
+    os.environ.update(env)
+    try:
+        yield f"base/merge/{fields}_fields", lambda: cls(path=path, **from_init), 0
+    finally:
+        os.environ.clear()
+        os.environ.update(old_env)
+        shutil.rmtree(tmp)
+
+
+def io_cases(quick: bool, max_size: int) -> Iterator[Case]:
+    sizes = [KB, 64 * KB, MB] if quick else [KB, 64 * KB, MB, 16 * MB, 256 * MB]
+    tmp = tempfile.mkdtemp(prefix="rcdata-bench-")
+    try:
+        for size in sizes:
+            if size > max_size:
+                continue
+            doc = make_doc(size)
+            raw = len(json.dumps(doc))
+            for compact in [False, True]:
+                kind = "zstd" if compact else "plain"
+                path = os.path.join(tmp, f"{kind}-{size}")
+                label = _size_label(size)
+                yield (
+                    f"io/sync/{kind}/{label}",
+                    lambda doc=doc, path=path, compact=compact: sync(
+                        doc, path=path, compact=compact
+                    ),
+                    raw,
+                )
+                # the load benchmark must not depend on the sync one running
+                sync(doc, path=path, compact=compact)
+                yield (
+                    f"io/load/{kind}/{label}",
+                    lambda path=path, compact=compact: load(path, compact=compact),
+                    raw,
+                )
+                # the warm up run writes the sidecar, the measured runs read it
+                yield (
+                    f"io/load_sidecar/{kind}/{label}",
+                    lambda path=path, compact=compact: load(path, compact=compact, sidecar=True),
+                    raw,
+                )
+            del doc
+    finally:
+        shutil.rmtree(tmp)
+
+
+def compress_cases(quick: bool) -> Iterator[Case]:
+    size = 64 * KB if quick else 4 * MB
+    payload = json.dumps(make_doc(size)).encode("utf-8")
+    label = _size_label(size)
+    for name in list_compressors():
+        compressor = get_compressor(name)
+        level = compressor.default_level
+        packed = compressor.compress(payload, level, 0, None)
+        yield (
+            f"compress/pack/{name}/{label}",
+            lambda c=compressor, level=level: c.compress(payload, level, 0, None),
+            len(payload),
+        )
+        yield (
+            f"compress/unpack/{name}/{label}",
+            lambda c=compressor, packed=packed: c.decompress(packed, None),
+            len(payload),
+        )
+
+
+def index_cases(quick: bool) -> Iterator[Case]:
+    for count in [1000] if quick else [10000, 100000]:
+        tmp = tempfile.mkdtemp(prefix="rcdata-bench-")
+        try:
+            index_path, names = make_resources(os.path.join(tmp, "res"), count)
+            rng = random.Random(0)
+            sample = [rng.choice(names) for _ in range(1000)]
+
+            def lookups(index_path=index_path, sample=sample) -> None:
+                index = ResourceIndex(index_path, lazy=True, cache_size=256)
+                for name in sample:
+                    index.get_res(name)
+
+            yield f"index/open_lazy/{count}", lambda: ResourceIndex(index_path, lazy=True), 0
+            yield f"index/get_res_1000/{count}", lookups, 0
+            yield f"index/load_all/{count}", lambda: ResourceIndex(index_path), 0
+            yield (
+                f"index/load_all_threads/{count}",
+                lambda: ResourceIndex(index_path, workers=4),
+                0,
+            )
+        finally:
+            shutil.rmtree(tmp)
+
+
+def _size_label(size: int) -> str:
+    return f"{size // MB}MB" if size >= MB else f"{size // KB}KB"
+
+
+def run(args: argparse.Namespace) -> Dict[str, dict]:
+    groups = {
+        "base": lambda: base_cases(args.quick),
+        "io": lambda: io_cases(args.quick, args.max_size * MB),
+        "compress": lambda: compress_cases(args.quick),
+        "index": lambda: index_cases(args.quick),
+    }
+    results = {}
+    for group, cases in groups.items():
+        if args.only and not any(
+            group.startswith(o) or o.startswith(group + "/") for o in args.only
+        ):
+            continue
+        for name, func, size in cases():
+            if args.only and not any(name.startswith(o) for o in args.only):
+                continue
+            results[name] = measure(func, size, args.min_time, args.max_runs)
+            print(_format(name, results[name]), flush=True)
+    return results
+
+
+def _format(name: str, result: dict) -> str:
+    if "bytes_per_s" in result:
+        rate = f"{result['bytes_per_s'] / MB:10.1f} MB/s"
+    else:
+        rate = f"{result['ops_per_s']:10.1f} op/s"
+    return (
+        f"{name:40} {rate}  p50 {result['p50'] * 1e3:9.3f} ms  "
+        f"p90 {result['p90'] * 1e3:9.3f} ms  p99 {result['p99'] * 1e3:9.3f} ms  "
+        f"peak {result['peak_bytes'] / MB:8.2f} MB"
+    )
+
+
+def compare(results: Dict[str, dict], baseline: dict, threshold: float) -> List[str]:
+    """
+    Returns:
+        List[str]: the benchmarks whose median is slower than the baseline by more
+            than `threshold` (0.1 for 10%).
+    """
+    regressions = []
+    print(f"\ncompared with {baseline['meta']['date']} ({baseline['meta']['python']}):")
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        ratio = result["p50"] / old["p50"]
+        memory = result["peak_bytes"] / max(1, old["peak_bytes"])
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  SLOWER"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{name:40} time x{ratio:5.2f}  memory x{memory:5.2f}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python benchmarks/bench.py")
+    parser.add_argument("--quick", action="store_true", help="small sizes and counts")
+    parser.add_argument("--only", nargs="*", default=None, help="benchmark name prefixes")
+    parser.add_argument("--max-size", type=int, default=256, help="biggest io payload, in MB")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds per benchmark")
+    parser.add_argument("--max-runs", type=int, default=100, help="runs per benchmark")
+    parser.add_argument("--save", default=None, help="write the results to this json file")
+    parser.add_argument(
+        "--compare",
+        nargs="?",
+        const=BASELINE,
+        default=None,
+        help="baseline json file to compare with, benchmarks/baseline.json if no file is given",
+    )
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown to report")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    if args.save:
+        meta = {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+        }
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({"meta": meta, "results": results}, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Synthetic data for the benchmarks, the same for a given seed
+"""
+
+import os
+import json
+import random
+import string
+from typing import Dict, List, Tuple, Type
+
+from rcdata import BaseData, Field
+
+
+def make_data_class(fields: int) -> Type[BaseData]:
+    """A `BaseData` subclass with `fields` fields, cycling through int, str, list and dict."""
+    kinds = [(0, int), ("", str), ([], list), ({}, dict)]
+    attrs = {}
+    for i in range(fields):
+        default, type_ = kinds[i % len(kinds)]
+        attrs[f"f{i}"] = Field(default, type_)
+    return type(f"Data{fields}", (BaseData,), attrs)
+
+
+def make_values(fields: int, seed: int = 0) -> Dict[str, object]:
+    """Values for every field of `make_data_class(fields)`."""
+    rng = random.Random(seed)
+    values = {}
+    for i in range(fields):
+        kind = i % 4
+        if kind == 0:
+            values[f"f{i}"] = rng.randrange(1 << 30)
+        elif kind == 1:
+            values[f"f{i}"] = _word(rng, 12)
+        elif kind == 2:
+            values[f"f{i}"] = [rng.randrange(1000) for _ in range(8)]
+        else:
+            values[f"f{i}"] = {_word(rng, 6): rng.random() for _ in range(4)}
+    return values
+
+
+def _word(rng: random.Random, size: int) -> str:
+    return "".join(rng.choice(string.ascii_letters) for _ in range(size))
+
+
+def _record(rng: random.Random, i: int) -> dict:
+    return {
+        "id": i,
+        "name": _word(rng, 10),
+        "score": rng.random(),
+        "tags": [_word(rng, 5) for _ in range(3)],
+        "meta": {"level": rng.randrange(100), "active": rng.random() < 0.5},
+    }
+
+
+def make_doc(size: int, seed: int = 0) -> dict:
+    """
+    A data document of about `size` bytes of json.
+
+    Records are generated once and repeated with new ids, so big documents are
+    quick to make and still compress like real data.
+    """
+    rng = random.Random(seed)
+    sample = [_record(rng, i) for i in range(256)]
+    record_size = len(json.dumps(sample)) / len(sample)
+    count = max(1, int(size / record_size))
+    items = []
+    for i in range(count):
+        record = dict(sample[i % len(sample)])
+        record["id"] = i
+        items.append(record)
+    return {"version": 0, "data": {"items": items}}
+
+
+def make_resources(root: str, count: int, seed: int = 0) -> Tuple[str, List[str]]:
+    """
+    Write `count` small resources under `root` and an index listing them.
+
+    Returns:
+        Tuple[str, List[str]]: the index path and the resource names.
+    """
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    names = []
+    for i in range(count):
+        # spread the files over directories, as big resource trees are
+        name = f"{i % 256:02x}/{i}.resource"
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"data": {"name": _word(rng, 8), "record": _record(rng, i)}}, file)
+        names.append(name)
+    index = root + ".index"
+    with open(index, "w", encoding="utf-8") as file:
+        json.dump({"data": {"file_list": names}}, file)
+    return index, names
@@ -0,0 +1,47 @@
+"""
+asyncio support, running the blocking file and zstd work on a shared thread pool
+"""
+
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Callable, Iterable, List, TypeVar
+
+T = TypeVar("T")
+
+# the most blocking calls running at once, for every event loop
+MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+@lru_cache(1)
+def get_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="rcdata-aio")
+
+
+async def run(func: Callable[..., T], /, *args: Any, **kw: Any) -> T:
+    """Run a blocking call on the shared pool, without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kw))
+
+
+async def gather(calls: Iterable[Callable[[], T]], limit: int) -> List[T]:
+    """
+    Run blocking calls on the shared pool, at most `limit` at once.
+
+    Args:
+        calls (Iterable[Callable[[], T]]): calls without arguments.
+        limit (int): max number of calls running at once.
+
+    Returns:
+        List[T]: the results, in the order of `calls`.
+    """
+    if limit < 1:
+        raise ValueError("limit must be greater than 0")
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(call: Callable[[], T]) -> T:
+        async with semaphore:
+            return await run(call)
+
+    return await asyncio.gather(*(bounded(call) for call in calls))
@@ -3,14 +3,27 @@ Common base class for all data
 """
 
 import os
+import copy
+import json
+import time
+import typing
+import threading
 
-from typing import Any, Tuple, Union, List, overload
+from typing import Any, Callable, Dict, Set, Tuple, Union, List, overload
 
-from .io import load, sync
+from .blob import BINARY_TYPES
+from .codec import get_codec
+from .compress import resolve
+from .digest import get_hash
+from .io import KEEP, load, loads, sync, sync_bytes
+from .writer import write_behind
+from .aio import run
+from . import instrument
 
 
 class _MISSING_TYPE:
-    pass
+    def __repr__(self) -> str:
+        return "MISSING"
 
 
 MISSING = _MISSING_TYPE()
@@ -59,11 +72,17 @@ class Version(object):
 class _Field:
     """
     A class representing a field.
+
+    The field is a descriptor holding only metadata, the values are stored per instance
+    in the `_values` list of the object, at the position of the field in the class schema.
+
     Attributes:
         default (Any): The default value of the field.
         type (Any): The type of the field.
-        data (Any): The current data of the field.
         name (str): The name of the field.
+        index (int): The position of the value in `_values`, -1 until the class is created.
+        container (bool): The value may be changed in place (a list, dict, ...), so reading
+            it marks it as possibly changed, see `BaseData._write_data`.
     Methods:
         __init__(self, default: Any = MISSING, default_type: Any = MISSING) -> None:
             Initializes a new instance of the _Field class.
@@ -73,13 +92,15 @@ class _Field:
             Returns a string representation of the _Field object.
         set_name(self, name: str) -> None:
             Sets the name of the field.
-        set_data(self, data: Any) -> None:
-            Sets the data of the field.
+        __get__(self, obj, owner=None) -> Any:
+            Returns the value of the field on obj, or the field itself on the class.
+        __set__(self, obj, value: Any) -> None:
+            Sets the value of the field on obj.
         __set_name__(self, owner, name):
             Sets the name of the field using the __set_name__ method of the default value.
     """
 
-    __slots__ = ("default", "type", "data", "name")
+    __slots__ = ("default", "type", "name", "index", "container")
 
     _FIELD = "Field"
 
@@ -102,18 +123,16 @@ class _Field:
             else:
                 self.type = default_type
             self.default = default
-        self.data = default
+        self.name = None
+        self.index = -1
+        self.container = True
 
     # region check_type
     @overload
-    def check_type(self) -> bool: ...
-    @overload
     def check_type(self, value: Any) -> bool: ...
     @overload
     def check_type(self, value: Any, type_: "type") -> bool: ...
-    def check_type(self, value: Any = MISSING, type_: "type" = MISSING) -> bool:
-        if value is MISSING:
-            return isinstance(self.data, self.type)
+    def check_type(self, value: Any, type_: "type" = MISSING) -> bool:
         if type_ is MISSING:
             return isinstance(value, self.type)
         return isinstance(value, type_)
@@ -141,23 +160,26 @@ class _Field:
         """
         self.name = name
 
-    def set_data(self, data: Any) -> None:
-        """
-        Set the data for the object.
+    def __get__(self, obj, owner=None) -> Any:
+        if obj is None:
+            return self
+        if self.container:
+            # its json as loaded is only taken if the object is written, see `_write_fields`
+            obj._touched.add(self.index)
+        return obj._values[self.index]
 
-        Parameters:
-            data (Any): The data to be set.
+    def __set__(self, obj, value: Any) -> None:
+        """
+        Set the value of the field on obj.
 
         Raises:
-            ValueError: If the data does not match the type.
-
-        Returns:
-            None
+            ValueError: If the value does not match the type.
         """
-        if self.check_type(data):
-            self.data = data
-        else:
+        if not isinstance(value, obj._schema.types[self.index]):
             raise ValueError("data does not match the type")
+        with obj._dirty_lock:
+            obj._values[self.index] = value
+            obj._dirty.add(self.index)
 
     def __set_name__(self, owner, name):
         func = getattr(type(self.default), "__set_name__", None)
@@ -169,6 +191,9 @@ def Field(default: Any = MISSING, default_type: Any = MISSING) -> Any:
     """
     Create a field with optional default value and default type.
 
+    Fields of type bytes are binary: their values are written raw after the payload
+    and loaded as read-only memoryviews over the file, see `blob`.
+
     Args:
         default (Any, optional): The default value for the field. Defaults to MISSING.
         default_type (Any, optional): The default type for the field. Defaults to MISSING.
@@ -179,6 +204,100 @@ def Field(default: Any = MISSING, default_type: Any = MISSING) -> Any:
     return _Field(default, default_type)
 
 
+_IMMUTABLE = (bool, int, float, complex, str, bytes, tuple, frozenset, type(None))
+
+
+def _types(type_: Any) -> tuple:
+    return type_ if isinstance(type_, tuple) else (type_,)
+
+
+def _is_container(type_: Any) -> bool:
+    """Whether values of a runtime type may be changed in place."""
+    return not all(isinstance(t, type) and issubclass(t, _IMMUTABLE) for t in _types(type_))
+
+
+def _runtime_type(type_: Any) -> Any:
+    """The class `isinstance` can check, for generic aliases such as List[int] it is the origin."""
+    try:
+        isinstance(None, type_)
+        return type_
+    except TypeError:
+        pass
+    origin = typing.get_origin(type_)
+    if origin is Union:
+        return tuple(_runtime_type(arg) for arg in typing.get_args(type_))
+    if origin is not None:
+        return origin
+    return object
+
+
+def _binary_type(type_: Any) -> Any:
+    """Binary fields also take the memoryviews they are loaded as, and bytearrays."""
+    if type_ is bytes:
+        return BINARY_TYPES
+    if isinstance(type_, tuple) and bytes in type_:
+        return type_ + tuple(t for t in BINARY_TYPES if t not in type_)
+    return type_
+
+
+def _fragment(value: Any) -> Union[str, None]:
+    """The json of a value, None if it has none, and an empty string for a missing value."""
+    if value is MISSING:
+        return ""
+    try:
+        return json.dumps(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _Schema:
+    """
+    The fields of a `BaseData` class, compiled once when the class is created.
+
+    Attributes:
+        fields (Dict[str, _Field]): the fields, including the ones inherited from base classes.
+        names (Tuple[str, ...]): names of the fields.
+        types (Tuple[Any, ...]): the classes the values of the fields are checked against.
+        defaults (Tuple[Any, ...]): defaults of the fields.
+        mutable (Tuple[int, ...]): positions of the defaults that are copied for every object.
+    """
+
+    __slots__ = ("fields", "names", "types", "defaults", "mutable")
+
+    def __init__(self, cls: type) -> None:
+        fields: Dict[str, _Field] = dict()
+        # base classes first, so subclasses override inherited fields
+        for klass in reversed(cls.__mro__):
+            for name, field in vars(klass).items():
+                if getattr(field, "_FIELD", None) is not None:
+                    fields[name] = field
+        for index, (name, field) in enumerate(fields.items()):
+            if field.index not in (-1, index):
+                # the field sits at another position in a base class, give this class its own
+                field = copy.copy(field)
+                setattr(cls, name, field)
+                fields[name] = field
+            field.set_name(name)
+            field.index = index
+        self.fields = fields
+        self.names = tuple(fields)
+        self.types = tuple(_binary_type(_runtime_type(field.type)) for field in fields.values())
+        for field, type_ in zip(fields.values(), self.types):
+            # binary values are replaced, not changed in place
+            field.container = _is_container(type_) and memoryview not in _types(type_)
+        self.defaults = tuple(field.default for field in fields.values())
+        self.mutable = tuple(
+            i for i, default in enumerate(self.defaults) if isinstance(default, (list, dict, set))
+        )
+
+    def new_values(self) -> List[Any]:
+        """The values of a new object, mutable defaults are copied so objects never share them."""
+        values = list(self.defaults)
+        for i in self.mutable:
+            values[i] = copy.deepcopy(values[i])
+        return values
+
+
 class BaseData:
     """
         Attributes:
@@ -193,18 +312,51 @@ class BaseData:
         data processing
             compact (bool, optional): compact the data. Defaults to False.
                 if compact is True, will find compact_type in the kw, and use the compact_type to compact the data.
-            compact_type (str, optional): compact type. Defaults to "zstd".
+            compact_type (str, optional): compact type, see `compress.list_compressors`, or
+                "auto" to choose it from the size of the data. Defaults to "zstd".
+            compact_level (int, optional): compression level. Defaults to the default
+                level of the compact type, 3 for zstd. "auto" takes the level of its
+                profile and raises ValueError if one is given.
+            compact_threads (int, optional): zstd compression threads for large data, -1 for
+                one per core. Defaults to 0.
+            compact_dict (bytes, optional): zstd dictionary, see `io.train_dict`. Defaults to None.
+            stream (bool, optional): encode and compress the data chunk by chunk when writing,
+                for large data. Defaults to False.
+            cache (bool, optional): read the file through the process-wide parse cache,
+                see `cache.parse_cache`. Defaults to False.
+            sidecar (bool, optional): load the decoded data from a sidecar next to the file,
+                written again when the file changes, so later processes skip decoding it,
+                see `sidecar`. Defaults to False.
+            selective (bool, optional): decode only the declared fields of the file, the
+                other keys of large files are skipped without being built, see
+                `selective`. Defaults to False.
+            profile (bool, optional): record the timings and sizes of every load and save
+                in `_load_stats` and `_save_stats`, which are also recorded while an
+                `instrument` hook is registered. Defaults to False.
+            write_delay (float, optional): queue writes on the background writer, which
+                writes the file once it stopped changing for this many seconds, see
+                `writer.WriteBehind`. Defaults to None, writing on the calling thread.
             encrypt (bool, optional): encrypt the data. Defaults to False.
                 if encrypt is True, will find encrypt_type in the kw, and use the encrypt_type to encrypt the data.
             encrypt_type (str, optional): encrypt type. Defaults to "edrsa".
-            key (str, optional): key for encrypt. Defaults to None.
+            key (Union[Signer, bytes, str], optional): with encrypt, the ed25519 key of the
+                file, see `sign.get_signer`: a private key signs it when written, a public or
+                private key checks its signature when read. Defaults to None.
             data_type (bytes, optional): data type. Defaults to b"\x00\x00\x00".
-            hash_type (bool, optional): hash the data. Defaults to False.
-                if hash is True, will find hash_type in the kw, and use the hash_type to hash the data.
-            hash_type (str, optional): hash type. Defaults to "sha256".
+            hash_type (Union[bool, str], optional): hash the data. Defaults to False.
+                True for "sha256", or "sha384" / "sha512". The file gets a micro code and
+                per-block digests, checked when it is read, see `digest`. Without it, a
+                file that is already hashed keeps its hash when it is written.
             prime (bytes, optional): prime number. Defaults to 0b111.
                 only used by encrypted data.First byte is for creator, second byte is for encrypt, third byte is for any.
                 if 111 the encrypt will not use!
+            codec (str, optional): serialization codec, "json", "orjson", "msgpack" or "marshal".
+                Defaults to "json". falls back to json if the backend is not installed,
+                the codec is recorded in the micro code, so files are read back with it.
+            micro_code (bool, optional): write a micro code header before the data. Defaults to False.
+                files with a micro code are always read according to it.
+            buffer (bytes-like, optional): encoded file data, read instead of `path`. Defaults to None.
+                the buffer is only used while loading and is not kept by the object.
     Methods:
         _dump_config(self) -> None: Dump the configuration settings.
         _load_data(self) -> None: Load the data using the priority functions.
@@ -214,19 +366,20 @@ class BaseData:
         _load_file(self): Load the data from a file.
         _load_default(self): Placeholder method.
         __dir__(self) -> List[str]: Return a list of attribute names.
-        _write_data(self) -> dict: Write the data to a dictionary.
+        _write_data(self) -> bool: Write the data to the file if a field changed.
+        flush(self) -> bool: Do the queued write of the object now.
+        aload(cls, *args, **kw) -> BaseData: Make an object without blocking the event loop.
+        asave(self, force: bool = False) -> bool: Write the data without blocking the event loop.
     ...
     """
 
-    def __new__(cls) -> "BaseData":
-        fields = dict()
-        for _name, _field in cls.__dict__.items():
-            if getattr(_field, "_FIELD", None) is not None:
-                _field.set_name(_name)
-                fields[_name] = _field
-        obj = super().__new__(cls)
-        obj._fields = fields
-        return obj
+    _schema: _Schema
+    _fields: Dict[str, _Field]
+
+    def __init_subclass__(cls, **kw) -> None:
+        super().__init_subclass__(**kw)
+        cls._schema = _Schema(cls)
+        cls._fields = cls._schema.fields
 
     def __init__(
         self,
@@ -239,14 +392,23 @@ class BaseData:
         compact: bool = False,
         encrypt: bool = False,
         data_type: bytes = b"\x00\x00\x00",
-        hash_type: bool = False,
+        hash_type: Union[bool, str] = False,
+        codec: str = "json",
+        micro_code: bool = False,
+        buffer=None,
         **kw,
     ) -> None:
         self._path = path
+        self._buffer = buffer
         self._compact = compact
         self._encrypt = encrypt
         self._data_type = data_type
-        self._hash = hash_type
+        self._hash = bool(hash_type)
+        if self._hash:
+            self._hash_type = "sha256" if hash_type is True else hash_type
+            get_hash(self._hash_type)
+        self._micro_code = micro_code
+        self._codec = get_codec(codec).name
         self._p = {
             init_p: self._load_init,
             env_p: self._load_env,
@@ -254,8 +416,28 @@ class BaseData:
             default_p: self._load_default,
         }
         self._kw = kw
+        self._subscribers: List[Callable] = []
+        self._reload_lock = threading.Lock()
+        # guards `_dirty` between setters and writes, and serializes the writes
+        self._dirty_lock = threading.Lock()
+        self._save_lock = threading.Lock()
         self._dump_config()
         self._load_data()
+        self._buffer = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # locks, subscribers and watchers belong to the process that made them
+        for name in ("_reload_lock", "_dirty_lock", "_save_lock", "_subscribers", "_watcher"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._subscribers = []
+        self._reload_lock = threading.Lock()
+        self._dirty_lock = threading.Lock()
+        self._save_lock = threading.Lock()
 
     def _dump_config(self) -> None:
         """
@@ -270,9 +452,23 @@ class BaseData:
             "encrypt": self._encrypt,
             "type": str(self._data_type),
             "hash": self._hash,
+            "codec": self._codec,
         }
+        self._stream = self._kw.pop("stream", False)
+        self._cache = self._kw.pop("cache", False)
+        self._sidecar = self._kw.pop("sidecar", False)
+        self._selective = self._kw.pop("selective", False)
+        self._write_delay = self._kw.pop("write_delay", None)
+        self._profile = self._kw.pop("profile", False)
+        self._save_stats: Union[Dict[str, float], None] = None
+        self._stats: Union[Dict[str, float], None] = None
         if self._compact:
             self._compact_type = self._kw.pop("compact_type", "zstd")
+            self._compact_level = self._kw.pop("compact_level", None)
+            self._compact_threads = self._kw.pop("compact_threads", 0)
+            self._compact_dict = self._kw.pop("compact_dict", None)
+            # fail on a bad type or level now rather than on the first write
+            resolve(self._compact_type, self._compact_level, 0, 0, self._compact_dict)
             self._mate["compact_type"] = self._compact_type
         if self._encrypt:
             self._encrypt_type = self._kw.pop("encrypt_type", "edrsa")
@@ -281,7 +477,6 @@ class BaseData:
             self._mate["encrypt_type"] = self._encrypt_type
             self._mate["prime"] = self._prime
         if self._hash:
-            self._hash_type = self._kw.pop("hash_type", "sha256")
             self._mate["hash_type"] = self._hash_type
 
     def _load_data(self) -> None:
@@ -290,19 +485,91 @@ class BaseData:
 
         This method is responsible for loading data into the object. It performs the following steps:
         1. Removes the last element from the list '_p'.
-        2. Iterates over the keys in '_p' in sorted order and calls the corresponding value as a function.
-        3. Sets the attributes of the object based on the data stored in the fields.
+        2. Resets the values of the object to the defaults of the fields.
+        3. Iterates over the keys in '_p' in sorted order and calls the corresponding value as a function.
+
+        Values are kept in the `_values` list of the instance rather than on the shared fields,
+        so several objects of one class can be loaded at the same time.
+        What every priority loaded is kept in `_sources`, so `reload` can merge them again.
 
         Returns:
             None
         """
         self._p.pop(-1, None)
+        self._values = self._schema.new_values()
+        self._sources: Dict[int, Dict[int, Any]] = dict()
+        self._dirty: Set[int] = set()
+        self._touched: Set[int] = set()
+        self._fragments: List[Union[str, None]] = [None] * len(self._values)
+        # timings are only taken if someone reads them, see `instrument`
+        stats = dict() if self._profile or instrument.enabled() else None
+        self._stats = self._load_stats = stats
+        if stats is None:
+            for p in sorted(self._p.keys()):
+                loaded = self._p[p]()
+                if loaded:
+                    self._sources[p] = loaded
+        else:
+            self._load_data_timed(stats)
+        self._reset_dirty()
+        if stats is not None:
+            self._stats = None
+            instrument.emit("load", self, stats)
+
+    def _load_data_timed(self, stats: Dict[str, float]) -> None:
+        """The loop of `_load_data`, timing every priority."""
+        start = time.perf_counter()
         for p in sorted(self._p.keys()):
-            self._p[p]()
-        for field in self._fields.values():
-            setattr(self, field.name, field.data)
+            func = self._p[p]
+            begin = time.perf_counter()
+            loaded = func()
+            # _load_env -> env
+            stats[func.__name__[len("_load_") :]] = time.perf_counter() - begin
+            if loaded:
+                self._sources[p] = loaded
+        stats["total"] = time.perf_counter() - start
+
+    def _file_priority(self) -> Union[int, None]:
+        return next((p for p, func in self._p.items() if func == self._load_file), None)
+
+    def _reset_dirty(self) -> None:
+        """
+        Mark the fields whose value is not the one in the file as dirty.
 
-    def _load_fields(self, source: dict) -> None:
+        `_dirty` holds the fields set since the last load or save, `_touched` the
+        container fields read since the last load, which may be changed in place at
+        any time through a reference held by the caller, so they stay touched.
+        """
+        file_p = self._file_priority()
+        in_file = self._sources.get(file_p, {}) if file_p is not None else {}
+        self._dirty = {
+            index
+            for index, value in enumerate(self._values)
+            if index not in in_file or in_file[index] is not value
+        }
+        self._touched = set()
+        # json of the values as last written, None if unknown, fields without a value
+        # are never written
+        self._fragments = [
+            "" if value is MISSING else None for value in self._values
+        ]
+
+    def _read_fields(self, source: dict) -> Dict[int, Any]:
+        """
+        Read the values of the fields from the given source dictionary, without setting them.
+
+        Returns:
+            Dict[int, Any]: the values matching the type of their field, by field position.
+        """
+        loaded = dict()
+        for index, (name, type_) in enumerate(zip(self._schema.names, self._schema.types)):
+            if name in source:
+                value = source[name]
+                if isinstance(value, type_):
+                    loaded[index] = value
+        return loaded
+
+    def _load_fields(self, source: dict) -> Dict[int, Any]:
         """
         Load the fields of the object from the given source dictionary.
 
@@ -310,14 +577,18 @@ class BaseData:
             source (dict): The dictionary containing the field data.
 
         Returns:
-            None
+            Dict[int, Any]: the loaded values, by field position.
         """
-        for field in self._fields.values():
-            try:
-                if field.name in source:
-                    field.set_data(source[field.name])
-            except:
-                ...
+        stats = self._stats
+        if stats is not None:
+            start = time.perf_counter()
+        loaded = self._read_fields(source)
+        values = self._values
+        for index, value in loaded.items():
+            values[index] = value
+        if stats is not None:
+            stats["fields"] = stats.get("fields", 0) + time.perf_counter() - start
+        return loaded
 
     def _load_init(self):
         """
@@ -327,7 +598,7 @@ class BaseData:
         It calls the `_load_fields` method with the keyword arguments provided
         during initialization.
         """
-        self._load_fields(self._kw)
+        return self._load_fields(self._kw)
 
     def _load_env(self):
         """
@@ -339,21 +610,78 @@ class BaseData:
         Parameters:
             self (object): The object instance.
         """
-        self._load_fields(os.environ)
+        return self._load_fields(os.environ)
 
     def _load_file(self):
         """
         Loads data from a file specified by the `_path` attribute.
         If `_path` is not None, it loads the data using the `load` function,
         and then calls the `_load_fields` method to populate the fields with the loaded data.
+        If `_buffer` is set, the data is decoded from it instead of the file.
         """
-        if self._path is not None:
-            try:
-                data = load(self._path, self._compact, self._encrypt).get("data", {})
-            except FileNotFoundError:
-                sync(self._mate, self._path, self._compact, self._encrypt)
-                data = {}
-            self._load_fields(data)
+        if self._buffer is not None or self._path is not None:
+            return self._load_fields(self._read_file())
+
+    def _read_file(self, create: bool = True) -> dict:
+        """
+        Read the data of the file (or `_buffer`), a missing file is created if `create`.
+
+        Raises:
+            FileNotFoundError: If the file is missing and `create` is False.
+        """
+        if self._buffer is not None:
+            data = loads(
+                self._buffer,
+                compact=self._compact,
+                dict_data=self._get_dict(),
+                codec=self._codec,
+                encrypt=self._encrypt,
+                key=getattr(self, "_key", None),
+                stats=self._stats,
+                keys=self._schema.names if self._selective else None,
+            )
+            return data.get("data", {})
+        try:
+            return load(
+                self._path,
+                compact=self._compact,
+                encrypt=self._encrypt,
+                dict_data=self._get_dict(),
+                codec=self._codec,
+                cache=self._cache,
+                sidecar=self._sidecar,
+                key=getattr(self, "_key", None),
+                stats=self._stats,
+                keys=self._schema.names if self._selective else None,
+            ).get("data", {})
+        except FileNotFoundError:
+            if not create:
+                raise
+            self._sync(self._mate)
+            return {}
+
+    def _read_back(self, names: List[str]) -> Dict[str, Any]:
+        """
+        Decode the values of some fields from the file (or `_buffer`) again, bypassing
+        the caches, whose values may be the objects handed out by the fields.
+
+        Returns:
+            Dict[str, Any]: the values found, nothing if the file is gone.
+        """
+        options = dict(
+            compact=self._compact,
+            encrypt=self._encrypt,
+            dict_data=self._get_dict(),
+            codec=self._codec,
+            key=getattr(self, "_key", None),
+            keys=names,
+        )
+        try:
+            if self._buffer is not None:
+                return loads(self._buffer, **options).get("data", {})
+            return load(self._path, **options).get("data", {})
+        except FileNotFoundError:
+            return {}
 
     def _load_default(self):
         """Useless, used only as a placeholder"""
@@ -368,18 +696,240 @@ class BaseData:
         """
         return list(self._fields.keys())
 
-    def _write_data(self) -> dict:
+    def _write_data(self, force: bool = False, defer: bool = True) -> bool:
         """
         Writes the data of the object to a dictionary and saves it to a file.
 
+        Nothing is written if no field changed since the last load or save: fields set
+        since then are compared by their json with what was written, and so are container
+        fields read since the last load, which may have been changed in place, even
+        through a reference taken before an earlier save. With the json codec
+        only the changed fields are encoded again.
+
+        Objects made with a `write_delay` (in seconds) are written by the background
+        writer instead, once their file stopped changing for that long, see
+        `writer.WriteBehind` and `flush`.
+
+        Args:
+            force (bool, optional): write even if no field changed. Defaults to False.
+            defer (bool, optional): queue the write when the object has a `write_delay`.
+                Defaults to True.
+
         Returns:
-            dict: The dictionary containing the data.
+            bool: whether the file was written, always True when the write is queued.
 
         Raises:
             Exception: If there is an error while saving the data.
         """
-        data = dict()
-        for field in self._fields.values():
-            data[field.name] = field.data
-        self._mate["data"] = data
-        return sync(self._mate, self._path, self._compact, self._encrypt)
+        if defer and self._write_delay is not None:
+            write_behind.submit(self, self._write_delay, force)
+            return True
+        with self._save_lock:
+            # fields set while the write runs stay dirty for the next one
+            with self._dirty_lock:
+                dirty = self._dirty
+                self._dirty = set()
+            try:
+                return self._write_fields(dirty, force)
+            except BaseException:
+                with self._dirty_lock:
+                    self._dirty |= dirty
+                raise
+
+    def _write_fields(self, dirty: Set[int], force: bool) -> bool:
+        """The write of `_write_data`, `dirty` are the fields set since the last save."""
+        stats = dict() if self._profile or instrument.enabled() else None
+        if stats is not None:
+            start = time.perf_counter()
+        values = self._values
+        fragments = list(self._fragments)
+        # containers read but not set since the load may have been changed in place,
+        # the value they were loaded with is read back from the file
+        touched = set(self._touched)
+        unknown = [i for i in touched if fragments[i] is None and i not in dirty]
+        if unknown:
+            loaded = self._read_back([self._schema.names[i] for i in unknown])
+            for index in unknown:
+                name = self._schema.names[index]
+                fragments[index] = _fragment(loaded[name]) if name in loaded else None
+        changed = False
+        for index in dirty | touched:
+            fragment = _fragment(values[index])
+            changed = changed or fragment is None or fragment != fragments[index]
+            fragments[index] = fragment
+        if not changed and not force:
+            return False
+        self._mate["data"] = self._data()
+        payload = None
+        if self._codec == "json" and not self._stream:
+            payload = self._encode_fragments(fragments)
+        if stats is not None:
+            encoded = time.perf_counter()
+        if payload is None:
+            self._sync(self._mate)
+        else:
+            self._sync_bytes(payload)
+        self._fragments = fragments
+        if stats is not None:
+            end = time.perf_counter()
+            stats["encode"] = encoded - start
+            stats["write"] = end - encoded
+            stats["bytes_written"] = os.path.getsize(self._path)
+            stats["total"] = end - start
+            self._save_stats = stats
+            instrument.emit("save", self, stats)
+        return True
+
+    def _data(self) -> Dict[str, Any]:
+        """The values of the fields, as written to the file: fields without a value are left out."""
+        return {
+            name: value
+            for name, value in zip(self._schema.names, self._values)
+            if value is not MISSING
+        }
+
+    @classmethod
+    async def aload(cls, *args, **kw) -> "BaseData":
+        """Make an object on the `aio` thread pool, taking the arguments of the class."""
+        return await run(cls, *args, **kw)
+
+    async def asave(self, force: bool = False) -> bool:
+        """`_write_data` on the `aio` thread pool."""
+        return await run(self._write_data, force)
+
+    def flush(self) -> bool:
+        """
+        Do the queued write of the object now, if any.
+
+        Returns:
+            bool: whether a write was queued.
+        """
+        return write_behind.flush(self) > 0
+
+    def _encode_fragments(self, fragments: List[Union[str, None]]) -> Union[bytes, None]:
+        """
+        Build the json of `_mate` from the json of every field, filling the missing ones.
+
+        Returns:
+            Union[bytes, None]: the json, None if a value has no json.
+        """
+        parts = []
+        for index, (name, value) in enumerate(zip(self._schema.names, self._values)):
+            if fragments[index] is None:
+                fragments[index] = _fragment(value)
+                if fragments[index] is None:
+                    return None
+            if fragments[index]:
+                parts.append(f"{json.dumps(name)}: {fragments[index]}")
+        head = json.dumps({k: v for k, v in self._mate.items() if k != "data"})[:-1]
+        sep = ", " if len(head) > 1 else ""
+        return f'{head}{sep}"data": {{{", ".join(parts)}}}}}'.encode("utf-8")
+
+    def _sync_bytes(self, payload: bytes):
+        return sync_bytes(
+            payload,
+            path=self._path,
+            compact=self._compact,
+            encrypt=self._encrypt,
+            micro_code=self._micro_code,
+            data_type=self._data_type,
+            level=getattr(self, "_compact_level", None),
+            dict_data=self._get_dict(),
+            hash_type=getattr(self, "_hash_type", KEEP),
+            key=getattr(self, "_key", None),
+            compact_type=getattr(self, "_compact_type", "zstd"),
+            threads=getattr(self, "_compact_threads", 0),
+        )
+
+    def _sync(self, data: dict):
+        return sync(
+            data,
+            path=self._path,
+            compact=self._compact,
+            encrypt=self._encrypt,
+            micro_code=self._micro_code,
+            data_type=self._data_type,
+            level=getattr(self, "_compact_level", None),
+            stream=self._stream,
+            dict_data=self._get_dict(),
+            codec=self._codec,
+            hash_type=getattr(self, "_hash_type", KEEP),
+            key=getattr(self, "_key", None),
+            compact_type=getattr(self, "_compact_type", "zstd"),
+            threads=getattr(self, "_compact_threads", 0),
+        )
+
+    def _get_dict(self):
+        return getattr(self, "_compact_dict", None)
+
+    def reload(self) -> Set[str]:
+        """
+        Read the file again and merge it with the other priorities, which are not reloaded.
+
+        The new values replace the old ones at once, so readers never wait for a reload
+        and never see a half reloaded object. Values set on the object since the last
+        load are replaced by the merged ones.
+
+        Returns:
+            Set[str]: names of the fields whose value changed.
+        """
+        file_p = self._file_priority()
+        if file_p is None or self._path is None:
+            raise ValueError("the object has no file to reload")
+        with self._reload_lock:
+            sources = dict(self._sources)
+            sources[file_p] = self._read_fields(self._read_file(create=False))
+            values = self._schema.new_values()
+            for p in sorted(sources.keys()):
+                for index, value in sources[p].items():
+                    values[index] = value
+            old = self._values
+            changed = {name for name, a, b in zip(self._schema.names, old, values) if a != b}
+            self._sources = sources
+            self._values = values
+            self._reset_dirty()
+        if changed:
+            for callback in list(self._subscribers):
+                callback(self, changed)
+        return changed
+
+    def subscribe(self, callback: Callable[["BaseData", Set[str]], None]) -> None:
+        """
+        Call `callback(obj, changed)` after a reload changed some fields.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[["BaseData", Set[str]], None]) -> None:
+        self._subscribers.remove(callback)
+
+    def watch(self, callback: Callable = None, interval: float = 1.0, inotify: bool = True):
+        """
+        Reload the object whenever its file changes, see `watch.Watcher`.
+
+        Args:
+            callback (Callable, optional): subscribed with `subscribe`.
+            interval (float, optional): poll interval in seconds, when inotify is not used.
+            inotify (bool, optional): use inotify where available. Defaults to True.
+
+        Returns:
+            Watcher: the started watcher, stopped by `unwatch`.
+        """
+        from .watch import Watcher
+
+        if self._path is None:
+            raise ValueError("the object has no file to watch")
+        if callback is not None:
+            self.subscribe(callback)
+        self.unwatch()
+        self._watcher = Watcher(self._path, self.reload, interval, inotify).start()
+        return self._watcher
+
+    def unwatch(self) -> None:
+        watcher = getattr(self, "_watcher", None)
+        if watcher is not None:
+            watcher.stop()
+            self._watcher = None
+
+
+BaseData._schema = _Schema(BaseData)
+BaseData._fields = BaseData._schema.fields
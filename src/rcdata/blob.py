@@ -0,0 +1,87 @@
+"""
+Binary field values, stored raw after the payload instead of encoded in it
+
+The bytes-like values of the data object are written back to back in the blob section
+of the file, see `mc`, and the payload holds a reference in their place:
+
+    {"$blob": [offset, length]}            offset in the blob section
+    {"$blob": [offset, length, digest]}    in hashed files, the hex digest of the value
+
+Loaded values are memoryview slices of the file, mapped with mmap, or of the loaded
+buffer, so they are not copied. The payload digests cover the references, so the
+digest of every value is checked when it is loaded.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from .digest import get_hash
+
+BINARY_TYPES = (bytes, bytearray, memoryview)
+REF = "$blob"
+
+
+def split(data: dict, hash_name: Optional[str] = None) -> Tuple[dict, Optional[List[memoryview]]]:
+    """
+    Replace the bytes-like values of the data object with references.
+
+    Args:
+        data (dict): document, with its values under "data".
+        hash_name (str, optional): hash of the file, the references then hold the
+            digest of the values.
+
+    Returns:
+        Tuple[dict, Optional[List[memoryview]]]: the document with references and the
+            values to write in the blob section, `data` and None if it has no values.
+    """
+    values = data.get("data")
+    if not isinstance(values, dict) or not any(
+        isinstance(value, BINARY_TYPES) for value in values.values()
+    ):
+        return data, None
+    blobs: List[memoryview] = []
+    refs: Dict[str, object] = dict()
+    offset = 0
+    for name, value in values.items():
+        if not isinstance(value, BINARY_TYPES):
+            refs[name] = value
+            continue
+        view = memoryview(value).cast("B")
+        ref = [offset, len(view)]
+        if hash_name:
+            ref.append(get_hash(hash_name)(view).hexdigest())
+        refs[name] = {REF: ref}
+        blobs.append(view)
+        offset += len(view)
+    return dict(data, data=refs), blobs
+
+
+def attach(data: dict, section: memoryview, hash_name: Optional[str] = None) -> dict:
+    """
+    Replace the references of the data object with slices of the blob section, in place.
+
+    Args:
+        data (dict): decoded document.
+        section (memoryview): the blob section of the file.
+        hash_name (str, optional): hash of the file, the values are checked against
+            the digest of their reference.
+
+    Returns:
+        dict: `data`
+
+    Raises:
+        ValueError: If a reference is out of the section or a value does not match its digest.
+    """
+    values = data.get("data")
+    if not isinstance(values, dict):
+        return data
+    for name, value in values.items():
+        if not (isinstance(value, dict) and len(value) == 1 and REF in value):
+            continue
+        offset, length, *digest = value[REF]
+        if offset < 0 or length < 0 or offset + length > len(section):
+            raise ValueError(f"blob {name} is out of the file")
+        view = section[offset : offset + length]
+        if hash_name and digest and get_hash(hash_name)(view).hexdigest() != digest[0]:
+            raise ValueError(f"blob {name} does not match its digest")
+        values[name] = view
+    return data
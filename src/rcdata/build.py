@@ -0,0 +1,145 @@
+"""
+Build or refresh a resource index from the resources under its root
+
+Only new files and files whose size or mtime changed are hashed again, on a
+process pool, the resources themselves are never parsed.
+"""
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .digest import file_digest, get_hash, parse_digest
+from .res import ResourceIndex
+
+EXTENSIONS = (".resource", ".cresource")
+# files handed to the pool at once, bounds the pending results
+BATCH_SIZE = 4096
+
+
+def iter_resources(root: str) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    Walk a resource directory.
+
+    Yields:
+        Tuple[str, os.stat_result]: resource name relative to `root`, with "/"
+            separators, and its stat.
+    """
+    stack = [""]
+    while stack:
+        prefix = stack.pop()
+        with os.scandir(os.path.join(root, prefix)) as entries:
+            for entry in entries:
+                name = f"{prefix}{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name + "/")
+                elif entry.name.endswith(EXTENSIONS) and entry.is_file():
+                    yield name, entry.stat()
+
+
+def _hash_file(task: Tuple[str, str, str]) -> Tuple[str, Optional[str]]:
+    root, file, name = task
+    try:
+        with open(os.path.join(root, file), "rb") as res:
+            return file, f"{name}:{file_digest(res, name)}"
+    except OSError:
+        return file, None
+
+
+def _batches(items: Iterator, size: int) -> Iterator[list]:
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def build_index(
+    path: str,
+    name: str = "sha256",
+    workers: int = None,
+    full: bool = False,
+) -> Dict[str, int]:
+    """
+    Create or refresh an index from the resources under its root.
+
+    A file keeps its digest if its size and mtime match `file_stat` and the digest
+    uses the hash `name`, other files are hashed again.
+
+    Args:
+        path (str): index path, with a ".index" or ".cindex" extension.
+        name (str, optional): hash, see `digest.HASH_NAMES`. Defaults to "sha256".
+        workers (int, optional): hashing processes, 0 to hash serially.
+            Defaults to the number of cpus.
+        full (bool, optional): hash every file again. Defaults to False.
+
+    Returns:
+        Dict[str, int]: number of added, changed, removed and unchanged files.
+    """
+    get_hash(name)
+    index = ResourceIndex(path, lazy=True)
+    if not os.path.isdir(index.root):
+        raise ValueError(f"resource directory not found: {index.root}")
+    old_hash: Dict[str, str] = index.file_hash
+    old_stat: Dict[str, List[int]] = index.file_stat
+    file_hash: Dict[str, str] = dict()
+    file_stat: Dict[str, List[int]] = dict()
+    stats = dict.fromkeys(("added", "changed", "removed", "unchanged"), 0)
+
+    def todo() -> Iterator[Tuple[str, str, str]]:
+        for file, st in iter_resources(index.root):
+            stat = [st.st_size, st.st_mtime_ns]
+            file_stat[file] = stat
+            digest = old_hash.get(file)
+            if (
+                not full
+                and digest is not None
+                and old_stat.get(file) == stat
+                and parse_digest(digest)[0] == name
+            ):
+                file_hash[file] = digest
+                stats["unchanged"] += 1
+            else:
+                stats["added" if file not in old_hash else "changed"] += 1
+                yield index.root, file, name
+
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers > 0:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in _batches(todo(), BATCH_SIZE):
+                chunksize = max(1, len(batch) // (workers * 4))
+                _collect(pool.map(_hash_file, batch, chunksize=chunksize), file_hash, file_stat)
+    else:
+        _collect(map(_hash_file, todo()), file_hash, file_stat)
+    stats["removed"] = len(set(old_hash).difference(file_stat))
+    index.file_list = sorted(file_hash)
+    index.file_hash = file_hash
+    index.file_stat = {file: file_stat[file] for file in index.file_list}
+    index._write_data()
+    return stats
+
+
+def _collect(results, file_hash: Dict[str, str], file_stat: Dict[str, List[int]]) -> None:
+    for file, digest in results:
+        if digest is None:
+            # removed while the index was built
+            file_stat.pop(file, None)
+        else:
+            file_hash[file] = digest
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m rcdata.build")
+    parser.add_argument("index", help="index path, the resources are under its root")
+    parser.add_argument("--hash", default="sha256", help="hash of the files")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="hashing processes")
+    parser.add_argument("--full", action="store_true", help="hash every file again")
+    args = parser.parse_args(argv)
+    stats = build_index(args.index, args.hash, args.workers, args.full)
+    print(", ".join(f"{count} {state}" for state, count in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
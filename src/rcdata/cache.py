@@ -0,0 +1,119 @@
+"""
+Process-wide cache of parsed data files
+"""
+
+import os
+import marshal
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ParseCache:
+    """
+    A LRU cache of parsed documents, keyed on the stat of their file.
+
+    Documents are stored marshalled, every hit returns a new copy, so callers
+    can change what they get without touching the cache.
+
+    Attributes:
+        max_entries (int): max number of cached documents, 0 for no limit.
+        max_bytes (int): max total size of the marshalled documents, 0 for no limit.
+        hits (int): number of lookups served from the cache.
+        misses (int): number of lookups that had to parse the file.
+        evictions (int): number of documents dropped to stay within the limits.
+        invalidations (int): number of documents dropped because their file was written.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024) -> None:
+        if max_entries < 0 or max_bytes < 0:
+            raise ValueError("max_entries and max_bytes must be greater than or equal to 0")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @staticmethod
+    def key(path: str, st: os.stat_result, *options: Hashable) -> Tuple:
+        """
+        Args:
+            path (str): file path
+            st (os.stat_result): stat of the file, from the file that is read.
+            options (Hashable): load options that change the parsed document.
+        """
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size, st.st_ino, *options)
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        with self._lock:
+            raw = self._data.get(key)
+            if raw is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return marshal.loads(raw)
+
+    def put(self, key: Tuple, doc: Any) -> None:
+        try:
+            raw = marshal.dumps(doc)
+        except ValueError:
+            # not made of builtin types only, leave it uncached
+            return
+        if self.max_bytes and len(raw) > self.max_bytes:
+            return
+        with self._lock:
+            # a file has one current version, drop the older ones
+            self._drop(lambda k: k[0] == key[0] and k[1:4] != key[1:4])
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._data[key] = raw
+            self.size += len(raw)
+            while (self.max_entries and len(self._data) > self.max_entries) or (
+                self.max_bytes and self.size > self.max_bytes
+            ):
+                _, raw = self._data.popitem(last=False)
+                self.size -= len(raw)
+                self.evictions += 1
+
+    def invalidate(self, path: str) -> None:
+        """Drop every cached document of a file."""
+        path = os.path.abspath(path)
+        with self._lock:
+            self.invalidations += self._drop(lambda k: k[0] == path)
+
+    def _drop(self, match) -> int:
+        keys = [key for key in self._data if match(key)]
+        for key in keys:
+            self.size -= len(self._data.pop(key))
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: hits, misses, evictions, invalidations, entries and bytes of the cache.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._data),
+            "bytes": self.size,
+        }
+
+
+parse_cache = ParseCache()
@@ -0,0 +1,139 @@
+"""
+Serialization codecs for data files
+"""
+
+import json
+import marshal
+import warnings
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class Codec(object):
+    """
+    A serialization codec.
+
+    Attributes:
+        name (str): name of the codec.
+        codec_id (int): id of the codec recorded in the micro code, 0 to 255.
+        dumps (Callable[[Any], bytes]): encode an object.
+        loads (Callable[[Any], Any]): decode a bytes-like object.
+        text (bool): the codec writes json text, so files without a micro code can hold it.
+    """
+
+    __slots__ = ("name", "codec_id", "dumps", "loads", "text")
+
+    def __init__(
+        self,
+        name: str,
+        codec_id: int,
+        dumps: Callable[[Any], bytes],
+        loads: Callable[[Any], Any],
+        text: bool = False,
+    ) -> None:
+        if not 0 <= codec_id <= 255:
+            raise ValueError("codec_id must be between 0 and 255")
+        self.name = name
+        self.codec_id = codec_id
+        self.dumps = dumps
+        self.loads = loads
+        self.text = text
+
+    def __repr__(self) -> str:
+        return f"Codec(name={self.name}, codec_id={self.codec_id})"
+
+
+def _orjson() -> Codec:
+    import orjson
+
+    return Codec("orjson", 1, orjson.dumps, orjson.loads, text=True)
+
+
+def _msgpack() -> Codec:
+    import msgpack
+
+    return Codec("msgpack", 2, msgpack.packb, msgpack.unpackb)
+
+
+JSON = Codec(
+    "json",
+    0,
+    lambda obj: json.dumps(obj).encode("utf-8"),
+    lambda b: json.loads(str(b, "utf-8")),
+    text=True,
+)
+# marshal is fast but must only be used for trusted files
+MARSHAL = Codec("marshal", 3, marshal.dumps, marshal.loads)
+
+_CODECS: Dict[str, Codec] = {JSON.name: JSON, MARSHAL.name: MARSHAL}
+# codecs with an optional backend, built on first use
+_OPTIONAL: Dict[str, Tuple[int, Callable[[], Codec]]] = {
+    "orjson": (1, _orjson),
+    "msgpack": (2, _msgpack),
+}
+
+
+def _used_ids() -> Dict[int, str]:
+    ids = {i: name for name, (i, _) in _OPTIONAL.items()}
+    ids.update({codec.codec_id: codec.name for codec in _CODECS.values()})
+    return ids
+
+
+def register_codec(codec: Codec) -> None:
+    """
+    Register a codec, so it can be selected by name and read back by id.
+
+    Raises:
+        ValueError: If another codec already uses the name or id.
+    """
+    owner = _used_ids().get(codec.codec_id)
+    if owner is not None and owner != codec.name:
+        raise ValueError(f"codec id {codec.codec_id} is used by {owner}")
+    if codec.name in _CODECS and _CODECS[codec.name] is not codec:
+        raise ValueError(f"codec {codec.name} is already registered")
+    _CODECS[codec.name] = codec
+
+
+def list_codecs() -> List[str]:
+    return list(_CODECS) + [name for name in _OPTIONAL if name not in _CODECS]
+
+
+def get_codec(name: str = "json", fallback: bool = True) -> Codec:
+    """
+    Get a codec by name.
+
+    Args:
+        name (str): name of the codec.
+        fallback (bool): use the json codec if the backend of the codec is not installed.
+
+    Raises:
+        ValueError: If the codec is unknown.
+        ImportError: If the backend is not installed and `fallback` is False.
+    """
+    codec = _CODECS.get(name)
+    if codec is not None:
+        return codec
+    if name not in _OPTIONAL:
+        raise ValueError(f"unknown codec: {name}")
+    try:
+        codec = _OPTIONAL[name][1]()
+    except ImportError:
+        if not fallback:
+            raise ImportError(f"You need to install {name} to use this codec")
+        warnings.warn(f"{name} is not installed, falling back to json")
+        return JSON
+    _CODECS[name] = codec
+    return codec
+
+
+def get_codec_by_id(codec_id: int) -> Codec:
+    """
+    Get the codec recorded in a micro code.
+
+    Raises:
+        ValueError: If the id is unknown.
+        ImportError: If the backend of the codec is not installed.
+    """
+    name = _used_ids().get(codec_id)
+    if name is None:
+        raise ValueError(f"unknown codec id: {codec_id}")
+    return get_codec(name, fallback=False)
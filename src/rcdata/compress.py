@@ -0,0 +1,445 @@
+"""
+Compressors of data file payloads, one per `mc.CompactType`
+
+A payload is a single stream, so the archive types use the stream format of their
+archive: zip deflates it as zip members are (zlib), tar stores it as it is, gztar,
+bztar and xztar are gzip, bzip2 and xz streams. Only zstd takes a dictionary and
+compresses on several threads.
+
+"auto" picks the type and level from the size of the payload with a profile, made
+once per deployment by `benchmark`, which weighs the compression time against the
+time to write and read the compressed bytes:
+
+    python -m rcdata.compress -o profile.json --io-speed 200
+
+and used with `set_profile` or the RCDATA_COMPACT_PROFILE environment variable.
+"""
+
+import io
+import os
+import bz2
+import json
+import lzma
+import time
+import zlib
+import gzip
+import random
+import argparse
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+AUTO = "auto"
+# smaller zstd payloads are compressed on the calling thread, threads cost more than they save
+THREADS_MIN_SIZE = 1 << 20
+PROFILE_ENV = "RCDATA_COMPACT_PROFILE"
+
+
+class Compressor(object):
+    """
+    A compression format.
+
+    Attributes:
+        name (str): name of the format, the lowercase name of its `mc.CompactType`.
+        levels (Tuple[int, int]): lowest and highest level.
+        default_level (int): level used when none is given.
+        compress (Callable): compress bytes, `(data, level, threads, dict_data) -> bytes`.
+        decompress (Callable): decompress a bytes-like object, `(data, dict_data) -> bytes`.
+        reader (Callable): a binary file decompressing a stream as it is read,
+            `(stream, dict_data) -> BinaryIO`.
+        writer (Callable): a binary file compressing what is written to a file, which
+            is left open when it is closed, `(file, level, threads, dict_data) -> BinaryIO`.
+    """
+
+    __slots__ = ("name", "levels", "default_level", "compress", "decompress", "reader", "writer")
+
+    def __init__(
+        self,
+        name: str,
+        levels: Tuple[int, int],
+        default_level: int,
+        compress: Callable,
+        decompress: Callable,
+        reader: Callable,
+        writer: Callable,
+    ) -> None:
+        self.name = name
+        self.levels = levels
+        self.default_level = default_level
+        self.compress = compress
+        self.decompress = decompress
+        self.reader = reader
+        self.writer = writer
+
+    def level(self, level: Optional[int]) -> int:
+        """
+        Raises:
+            ValueError: If the level is out of `levels`.
+        """
+        if level is None:
+            return self.default_level
+        low, high = self.levels
+        if not low <= level <= high:
+            raise ValueError(f"{self.name} level must be between {low} and {high}")
+        return level
+
+    def __repr__(self) -> str:
+        return f"Compressor(name={self.name})"
+
+
+def _zstd_ctx(i: int, level: int = 3, dict_data: bytes = None, threads: int = 0):
+    from .io import get_zstd_ctx
+
+    return get_zstd_ctx(i, level, dict_data, threads)
+
+
+def _zstd_compress(data, level: int, threads: int, dict_data: bytes) -> bytes:
+    threads = threads if len(data) >= THREADS_MIN_SIZE else 0
+    return _zstd_ctx(0, level, dict_data, threads).compress(data)
+
+
+def _zstd_writer(file, level: int, threads: int, dict_data: bytes):
+    return _zstd_ctx(0, level, dict_data, threads).stream_writer(file, closefd=False)
+
+
+def _zstd_reader(stream, dict_data: bytes):
+    return _zstd_ctx(1, dict_data=dict_data).stream_reader(stream, closefd=False)
+
+
+def _zstd_decompress(data, dict_data: bytes) -> bytes:
+    # frames written on several threads may not record their size, read them as a stream
+    return _zstd_reader(data, dict_data).read()
+
+
+class _ZlibReader(io.RawIOBase):
+    """Inflate a zlib stream as it is read."""
+
+    def __init__(self, stream) -> None:
+        super().__init__()
+        self._stream = stream
+        self._inflate = zlib.decompressobj()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = len(buffer)
+        while not self._inflate.eof:
+            data = self._inflate.unconsumed_tail or self._stream.read(64 * 1024)
+            if not data:
+                raise zlib.error("truncated zlib stream")
+            out = self._inflate.decompress(data, size)
+            if out:
+                buffer[: len(out)] = out
+                return len(out)
+        return 0
+
+
+class _ZlibWriter(io.BufferedIOBase):
+    """Deflate what is written to a file, ending the stream on close."""
+
+    def __init__(self, file, level: int) -> None:
+        super().__init__()
+        self._file = file
+        self._deflate = zlib.compressobj(level)
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._file.write(self._deflate.compress(data))
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._file.write(self._deflate.flush())
+        super().close()
+
+
+class _Stored(io.BufferedIOBase):
+    """Write to a file as it is, leaving it open on close."""
+
+    def __init__(self, file) -> None:
+        super().__init__()
+        self._file = file
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self._file.write(data)
+
+
+_COMPRESSORS: Dict[str, Compressor] = {
+    c.name: c
+    for c in (
+        Compressor(
+            "zip",
+            (0, 9),
+            6,
+            lambda data, level, threads, dict_data: zlib.compress(data, level),
+            lambda data, dict_data: zlib.decompress(data),
+            lambda stream, dict_data: io.BufferedReader(_ZlibReader(stream)),
+            lambda file, level, threads, dict_data: _ZlibWriter(file, level),
+        ),
+        Compressor(
+            "tar",
+            (0, 0),
+            0,
+            lambda data, level, threads, dict_data: bytes(data),
+            lambda data, dict_data: bytes(data),
+            lambda stream, dict_data: stream,
+            lambda file, level, threads, dict_data: _Stored(file),
+        ),
+        Compressor(
+            "gztar",
+            (0, 9),
+            6,
+            lambda data, level, threads, dict_data: gzip.compress(data, level, mtime=0),
+            lambda data, dict_data: gzip.decompress(data),
+            lambda stream, dict_data: gzip.GzipFile(fileobj=stream, mode="rb"),
+            lambda file, level, threads, dict_data: gzip.GzipFile(
+                fileobj=file, mode="wb", compresslevel=level, mtime=0
+            ),
+        ),
+        Compressor(
+            "bztar",
+            (1, 9),
+            9,
+            lambda data, level, threads, dict_data: bz2.compress(data, level),
+            lambda data, dict_data: bz2.decompress(data),
+            lambda stream, dict_data: bz2.BZ2File(stream, "rb"),
+            lambda file, level, threads, dict_data: bz2.BZ2File(file, "wb", compresslevel=level),
+        ),
+        Compressor(
+            "xztar",
+            (0, 9),
+            6,
+            lambda data, level, threads, dict_data: lzma.compress(data, preset=level),
+            lambda data, dict_data: lzma.decompress(data),
+            lambda stream, dict_data: lzma.LZMAFile(stream, "rb"),
+            lambda file, level, threads, dict_data: lzma.LZMAFile(file, "wb", preset=level),
+        ),
+        Compressor(
+            "zstd", (1, 22), 3, _zstd_compress, _zstd_decompress, _zstd_reader, _zstd_writer
+        ),
+    )
+}
+
+
+def list_compressors() -> List[str]:
+    return list(_COMPRESSORS)
+
+
+def get_compressor(name: str) -> Compressor:
+    """
+    Get a compressor by name, or by `mc.CompactType`.
+
+    Raises:
+        ValueError: If the compressor is unknown.
+    """
+    name = getattr(name, "name", name)
+    compressor = _COMPRESSORS.get(str(name).lower())
+    if compressor is None:
+        raise ValueError(f"unknown compact type: {name}")
+    return compressor
+
+
+# type, level and threads of the payloads up to max_size, the last rule has no max_size
+DEFAULT_PROFILE = {
+    "rules": [
+        {"max_size": 64 * 1024, "type": "zstd", "level": 1},
+        {"max_size": None, "type": "zstd", "level": 3},
+    ]
+}
+
+_profile: Optional[dict] = None
+
+
+def set_profile(profile: Union[dict, str, None]) -> None:
+    """
+    Set the profile of "auto", a profile made by `benchmark`, a path to one, or None
+    for the profile named by RCDATA_COMPACT_PROFILE, else `DEFAULT_PROFILE`.
+    """
+    global _profile
+    if isinstance(profile, str):
+        with open(profile, encoding="utf-8") as file:
+            profile = json.load(file)
+    if profile is not None:
+        _check_profile(profile)
+    _profile = profile
+
+
+def get_profile() -> dict:
+    if _profile is not None:
+        return _profile
+    path = os.environ.get(PROFILE_ENV)
+    if path:
+        set_profile(path)
+        return _profile
+    return DEFAULT_PROFILE
+
+
+def _check_profile(profile: dict) -> None:
+    rules = profile.get("rules")
+    if not rules or rules[-1].get("max_size") is not None:
+        raise ValueError("the last rule of a profile must have no max_size")
+    for rule in rules:
+        get_compressor(rule["type"]).level(rule.get("level"))
+
+
+def choose(
+    size: Optional[int], profile: dict = None, threads: int = 0
+) -> Tuple[str, int, int]:
+    """
+    The compressor of a payload in "auto" mode.
+
+    Args:
+        size (Optional[int]): payload size, None if unknown, as when streaming, which
+            takes the rule of the biggest payloads.
+        profile (dict, optional): Defaults to `get_profile()`.
+        threads (int, optional): zstd threads when the rule does not set them.
+
+    Returns:
+        Tuple[str, int, int]: the compressor name, level and zstd threads.
+    """
+    rules = (profile or get_profile())["rules"]
+    rule = rules[-1]
+    if size is not None:
+        rule = next(r for r in rules if r["max_size"] is None or size <= r["max_size"])
+    compressor = get_compressor(rule["type"])
+    return compressor.name, compressor.level(rule.get("level")), rule.get("threads", threads)
+
+
+def resolve(
+    compact_type: str, level: Optional[int], threads: int, size: Optional[int], dict_data=None
+) -> Tuple[str, int, int]:
+    """
+    The compressor name, level and threads of a payload, choosing them for "auto".
+
+    Raises:
+        ValueError: If the type is unknown, the level out of range, a level is given
+            with "auto", whose profile sets the levels, or a dictionary is given to
+            another type than zstd.
+    """
+    if compact_type == AUTO:
+        if level is not None:
+            raise ValueError('the profile of "auto" sets the level, compact_level must be None')
+        name, level, threads = choose(size, threads=threads)
+    else:
+        compressor = get_compressor(compact_type)
+        name, level = compressor.name, compressor.level(level)
+    if dict_data is not None and name != "zstd":
+        raise ValueError("only zstd compresses with a dictionary")
+    return name, level, threads
+
+
+DEFAULT_CANDIDATES = (
+    ("zstd", 1),
+    ("zstd", 3),
+    ("zstd", 9),
+    ("zstd", 19),
+    ("zip", 6),
+    ("gztar", 6),
+    ("bztar", 9),
+    ("xztar", 6),
+    ("tar", 0),
+)
+
+
+def benchmark(
+    samples: Sequence[bytes],
+    io_speed: float,
+    candidates: Sequence[Tuple[str, int]] = DEFAULT_CANDIDATES,
+    threads: int = 0,
+) -> dict:
+    """
+    Make a profile of "auto" by timing every candidate on samples of payloads.
+
+    Every sample takes the candidate with the lowest cost: the time to compress and
+    decompress it, and to write and read the compressed bytes at `io_speed`.
+
+    Args:
+        samples (Sequence[bytes]): uncompressed payloads, of the sizes seen in the deployment.
+        io_speed (float): storage throughput, in MB per second.
+        candidates (Sequence[Tuple[str, int]]): compressor names and levels to try.
+        threads (int, optional): zstd threads. Defaults to 0.
+
+    Returns:
+        dict: the profile, its rules and the cost of every candidate per sample size.
+    """
+    if io_speed <= 0:
+        raise ValueError("io_speed must be greater than 0")
+    byte_time = 1 / (io_speed * 1024 * 1024)
+    results = []
+    for sample in sorted(samples, key=len):
+        costs = dict()
+        for name, level in candidates:
+            compressor = get_compressor(name)
+            level = compressor.level(level)
+            start = time.perf_counter()
+            packed = compressor.compress(sample, level, threads, None)
+            packed_time = time.perf_counter() - start
+            start = time.perf_counter()
+            compressor.decompress(packed, None)
+            unpacked_time = time.perf_counter() - start
+            cost = packed_time + unpacked_time + 2 * len(packed) * byte_time
+            costs[f"{compressor.name}:{level}"] = cost
+        best = min(costs, key=costs.get)
+        results.append({"size": len(sample), "best": best, "costs": costs})
+    rules: List[dict] = []
+    for i, result in enumerate(results):
+        name, level = result["best"].split(":")
+        # a rule covers the sizes up to half way to the next sample, on a log scale
+        max_size = None
+        if i + 1 < len(results):
+            max_size = int((result["size"] * results[i + 1]["size"]) ** 0.5)
+        if rules and (rules[-1]["type"], rules[-1]["level"]) == (name, int(level)):
+            rules[-1]["max_size"] = max_size
+        else:
+            rules.append({"max_size": max_size, "type": name, "level": int(level)})
+    return {"io_speed": io_speed, "rules": rules, "results": results}
+
+
+def sample_payloads(sizes: Sequence[int], seed: int = 0) -> List[bytes]:
+    """json payloads of about the given sizes, records of numbers, words and lists."""
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("abcdefghijklmnop") for _ in range(8)) for _ in range(512)]
+    records = [
+        {"id": i, "name": rng.choice(words), "score": rng.random(), "tags": rng.sample(words, 3)}
+        for i in range(1024)
+    ]
+    payloads = []
+    for size in sizes:
+        items: List[dict] = []
+        length = 0
+        while length < size:
+            record = dict(records[len(items) % len(records)], id=len(items))
+            items.append(record)
+            length += len(json.dumps(record)) + 2
+        payloads.append(json.dumps({"data": {"items": items}}).encode("utf-8"))
+    return payloads
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m rcdata.compress")
+    parser.add_argument("-o", "--output", required=True, help="profile json file")
+    parser.add_argument("--io-speed", type=float, default=200, help="storage speed in MB/s")
+    parser.add_argument("--sample", nargs="*", default=None, help="uncompressed sample files")
+    parser.add_argument("--threads", type=int, default=0, help="zstd threads")
+    args = parser.parse_args(argv)
+    if args.sample:
+        samples = []
+        for path in args.sample:
+            with open(path, "rb") as file:
+                samples.append(file.read())
+    else:
+        samples = sample_payloads([1 << 10, 1 << 14, 1 << 18, 1 << 22])
+    profile = benchmark(samples, args.io_speed, threads=args.threads)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(profile, file, indent=2)
+    for rule in profile["rules"]:
+        size = "larger" if rule["max_size"] is None else f"<= {rule['max_size']} bytes"
+        print(f"{size:>24}: {rule['type']} level {rule['level']}")
+
+
+if __name__ == "__main__":
+    main()
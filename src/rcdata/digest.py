@@ -0,0 +1,217 @@
+"""
+Integrity hashes of data files, computed while the payload streams
+
+A hashed payload is split into blocks of `block_size` bytes, each with its own digest,
+so a reader can check only the blocks it reads. The digests follow the payload:
+
+    trailer     the digest of every block, back to back, then the root digest,
+                the digest of the block digests
+"""
+
+import io
+import hashlib
+from typing import BinaryIO, List, Tuple
+
+HASH_NAMES = ("sha256", "sha384", "sha512")
+BLOCK_SIZE = 64 * 1024
+
+
+def get_hash(name: str):
+    """
+    The hashlib constructor of a hash.
+
+    Raises:
+        ValueError: If the hash is not one of `HASH_NAMES`.
+    """
+    if name not in HASH_NAMES:
+        raise ValueError(f"hash must be one of {list(HASH_NAMES)}")
+    return getattr(hashlib, name)
+
+
+def digest_size(name: str) -> int:
+    return get_hash(name)().digest_size
+
+
+class HashingWriter(io.BufferedIOBase):
+    """
+    Write to a binary file, hashing every block of what is written.
+
+    Args:
+        file (BinaryIO): the file to write to.
+        name (str): hash, one of `HASH_NAMES`.
+        block_size (int): bytes per block.
+    """
+
+    def __init__(self, file: BinaryIO, name: str = "sha256", block_size: int = BLOCK_SIZE) -> None:
+        super().__init__()
+        if block_size <= 0:
+            raise ValueError("block_size must be greater than 0")
+        self.file = file
+        self.block_size = block_size
+        self._new = get_hash(name)
+        self._hash = self._new()
+        self._filled = 0
+        self._digests: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        view = memoryview(data).cast("B")
+        self.file.write(view)
+        start = 0
+        while start < len(view):
+            end = min(len(view), start + self.block_size - self._filled)
+            self._hash.update(view[start:end])
+            self._filled += end - start
+            if self._filled == self.block_size:
+                self._digests.append(self._hash.digest())
+                self._hash = self._new()
+                self._filled = 0
+            start = end
+        return len(view)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        # leave the file open, as zstd and text writers close what they wrap
+        super().close()
+
+    def trailer(self) -> bytes:
+        """The block digests and root digest of everything written."""
+        if self._filled or not self._digests:
+            self._digests.append(self._hash.digest())
+            self._hash = self._new()
+            self._filled = 0
+        digests = b"".join(self._digests)
+        return digests + self._new(digests).digest()
+
+
+def split_trailer(trailer: bytes, name: str) -> List[bytes]:
+    """
+    Check the root digest of a trailer.
+
+    Returns:
+        List[bytes]: the block digests.
+
+    Raises:
+        ValueError: If the trailer is damaged.
+    """
+    size = digest_size(name)
+    if len(trailer) < 2 * size or len(trailer) % size:
+        raise ValueError("truncated hash trailer")
+    digests, root = trailer[:-size], trailer[-size:]
+    if get_hash(name)(digests).digest() != root:
+        raise ValueError("hash mismatch in trailer")
+    return [digests[i : i + size] for i in range(0, len(digests), size)]
+
+
+def check_block(name: str, digests: List[bytes], index: int, block) -> None:
+    """
+    Raises:
+        ValueError: If the block does not match its digest.
+    """
+    if index >= len(digests) or get_hash(name)(block).digest() != digests[index]:
+        raise ValueError(f"hash mismatch in block {index}")
+
+
+def verify_buffer(buffer, name: str, digests: List[bytes], block_size: int) -> None:
+    """
+    Check every block of a payload held in memory, without copying it.
+
+    Raises:
+        ValueError: If a block does not match its digest.
+    """
+    view = memoryview(buffer)
+    count = max(1, -(-len(view) // block_size))
+    if count != len(digests):
+        raise ValueError("hash trailer does not match the payload length")
+    for index in range(count):
+        check_block(name, digests, index, view[index * block_size : (index + 1) * block_size])
+
+
+class VerifyingReader(io.RawIOBase):
+    """
+    Read a payload from a binary file, checking every block as it is read.
+
+    Args:
+        file (BinaryIO): the file, at the start of the payload.
+        length (int): payload length, nothing after it is read.
+        name (str): hash, one of `HASH_NAMES`.
+        digests (List[bytes]): block digests, see `split_trailer`.
+        block_size (int): bytes per block.
+    """
+
+    def __init__(
+        self, file: BinaryIO, length: int, name: str, digests: List[bytes], block_size: int
+    ) -> None:
+        super().__init__()
+        if max(1, -(-length // block_size)) != len(digests):
+            raise ValueError("hash trailer does not match the payload length")
+        self.file = file
+        self.name = name
+        self.digests = digests
+        self.block_size = block_size
+        self._left = length
+        self._new = get_hash(name)
+        self._hash = self._new()
+        self._filled = 0
+        self._index = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        size = self.file.readinto(view[: min(len(view), self._left)]) if self._left else 0
+        if self._left and not size:
+            raise ValueError("truncated payload")
+        self._left -= size
+        start = 0
+        while start < size:
+            end = min(size, start + self.block_size - self._filled)
+            self._hash.update(view[start:end])
+            self._filled += end - start
+            if self._filled == self.block_size:
+                self._check()
+            start = end
+        if not self._left and (self._filled or self._index == 0):
+            self._check()
+        return size
+
+    def _check(self) -> None:
+        if self._index >= len(self.digests) or self._hash.digest() != self.digests[self._index]:
+            raise ValueError(f"hash mismatch in block {self._index}")
+        self._index += 1
+        self._hash = self._new()
+        self._filled = 0
+
+
+def block_span(start: int, end: int, block_size: int) -> Tuple[int, int]:
+    """The first block and the block after the last one holding payload bytes start to end."""
+    return start // block_size, max(start // block_size + 1, -(-end // block_size))
+
+
+def file_digest(file: BinaryIO, name: str = "sha256") -> str:
+    """
+    Hash a whole file, reading it in chunks.
+
+    Returns:
+        str: the hex digest.
+    """
+    hash_ = get_hash(name)()
+    buffer = bytearray(BLOCK_SIZE)
+    view = memoryview(buffer)
+    while True:
+        size = file.readinto(buffer)
+        if not size:
+            return hash_.hexdigest()
+        hash_.update(view[:size])
+
+
+def parse_digest(value: str) -> Tuple[str, str]:
+    """Split a "name:hexdigest" digest, bare hex digests are sha256."""
+    name, sep, hexdigest = value.partition(":")
+    return (name, hexdigest) if sep else ("sha256", value)
+
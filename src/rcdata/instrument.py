@@ -0,0 +1,54 @@
+"""
+Instrumentation of loads and saves
+
+Hooks are called with the event ("load" or "save"), the object and its stats, after
+every load or save of any `BaseData`. Nothing is timed while no hook is registered,
+unless an object is made with `profile=True`.
+
+Load stats, in seconds and bytes:
+    init, env, file, default     time of every priority
+    read                         reading the file (bytes_read)
+    verify                       checking the micro code, signature and digests
+    decompress                   decompression (bytes_decoded, after it)
+    decode                       codec decoding
+    fields                       checking and setting the field values
+    total                        the whole load
+
+Save stats:
+    encode                       checking the changed fields and encoding the json
+    write                        encoding (other codecs), compressing and writing
+    bytes_written                size of the written file
+    total                        the whole save
+"""
+
+import warnings
+from typing import TYPE_CHECKING, Callable, Dict, List
+
+if TYPE_CHECKING:
+    from .base import BaseData
+
+Hook = Callable[[str, "BaseData", Dict[str, float]], None]
+
+_hooks: List[Hook] = []
+
+
+def add_hook(hook: Hook) -> None:
+    """Call `hook(event, obj, stats)` after every load and save."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    _hooks.remove(hook)
+
+
+def enabled() -> bool:
+    return bool(_hooks)
+
+
+def emit(event: str, obj: "BaseData", stats: Dict[str, float]) -> None:
+    for hook in list(_hooks):
+        try:
+            hook(event, obj, stats)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # metrics must not break loading
+            warnings.warn(f"instrumentation hook failed: {e!r}")
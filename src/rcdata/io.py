@@ -2,12 +2,40 @@
 Common io function for all data
 """
 
+import io
 import os
 import json
+import mmap
+import time
+import shutil
+import threading
 from pathlib import Path
+from contextlib import contextmanager
 from functools import lru_cache
 
-from typing import Tuple
+from typing import TYPE_CHECKING, BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from . import blob
+from .cache import parse_cache
+from .compress import AUTO, get_compressor, resolve
+from .codec import JSON, Codec, get_codec, get_codec_by_id
+from .selective import pick
+from .sidecar import options_tag, read_sidecar, write_sidecar
+from .digest import (
+    HashingWriter,
+    VerifyingReader,
+    block_span,
+    check_block,
+    digest_size,
+    split_trailer,
+    verify_buffer,
+)
+
+if TYPE_CHECKING:
+    from .mc import MicroCode
+
+# hash_type of `sync` keeping the hash of the file it overwrites
+KEEP = "keep"
 
 
 @lru_cache(4)
@@ -27,6 +55,71 @@ def get_zstd(i: int = 0):
     return zstd
 
 
+@lru_cache(16)
+def get_zstd_dict(dict_data: bytes):
+    """
+    A zstd dictionary built from its bytes, see `train_dict`
+    """
+    try:
+        from zstandard import ZstdCompressionDict
+    except ImportError:
+        raise ImportError("You need to install zstandard to use this function")
+    return ZstdCompressionDict(dict_data)
+
+
+def train_dict(samples: List[bytes], size: int = 16384) -> bytes:
+    """
+    Train a zstd dictionary over samples of encoded data.
+
+    Args:
+        samples (List[bytes]): uncompressed samples, such as encoded resources.
+        size (int): max size of the dictionary in bytes.
+
+    Returns:
+        bytes: the dictionary
+    """
+    try:
+        from zstandard import train_dictionary
+    except ImportError:
+        raise ImportError("You need to install zstandard to use this function")
+    return train_dictionary(size, samples).as_bytes()
+
+
+_local = threading.local()
+
+
+def get_zstd_ctx(i: int = 0, level: int = 3, dict_data: bytes = None, threads: int = 0):
+    """
+    A compressor (i is 0) or decompressor (i is 1) reused between calls.
+
+    zstd contexts must not be used by two threads at once, so every thread
+    keeps its own, one per compression level, dictionary and number of threads.
+    Compressors with `threads` (-1 for one per core) compress on that many threads.
+    """
+    ctxs = getattr(_local, "zstd", None)
+    if ctxs is None:
+        ctxs = _local.zstd = dict()
+    zstd_dict = None if dict_data is None else get_zstd_dict(dict_data)
+    dict_id = 0 if zstd_dict is None else zstd_dict.dict_id()
+    key = (i, level if i == 0 else 0, dict_id, threads if i == 0 else 0)
+    ctx = ctxs.get(key)
+    if ctx is None:
+        if i == 0:
+            ctx = get_zstd(0)(level=level, dict_data=zstd_dict, threads=threads)
+        else:
+            ctx = get_zstd(i)(dict_data=zstd_dict)
+        ctxs[key] = ctx
+    return ctx
+
+
+def get_dict_id(dict_data: bytes = None) -> int:
+    """
+    Returns:
+        int: the id of a zstd dictionary, 0 for no dictionary.
+    """
+    return 0 if dict_data is None else get_zstd_dict(dict_data).dict_id()
+
+
 @lru_cache(4)
 def get_encrypt():
     try:
@@ -62,21 +155,19 @@ def new_key() -> Tuple[bytes]:
 
 def encrypt(data: bytes, private_key: bytes, public_key: bytes) -> bytes:
     """
-    Encrypt data with ed25519 key
-    """
-    _, serialization = get_encrypt()
-    # 反序列化私钥
-    private_key = serialization.load_pem_private_key(
-        private_key,
-        password=None,
-    )
-    # 签名消息
-    signature = private_key.sign(data)
+    Sign data with an ed25519 key and check the signature with the public key.
 
-    # 验证签名
-    public_key = serialization.load_der_public_key(public_key)
-    public_key.verify(signature, data)
+    The parsed keys are cached, use `sign.Signer` to sign many messages.
+
+    Raises:
+        ValueError: If the public key does not match the private key.
+    """
+    from .sign import _cached_signer
 
+    signer = _cached_signer(private_key, public_key)
+    signature = signer.sign(data)
+    if not signer.verify(data, signature):
+        raise ValueError("the public key does not match the private key")
     return signature
 
 
@@ -101,24 +192,576 @@ def mkdir(path: str) -> int:
     return 0
 
 
+def _decode(stream, compact: Optional[str], dict_data: bytes = None, codec: Codec = JSON) -> dict:
+    """Decode a binary stream, decompressing it chunk by chunk with the `compact` compressor."""
+    if compact:
+        stream = get_compressor(compact).reader(stream, dict_data)
+    if codec is JSON:
+        text = io.TextIOWrapper(stream, encoding="utf-8")
+        try:
+            return json.load(text)
+        finally:
+            # the stream belongs to the caller, the wrapper must not close it
+            text.detach()
+    return codec.loads(stream.read())
+
+
+def _decode_buffer(
+    buffer, compact: Optional[str], dict_data: bytes = None, codec: Codec = JSON
+) -> dict:
+    """Decode a bytes-like object without copying it."""
+    if compact == "zstd":
+        # the zstd stream reader reads buffers in place
+        return _decode(buffer, compact, dict_data, codec)
+    if compact:
+        return codec.loads(get_compressor(compact).decompress(buffer, dict_data))
+    return codec.loads(buffer)
+
+
+def _compress(payload, compression: Optional[tuple], dict_data: bytes = None):
+    """Compress a payload with the compressor name, level and threads of `compression`."""
+    if compression is None:
+        return payload
+    name, level, threads = compression
+    return get_compressor(name).compress(payload, level, threads, dict_data)  # 压缩
+
+
+def _encode(
+    data: dict,
+    file,
+    compression: Optional[tuple],
+    stream: bool,
+    dict_data: bytes = None,
+    codec: Codec = JSON,
+) -> None:
+    """
+    Encode data to a binary file, compressed with the compressor name, level and
+    threads of `compression`, if any.
+
+    With `stream` the json codec encodes and compresses the data chunk by chunk, so
+    memory stays close to one chunk, but it uses the slower pure python json encoder.
+    """
+    if not stream or codec is not JSON:
+        file.write(_compress(codec.dumps(data), compression, dict_data))
+        return
+    if compression is not None:
+        name, level, threads = compression
+        writer = get_compressor(name).writer(file, level, threads, dict_data)
+    else:
+        writer = file
+    text = io.TextIOWrapper(writer, encoding="utf-8", write_through=True)
+    json.dump(data, text)
+    text.detach()
+    if compression is not None:
+        writer.close()
+
+
+def _check_dict(mc: "MicroCode", dict_data: Optional[bytes]) -> Optional[bytes]:
+    """Returns the dictionary the payload needs, None if it was compressed without one."""
+    if mc.dict_id == 0:
+        return None
+    if mc.dict_id != get_dict_id(dict_data):
+        raise ValueError(f"data needs the zstd dictionary {mc.dict_id}")
+    return dict_data
+
+
+def loads(
+    buffer,
+    *,
+    compact: bool = False,
+    micro_code: bool = False,
+    dict_data: bytes = None,
+    codec: str = "json",
+    encrypt: bool = False,
+    key=None,
+    stats: dict = None,
+    keys: Iterable[str] = None,
+) -> dict:
+    """
+    Load data from a bytes-like object, such as a slice of a mmap.
+
+    Binary values are slices of the buffer, see `blob`.
+
+    Args:
+        buffer (bytes-like): encoded data
+        compact (bool): the data is compressed, ignored if the data has a micro code.
+        micro_code (bool): the data must start with a micro code.
+        dict_data (bytes): zstd dictionary the data was compressed with.
+        codec (str): codec of the data, ignored if the data has a micro code.
+        encrypt (bool): the data must be signed, checked if `key` is given.
+        key (Union[Signer, bytes, str]): public or private key checking the signature
+            of signed data, see `sign.get_signer`.
+        stats (dict): add the seconds spent checking (verify), decompressing and decoding
+            the data, and the decoded bytes (bytes_decoded), to this dict. The steps then
+            run one after the other instead of streaming.
+        keys (Iterable[str]): only decode these keys of the "data" object, the returned
+            document only holds them, under "data". json payloads are scanned without
+            building the other values, see `selective`.
+
+    Returns:
+        dict: data
+    """
+    if stats is not None or keys is not None:
+        options = (compact, micro_code, dict_data, codec, encrypt, key)
+        return _loads_steps(buffer, options, stats, keys)
+    *unwrapped, blobs = _unwrap(buffer, compact, micro_code, dict_data, codec, encrypt, key)
+    return _attach_blobs(_decode_buffer(*unwrapped), blobs)
+
+
+def _unwrap(buffer, compact, micro_code, dict_data, codec, encrypt, key) -> tuple:
+    """
+    Check the micro code, signature and digests of encoded data.
+
+    Returns:
+        tuple: the payload, whether it is compressed, its dictionary, its codec and
+            its blobs, see `_blobs`.
+    """
+    from .mc import MAGIC, MicroCode
+
+    buffer = memoryview(buffer)
+    if buffer[: len(MAGIC)] == MAGIC:
+        mc = MicroCode.from_buffer(buffer)
+        dict_data = _check_dict(mc, dict_data)
+        payload = buffer[mc.size : mc.size + mc.payload_len]
+        trailer = buffer[mc.size + mc.payload_len : mc.blob_start]
+        _check_signature(mc, trailer, encrypt, key)
+        if mc.is_hash:
+            name, digests = _read_trailer(mc, trailer)
+            verify_buffer(payload, name, digests, mc.hash_block_size)
+        codec = get_codec_by_id(mc.codec_id)
+        return payload, _compact_type(mc), dict_data, codec, _blobs(mc, buffer)
+    if micro_code:
+        raise ValueError("missing micro code")
+    if encrypt and key is not None:
+        raise ValueError("missing signature")
+    return buffer, "zstd" if compact else None, dict_data, get_codec(codec), None
+
+
+def read_payload(path: str, *, compact: bool = False, dict_data: bytes = None) -> bytes:
+    """
+    Read the encoded payload of a file, decompressed, as written by its codec.
+
+    Binary values are references in it, see `blob`. Signatures are not checked.
+
+    Args:
+        path (str): file path
+        compact (bool): the file is compressed, ignored if the file has a micro code.
+        dict_data (bytes): zstd dictionary the file was compressed with.
+
+    Returns:
+        bytes: the payload
+    """
+    with open(path, "rb") as file:
+        buffer = file.read()
+    payload, compact_name, dict_data, _, _ = _unwrap(
+        buffer, compact, False, dict_data, "json", False, None
+    )
+    if compact_name:
+        return get_compressor(compact_name).decompress(payload, dict_data)
+    return bytes(payload)
+
+
+def _compact_type(mc: "MicroCode") -> Optional[str]:
+    """The compressor name of a file, None if it is not compressed."""
+    from .mc import MISSING
+
+    if not mc.is_compact:
+        return None
+    # files without a compact type were all written with zstd
+    return "zstd" if mc.compact_type is MISSING else get_compressor(mc.compact_type).name
+
+
+def _blobs(mc: "MicroCode", buffer) -> Optional[Tuple[memoryview, Optional[str]]]:
+    """The blob section of a file mapped or read in `buffer`, and the hash of the file."""
+    from .mc import HASH_NAMES
+
+    if not mc.blob_len:
+        return None
+    if len(buffer) < mc.file_size:
+        raise ValueError("truncated blob section")
+    section = memoryview(buffer)[mc.blob_start : mc.file_size]
+    return section, HASH_NAMES[mc.hash_type] if mc.is_hash else None
+
+
+def _attach_blobs(data: dict, blobs: Optional[Tuple[memoryview, Optional[str]]]) -> dict:
+    return data if blobs is None else blob.attach(data, *blobs)
+
+
+def _map_file(file) -> memoryview:
+    """
+    Map a file read-only, the mapping lives as long as a view of it.
+
+    The mapping keeps the data of the file even after it is replaced by an atomic write.
+    """
+    return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def _loads_steps(buffer, options: tuple, stats: Optional[dict], keys) -> dict:
+    """
+    `loads` one step at a time, adding the seconds and bytes of every step to `stats`,
+    and decoding only `keys` of the data if given.
+    """
+    start = time.perf_counter()
+    payload, compact, dict_data, codec, blobs = _unwrap(buffer, *options)
+    verified = time.perf_counter()
+    if compact:
+        payload = get_compressor(compact).decompress(payload, dict_data)
+    decompressed = time.perf_counter()
+    if keys is None:
+        data = codec.loads(payload)
+    elif codec.text:
+        data = pick(str(payload, "utf-8"), keys)
+    else:
+        keys = frozenset(keys)
+        doc = codec.loads(payload).get("data", {})
+        data = {"data": {name: value for name, value in doc.items() if name in keys}}
+    data = _attach_blobs(data, blobs)
+    end = time.perf_counter()
+    if stats is not None:
+        _add_stats(
+            stats,
+            verify=verified - start,
+            decompress=decompressed - verified,
+            decode=end - decompressed,
+            bytes_decoded=len(payload),
+        )
+    return data
+
+
+def _add_stats(stats: dict, **values) -> None:
+    for name, value in values.items():
+        stats[name] = stats.get(name, 0) + value
+
+
 def load(
-    path: str, *, compact: bool = False, encrypt: bool = False, micro_code: bool = False
+    path: str,
+    *,
+    compact: bool = False,
+    encrypt: bool = False,
+    micro_code: bool = False,
+    dict_data: bytes = None,
+    codec: str = "json",
+    cache: bool = False,
+    sidecar: bool = False,
+    key=None,
+    stats: dict = None,
+    keys: Iterable[str] = None,
 ) -> dict:
     """
     Load data from a file.
 
+    Files starting with a micro code are read according to it,
+    other files according to `compact` and `codec`. Binary values are slices of
+    a mmap of the file, see `blob`.
+
     Args:
         path (str): file path
+        compact (bool): the file is compressed, ignored if the file has a micro code.
+        micro_code (bool): the file must start with a micro code.
+        dict_data (bytes): zstd dictionary the file was compressed with.
+        codec (str): codec of the file, ignored if the file has a micro code.
+        cache (bool): use the process-wide `cache.parse_cache`, unchanged files
+            (same mtime, size and inode) are not read again.
+        sidecar (bool): load the decoded document from the sidecar of the file, see
+            `sidecar`, written when it is missing or stale. Files with binary values
+            and files whose signature is checked with `key` do not use it.
+        encrypt (bool): the file must be signed, checked if `key` is given.
+        key (Union[Signer, bytes, str]): public or private key checking the signature
+            of signed files, see `sign.get_signer`.
+        stats (dict): add the seconds spent reading the file (read) and the read bytes
+            (bytes_read) to this dict, and those of `loads`. A cached document counts
+            as a read of 0 bytes.
+        keys (Iterable[str]): only decode these keys of the "data" object, see `loads`.
+            The whole file is read, then decoded.
 
     Returns:
         dict: data
     """
-    if not compact:
-        with open(path, "r", encoding="utf-8") as file:
-            return json.load(file)
+    if key is not None:
+        from .sign import get_signer
+
+        key = get_signer(key)
+    with open(path, "rb") as file:
+        if sidecar and key is None:
+            options = (compact, micro_code, dict_data, codec, encrypt, key)
+            return _load_sidecar(file, path, options, cache, stats, keys)
+        if stats is not None or keys is not None:
+            options = (compact, micro_code, dict_data, codec, encrypt, key)
+            return _load_steps(file, path, options, cache, stats, keys)
+        if not cache:
+            return _load(file, path, compact, micro_code, dict_data, codec, encrypt, key)
+        cache_key = _cache_key(file, path, compact, micro_code, dict_data, codec, encrypt, key)
+        data = parse_cache.get(cache_key)
+        if data is None:
+            data = _load(file, path, compact, micro_code, dict_data, codec, encrypt, key)
+            parse_cache.put(cache_key, data)
+        return data
+
+
+def _cache_key(file, path, compact, micro_code, dict_data, codec, encrypt, key) -> tuple:
+    return parse_cache.key(
+        path,
+        os.fstat(file.fileno()),
+        compact,
+        micro_code,
+        get_dict_id(dict_data),
+        codec,
+        encrypt,
+        None if key is None else key.fingerprint,
+    )
+
+
+def _load_steps(
+    file, path: str, options: tuple, cache: bool, stats: Optional[dict], keys
+) -> dict:
+    """`load` reading the whole file first, see `_loads_steps`."""
+    if keys is not None:
+        keys = tuple(sorted(set(keys)))
+    start = time.perf_counter()
+    cache_key = None
+    if cache:
+        cache_key = _cache_key(file, path, *options) + (keys,)
+        data = parse_cache.get(cache_key)
+        if data is not None:
+            if stats is not None:
+                _add_stats(stats, read=time.perf_counter() - start, bytes_read=0)
+            return data
+    mc = _read_micro_code(file)
+    file.seek(0)
+    # the blobs are mapped, not read, as `_load` does
+    buffer = _map_file(file) if mc is not None and mc.blob_len else file.read()
+    if stats is not None:
+        _add_stats(stats, read=time.perf_counter() - start, bytes_read=len(buffer))
+    data = _loads_steps(buffer, options, stats, keys)
+    if cache_key is not None:
+        parse_cache.put(cache_key, data)
+    return data
+
+
+def _load_sidecar(
+    file, path: str, options: tuple, cache: bool, stats: Optional[dict], keys
+) -> dict:
+    """`load` through the sidecar of the file, the file is read to check its digest."""
+    mc = _read_micro_code(file)
+    file.seek(0)
+    if mc is not None and mc.blob_len:
+        # mapped blobs already load without decoding, and can not be marshalled
+        return _load_steps(file, path, options, cache, stats, keys)
+    if keys is not None:
+        keys = tuple(sorted(set(keys)))
+    start = time.perf_counter()
+    cache_key = None
+    if cache:
+        cache_key = _cache_key(file, path, *options) + (keys,)
+        data = parse_cache.get(cache_key)
+        if data is not None:
+            if stats is not None:
+                _add_stats(stats, read=time.perf_counter() - start, bytes_read=0)
+            return data
+    st = os.fstat(file.fileno())
+    source = file.read()
+    compact, micro_code, dict_data, codec, encrypt, _ = options
+    tag = options_tag(compact, micro_code, get_dict_id(dict_data), codec, encrypt, keys)
+    data = read_sidecar(path, source, st, tag)
+    if stats is not None:
+        _add_stats(stats, read=time.perf_counter() - start, bytes_read=len(source))
+    if data is None:
+        data = _loads_steps(source, options, stats, keys)
+        write_sidecar(path, source, st, tag, data)
+    if cache_key is not None:
+        parse_cache.put(cache_key, data)
+    return data
+
+
+def _load(file, path: str, compact, micro_code, dict_data, codec, encrypt=False, key=None) -> dict:
+    mc = _read_micro_code(file)
+    if mc is not None:
+        data = _load_payload(file, mc, dict_data, encrypt, key)
+        if mc.blob_len:
+            data = _attach_blobs(data, _blobs(mc, _map_file(file)))
+        return data
+    if micro_code:
+        raise ValueError(f"missing micro code: {path}")
+    if encrypt and key is not None:
+        raise ValueError(f"missing signature: {path}")
+    return _decode(file, "zstd" if compact else None, dict_data, get_codec(codec))
+
+
+def _load_payload(file, mc: "MicroCode", dict_data, encrypt, key) -> dict:
+    """Decode the payload of a file with a micro code, `file` is after the micro code."""
+    dict_data = _check_dict(mc, dict_data)
+    mc_codec = get_codec_by_id(mc.codec_id)
+    compact = _compact_type(mc)
+    if not mc.is_hash:
+        _check_signature(mc, b"", encrypt, key)
     else:
-        with open(path, "rb") as file:
-            return json.loads(get_zstd(1).decompress(file.read()).decode("utf-8"))
+        file.seek(mc.size + mc.payload_len)
+        trailer = file.read(mc.trailer_len)
+        _check_signature(mc, trailer, encrypt, key)
+        name, digests = _read_trailer(mc, trailer)
+        file.seek(mc.size)
+        # every block is checked as the decoder reads it
+        file = io.BufferedReader(
+            VerifyingReader(file, mc.payload_len, name, digests, mc.hash_block_size)
+        )
+        if not compact:
+            return _decode_buffer(file.read(), None, codec=mc_codec)
+    if compact and not mc.blob_len:
+        # the compressed stream ends with the file
+        return _decode(file, compact, dict_data, mc_codec)
+    return _decode_buffer(file.read(mc.payload_len), compact, dict_data, mc_codec)
+
+
+def _read_trailer(mc: "MicroCode", trailer) -> Tuple[str, List[bytes]]:
+    """The hash name and block digests of a hashed file."""
+    from .mc import HASH_NAMES
+
+    if mc.hash_block_size == 0 or len(trailer) != mc.trailer_len:
+        raise ValueError("truncated hash trailer")
+    name = HASH_NAMES[mc.hash_type]
+    return name, split_trailer(bytes(trailer), name)
+
+
+def _signed_message(mc: "MicroCode", trailer) -> bytes:
+    """What the signature of a file covers: the first block and the root digest."""
+    from .mc import HASH_NAMES
+
+    return mc.blocks[0] + bytes(trailer[-digest_size(HASH_NAMES[mc.hash_type]) :])
+
+
+def _check_signature(mc: "MicroCode", trailer, encrypt: bool, key) -> None:
+    """
+    Check the signature of a file if a key is given, every block is then checked
+    against the signed digests as it is read.
+
+    Raises:
+        ValueError: If the signature does not match, or `encrypt` and the file is not signed.
+    """
+    if key is None:
+        return
+    if not mc.is_encrypt or not mc.signature or not mc.is_hash:
+        if encrypt:
+            raise ValueError("missing signature")
+        return
+    from .sign import get_signer
+
+    if not get_signer(key).verify(_signed_message(mc, trailer), mc.signature):
+        raise ValueError("signature mismatch")
+
+
+def read_signature(path: str) -> Tuple[bytes, bytes]:
+    """
+    Read the signed message and signature of a signed file, the payload is not read.
+
+    Returns:
+        Tuple[bytes, bytes]: the message and its signature, see `sign.Signer.verify_many`.
+
+    Raises:
+        ValueError: If the file is not signed.
+    """
+    with open(path, "rb") as file:
+        mc = _read_micro_code(file)
+        if mc is None or not mc.signature or not mc.is_hash:
+            raise ValueError(f"missing signature: {path}")
+        file.seek(mc.size + mc.payload_len)
+        trailer = file.read(mc.trailer_len)
+        _read_trailer(mc, trailer)
+        return _signed_message(mc, trailer), mc.signature
+
+
+def buffer_signature(buffer) -> Tuple[bytes, bytes]:
+    """`read_signature` of a bytes-like object."""
+    from .mc import MAGIC, MicroCode
+
+    buffer = memoryview(buffer)
+    mc = MicroCode.from_buffer(buffer) if buffer[: len(MAGIC)] == MAGIC else None
+    if mc is None or not mc.signature or not mc.is_hash:
+        raise ValueError("missing signature")
+    trailer = buffer[mc.size + mc.payload_len : mc.blob_start]
+    _read_trailer(mc, trailer)
+    return _signed_message(mc, trailer), mc.signature
+
+
+def verify(path: str, start: int = 0, end: int = None) -> int:
+    """
+    Check the digests of the payload blocks holding bytes `start` to `end` of a hashed file,
+    the other blocks are not read.
+
+    Args:
+        path (str): file path
+        start (int): first payload byte to check.
+        end (int): payload byte after the last one to check. Defaults to the payload end.
+
+    Returns:
+        int: number of checked blocks
+
+    Raises:
+        ValueError: If the file has no hash or a block does not match its digest.
+    """
+    with open(path, "rb") as file:
+        mc = _read_micro_code(file)
+        if mc is None or not mc.is_hash:
+            raise ValueError(f"no hash: {path}")
+        file.seek(mc.size + mc.payload_len)
+        name, digests = _read_trailer(mc, file.read(mc.trailer_len))
+        end = mc.payload_len if end is None else min(end, mc.payload_len)
+        first, last = block_span(start, end, mc.hash_block_size)
+        for index in range(first, min(last, len(digests))):
+            offset = index * mc.hash_block_size
+            file.seek(mc.size + offset)
+            size = min(mc.hash_block_size, mc.payload_len - offset)
+            check_block(name, digests, index, file.read(size))
+        return max(0, min(last, len(digests)) - first)
+
+
+def _read_micro_code(file) -> "Optional[MicroCode]":
+    from .mc import MAGIC, MicroCode
+
+    if file.read(len(MAGIC)) == MAGIC:
+        file.seek(-len(MAGIC), os.SEEK_CUR)
+        return MicroCode.load_mc(file)
+    file.seek(0)
+    return None
+
+
+def read_header(path: str) -> "Optional[MicroCode]":
+    """
+    Read only the micro code of a file, the payload is not read.
+
+    Args:
+        path (str): file path
+
+    Returns:
+        Optional[MicroCode]: the micro code, None if the file has none.
+    """
+    with open(path, "rb") as file:
+        return _read_micro_code(file)
+
+
+def scan(root: str) -> "Iterator[Tuple[str, Optional[MicroCode], bool]]":
+    """
+    Scan the files under a directory, reading only their micro codes.
+
+    Args:
+        root (str): directory path
+
+    Yields:
+        Tuple[str, Optional[MicroCode], bool]: file path, its micro code (None if it
+            has none) and whether the file size matches the payload, trailer and blob lengths of
+            the micro code.
+    """
+    for dir_path, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(dir_path, name)
+            try:
+                mc = read_header(path)
+            except ValueError:
+                yield path, None, False
+                continue
+            if mc is None:
+                yield path, None, True
+            else:
+                yield path, mc, os.path.getsize(path) == mc.file_size
 
 
 def sync(
@@ -128,17 +771,267 @@ def sync(
     compact: bool = False,
     encrypt: bool = False,
     micro_code: bool = False,
+    data_type: bytes = b"\x00\x00\x00",
+    level: int = None,
+    stream: bool = False,
+    dict_data: bytes = None,
+    codec: str = "json",
+    atomic: bool = True,
+    hash_type: Optional[str] = KEEP,
+    key=None,
+    compact_type: str = "zstd",
+    threads: int = 0,
 ):
     """
     Sync data to a file.
+
+    Codecs that do not write json text always write a micro code,
+    so the file can be read back without naming the codec. So do compact types
+    other than zstd, and bytes-like values of the data object, which are written
+    raw after the payload, see `blob`.
+
+    Args:
+        data (dict): data
+        path (str): file path
+        compact (bool): compress the data with `compact_type`.
+        micro_code (bool): write a micro code before the data.
+        data_type (bytes): data type recorded in the micro code.
+        level (int): compression level, see `compress.Compressor`. Defaults to the
+            default level of the compressor, 3 for zstd. Not allowed with "auto",
+            whose profile sets the level.
+        stream (bool): encode and compress the data chunk by chunk, so the whole
+            encoded payload is never held in memory.
+        dict_data (bytes): zstd dictionary to compress the data with, see `train_dict`.
+        codec (str): codec to encode the data with, see `codec.list_codecs`.
+        atomic (bool): write a temporary file, fsync it and rename it over the file.
+            Otherwise binary values are copied first, as they may be views of the file.
+        hash_type (Optional[str]): hash the payload per block as it is written, and write
+            the digests after it, see `digest`. Implies a micro code. Defaults to `KEEP`,
+            the hash of the file that is overwritten, if any, so rewrites stay verified.
+            None for no hash.
+        key (Union[Signer, bytes, str]): with `encrypt`, the private key signing the
+            file, see `sign.get_signer`. The payload is hashed, sha256 by default, and
+            the root digest is signed.
+        compact_type (str): compressor, see `compress.list_compressors`, or "auto" to
+            choose it from the payload size, see `compress.choose`.
+        threads (int): zstd compression threads for payloads of at least
+            `compress.THREADS_MIN_SIZE`, -1 for one per core.
+    """
+    codec = get_codec(codec)
+    hash_type = _kept_hash(path, hash_type)
+    data, blobs = blob.split(data, hash_type or ("sha256" if encrypt else None))
+    if blobs is not None and not atomic:
+        blobs = [bytes(value) for value in blobs]
+    compression = payload = None
+    if compact:
+        if compact_type == AUTO and not (stream and codec is JSON):
+            # encode first, the payload size picks the compressor
+            payload = codec.dumps(data)
+        size = None if payload is None else len(payload)
+        compression = resolve(compact_type, level, threads, size, dict_data)
+    if payload is None:
+        write = lambda file: _encode(data, file, compression, stream, dict_data, codec)
+    else:
+        write = lambda file: file.write(_compress(payload, compression, dict_data))
+    _write_file(
+        path,
+        write,
+        None if compression is None else compression[0],
+        encrypt,
+        micro_code,
+        data_type,
+        dict_data,
+        codec,
+        atomic,
+        hash_type,
+        key,
+        blobs,
+    )
+
+
+def sync_bytes(
+    payload: bytes,
+    *,
+    path: str,
+    compact: bool = False,
+    encrypt: bool = False,
+    micro_code: bool = False,
+    data_type: bytes = b"\x00\x00\x00",
+    level: int = None,
+    dict_data: bytes = None,
+    codec: str = "json",
+    atomic: bool = True,
+    hash_type: Optional[str] = KEEP,
+    key=None,
+    compact_type: str = "zstd",
+    threads: int = 0,
+):
     """
+    Sync data that is already encoded with `codec` to a file, see `sync`.
+
+    Args:
+        payload (bytes): the encoded data, uncompressed.
+    """
+    codec = get_codec(codec)
+    hash_type = _kept_hash(path, hash_type)
+    compression = None
+    if compact:
+        compression = resolve(compact_type, level, threads, len(payload), dict_data)
+    _write_file(
+        path,
+        lambda file: file.write(_compress(payload, compression, dict_data)),
+        None if compression is None else compression[0],
+        encrypt,
+        micro_code,
+        data_type,
+        dict_data,
+        codec,
+        atomic,
+        hash_type,
+        key,
+    )
+
+
+def _kept_hash(path: str, hash_type: Optional[str]) -> Optional[str]:
+    """The hash to write a file with, `KEEP` is the hash of the file it overwrites."""
+    if hash_type != KEEP:
+        return hash_type
+    from .mc import HASH_NAMES
+
+    try:
+        mc = read_header(path)
+    except (OSError, ValueError):
+        return None
+    if mc is None or not mc.is_hash:
+        return None
+    return HASH_NAMES.get(mc.hash_type)
+
+
+def _write_file(
+    path: str,
+    write: Callable[[BinaryIO], None],
+    compact_type: Optional[str],
+    encrypt: bool,
+    micro_code: bool,
+    data_type: bytes,
+    dict_data: Optional[bytes],
+    codec: Codec,
+    atomic: bool,
+    hash_type: Optional[str] = None,
+    key=None,
+    blobs: Optional[List[memoryview]] = None,
+) -> None:
+    """
+    Write the micro code, if any, let `write` write the payload, compressed with
+    `compact_type` if any, then write the blobs.
+    """
+    signer = None
+    if encrypt:
+        from .sign import get_signer
+
+        signer = get_signer(key)
+        if signer is None:
+            raise ValueError("encrypt needs a key")
+        hash_type = hash_type or "sha256"
     if not os.path.exists(path):
         mkdir(path)
-    if not compact:
-        with open(path, "w", encoding="utf-8") as file:
-            json.dump(data, file)
-    else:
+    try:
+        with _open_write(path, atomic) as file:
+            plain = compact_type in (None, "zstd") and codec.text
+            if not micro_code and plain and not hash_type and blobs is None:
+                write(file)
+                return
+            from .mc import BLOB_BLOCK, HASH_NAMES, SIGNATURE_BLOCKS, VERSION
+            from .mc import CompactType, EncryptType, MicroCode, MISSING
+
+            if blobs is not None:
+                expand_len = BLOB_BLOCK + 1
+            else:
+                expand_len = SIGNATURE_BLOCKS[-1] + 1 if encrypt else 2 if hash_type else 1
+            mc = MicroCode(
+                is_compact=compact_type is not None,
+                is_encrypt=encrypt,
+                is_hash=bool(hash_type),
+                expand_len=expand_len,
+            )
+            dict_id = get_dict_id(dict_data) if compact_type == "zstd" else 0
+            compact_type = MISSING if compact_type is None else CompactType[compact_type.upper()]
+            encrypt_type = EncryptType.ED25519 if encrypt else MISSING
+            first_block = dict(data_type=data_type, dict_id=dict_id, codec_id=codec.codec_id)
+            if hash_type:
+                first_block["hash_type"] = {v: k for k, v in HASH_NAMES.items()}[hash_type]
+            mc.set_first_block(VERSION, compact_type, encrypt_type, **first_block)
+            mc.dump_mc(file)
+            if hash_type:
+                writer = HashingWriter(file, hash_type)
+                write(writer)
+            else:
+                write(file)
+            # the payload length is only known once it is written
+            mc.set_first_block(
+                VERSION,
+                compact_type,
+                encrypt_type,
+                payload_len=file.tell() - mc.size,
+                **first_block,
+            )
+            if hash_type:
+                trailer = writer.trailer()
+                file.write(trailer)
+                mc.set_hash_block(writer.block_size, len(trailer))
+            if signer is not None:
+                mc.set_signature(signer.sign(_signed_message(mc, trailer)))
+            if blobs is not None:
+                for value in blobs:
+                    file.write(value)
+                mc.set_blob_block(sum(map(len, blobs)))
+            file.seek(0)
+            mc.dump_mc(file)
+    finally:
+        # also drops what a concurrent load cached while the file was written
+        parse_cache.invalidate(path)
+
+
+@contextmanager
+def _open_write(path: str, atomic: bool) -> Iterator[BinaryIO]:
+    """
+    Open a file for writing.
+
+    If `atomic`, a temporary file next to it is written, flushed to disk and renamed
+    over the file, so a crash leaves either the old or the new file, never a partial one.
+    """
+    if not atomic:
         with open(path, "wb") as file:
-            file.write(
-                get_zstd(0).compress(json.dumps(data).encode("utf-8"))
-            )  # 压缩并写入文件
+            yield file
+        return
+    dir_path, name = os.path.split(os.path.abspath(path))
+    tmp = os.path.join(dir_path, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        try:
+            shutil.copymode(path, tmp)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    _fsync_dir(dir_path)
+
+
+def _fsync_dir(dir_path: str) -> None:
+    # makes the rename durable, not possible on every platform
+    try:
+        fd = os.open(dir_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -1,10 +1,47 @@
-from typing import TYPE_CHECKING
+"""
+MicroCode, the fixed-size binary header of data files
+
+Layout:
+    magic       b"RCMC"
+    base code   16 ascii bytes: identifier (4), compact (1), encrypt (1), prime (3),
+                hash (1), expand_len (6, binary digits)
+    blocks      expand_len blocks of BLOCK_SIZE bytes, the first block holds the
+                version, data type, compact/encrypt/hash types, payload length,
+                zstd dictionary id and codec id, the second block of a hashed file
+                holds the hash block size and trailer length, see `digest`, the third
+                and fourth blocks of a signed file hold the ed25519 signature of the
+                root digest, see `sign`, the fifth block of a file with binary fields
+                holds the blob section length
+    payload     payload_len bytes
+    trailer     trailer_len bytes of digests, only in hashed files
+    blobs       blob_len bytes, the raw values of binary fields, see `blob`
+"""
+
+import struct
+from typing import TYPE_CHECKING, List, Union
 from enum import Enum
 
-from .base import MISSING, Version
+from .base import MISSING, Version, _MISSING_TYPE
 
 if TYPE_CHECKING:
-    from io import TextIOWrapper
+    from io import BufferedReader, BufferedWriter
+
+
+MAGIC = b"RCMC"
+BASE_CODE_SIZE = 16
+BLOCK_SIZE = 32
+VERSION = Version("1.0.0")
+
+_NONE = b"\x00\x00\x00\x00"
+# version, data type, compact type, encrypt type, hash type, payload length, dictionary id,
+# codec id
+_FIRST_BLOCK = struct.Struct(">3B3s4s4s4sQIBx")
+# hash block size, trailer length
+_HASH_BLOCK = struct.Struct(">IQ")
+SIGNATURE_BLOCKS = (2, 3)
+# blob section length
+_BLOB_BLOCK = struct.Struct(">Q")
+BLOB_BLOCK = 4
 
 
 class CompactType(Enum):
@@ -28,10 +65,35 @@ class HashType(Enum):
     SHA_512 = b"0010"
 
 
+# hashlib names of the hash types
+HASH_NAMES = {HashType.SHA_256: "sha256", HashType.SHA_384: "sha384", HashType.SHA_512: "sha512"}
+
+
+def _dump_type(value: Union[Enum, _MISSING_TYPE]) -> bytes:
+    return _NONE if value is MISSING else value.value
+
+
+def _load_type(enum: type, value: bytes) -> Union[Enum, _MISSING_TYPE]:
+    return MISSING if value == _NONE else enum(value)
+
+
 class MicroCode(object):
 
     def __init__(self, **kw):
         self.set_base_code(**kw)
+        self.blocks: List[bytes] = [bytes(BLOCK_SIZE)] * self.expand_len
+        self.version = VERSION
+        self.data_type = b"\x00\x00\x00"
+        self.compact_type = MISSING
+        self.encrypt_type = MISSING
+        self.hash_type = MISSING
+        self.payload_len = 0
+        self.dict_id = 0
+        self.codec_id = 0
+        self.hash_block_size = 0
+        self.trailer_len = 0
+        self.signature = b""
+        self.blob_len = 0
 
     def set_base_code(
         self,
@@ -50,7 +112,7 @@ class MicroCode(object):
         self.is_hash = is_hash
         if expand_len < 0:
             raise ValueError("expand_len must be greater than or equal to 0")
-        if is_compact or is_encrypt and expand_len == 0:
+        if (is_compact or is_encrypt) and expand_len == 0:
             raise ValueError(
                 "expand_len must be greater than 0 when is_compact is True or is_encrypt is True"
             )
@@ -64,20 +126,183 @@ class MicroCode(object):
                 b"1" if self.is_encrypt else b"0",
                 self.prime,
                 b"1" if self.is_hash else b"0",
-                bin(self.expand_len).replace("0b", "").rjust(4, "0").encode(),
+                bin(self.expand_len).replace("0b", "").rjust(6, "0").encode(),
             ]
         )
 
+    @property
+    def size(self) -> int:
+        """Size of the whole header, in bytes."""
+        return len(MAGIC) + BASE_CODE_SIZE + self.expand_len * BLOCK_SIZE
+
+    @property
+    def blob_start(self) -> int:
+        """Offset of the blob section, after the payload and trailer."""
+        return self.size + self.payload_len + self.trailer_len
+
+    @property
+    def file_size(self) -> int:
+        """Size of the whole file, in bytes."""
+        return self.blob_start + self.blob_len
+
+    def set_hash_block(self, hash_block_size: int, trailer_len: int) -> None:
+        """
+        Set the second block, describing the hash trailer.
+
+        Args:
+            hash_block_size (int): payload bytes per hashed block.
+            trailer_len (int): length of the trailer after the payload.
+        """
+        self.hash_block_size = hash_block_size
+        self.trailer_len = trailer_len
+        self.set_block(1, _HASH_BLOCK.pack(hash_block_size, trailer_len))
+
+    def set_blob_block(self, blob_len: int) -> None:
+        """Set the fifth block, holding the length of the blob section."""
+        self.blob_len = blob_len
+        self.set_block(BLOB_BLOCK, _BLOB_BLOCK.pack(blob_len))
+
     def set_first_block(
         self,
         version: Version,
         compact_type: CompactType = MISSING,
         encrypt_type: EncryptType = MISSING,
-        **kw): ...
+        **kw):
+        """
+        Set the first block.
+
+        Args:
+            version (Version): version of the format.
+            compact_type (CompactType, optional): codec of the payload.
+            encrypt_type (EncryptType, optional): signature of the payload.
+            hash_type (HashType, optional): hash of the payload.
+            data_type (bytes, optional): data type, see `BaseData`.
+            payload_len (int, optional): length of the payload after the header.
+            dict_id (int, optional): id of the zstd dictionary of the payload, 0 for none.
+            codec_id (int, optional): id of the codec of the payload, see `codec.Codec`.
+        """
+        self.version = version
+        self.compact_type = compact_type
+        self.encrypt_type = encrypt_type
+        self.hash_type = kw.get("hash_type", self.hash_type)
+        self.data_type = kw.get("data_type", self.data_type)
+        self.payload_len = kw.get("payload_len", self.payload_len)
+        self.dict_id = kw.get("dict_id", self.dict_id)
+        self.codec_id = kw.get("codec_id", self.codec_id)
+        self.set_block(
+            0,
+            _FIRST_BLOCK.pack(
+                *self.version.version,
+                self.data_type,
+                _dump_type(self.compact_type),
+                _dump_type(self.encrypt_type),
+                _dump_type(self.hash_type),
+                self.payload_len,
+                self.dict_id,
+                self.codec_id,
+            ),
+        )
+
+    def set_signature(self, signature: bytes) -> None:
+        """Set the third and fourth blocks, holding a 64 bytes signature."""
+        if len(signature) != 2 * BLOCK_SIZE:
+            raise ValueError(f"signature must be {2 * BLOCK_SIZE} bytes")
+        self.signature = signature
+        for i, block in enumerate(SIGNATURE_BLOCKS):
+            self.set_block(block, signature[i * BLOCK_SIZE : (i + 1) * BLOCK_SIZE])
+
+    @classmethod
+    def from_buffer(cls, buffer) -> "MicroCode":
+        """
+        Parse a header from the start of a bytes-like object.
+
+        Raises:
+            ValueError: If the buffer does not start with a header.
+        """
+        base_end = len(MAGIC) + BASE_CODE_SIZE
+        if len(buffer) < base_end or bytes(buffer[: len(MAGIC)]) != MAGIC:
+            raise ValueError("missing micro code")
+        code = bytes(buffer[len(MAGIC) : base_end])
+        mc = cls(
+            identifier=code[:4],
+            is_compact=code[4:5] == b"1",
+            is_encrypt=code[5:6] == b"1",
+            prime=code[6:9],
+            is_hash=code[9:10] == b"1",
+            expand_len=int(code[10:16], 2),
+        )
+        if len(buffer) < mc.size:
+            raise ValueError("truncated micro code")
+        for i in range(mc.expand_len):
+            start = base_end + i * BLOCK_SIZE
+            mc.blocks[i] = bytes(buffer[start : start + BLOCK_SIZE])
+        if mc.expand_len:
+            (
+                major,
+                minor,
+                patch,
+                data_type,
+                compact,
+                encrypt,
+                hash_,
+                payload_len,
+                dict_id,
+                codec_id,
+            ) = _FIRST_BLOCK.unpack(mc.blocks[0])
+            mc.version = Version(f"{major}.{minor}.{patch}")
+            mc.data_type = data_type
+            mc.compact_type = _load_type(CompactType, compact)
+            mc.encrypt_type = _load_type(EncryptType, encrypt)
+            mc.hash_type = _load_type(HashType, hash_)
+            mc.payload_len = payload_len
+            mc.dict_id = dict_id
+            mc.codec_id = codec_id
+        if mc.is_hash and mc.expand_len > 1:
+            mc.hash_block_size, mc.trailer_len = _HASH_BLOCK.unpack_from(mc.blocks[1])
+        if mc.is_encrypt and mc.expand_len > SIGNATURE_BLOCKS[-1]:
+            mc.signature = b"".join(mc.blocks[block] for block in SIGNATURE_BLOCKS)
+        if mc.expand_len > BLOB_BLOCK:
+            (mc.blob_len,) = _BLOB_BLOCK.unpack_from(mc.blocks[BLOB_BLOCK])
+        return mc
 
     @classmethod
-    def load_mc(cls, fp: "TextIOWrapper") -> "MicroCode": ...
+    def load_mc(cls, fp: "BufferedReader") -> "MicroCode":
+        """
+        Read a header from a binary file, leaving it at the start of the payload.
+
+        Raises:
+            ValueError: If the file does not start with a header.
+        """
+        head = fp.read(len(MAGIC) + BASE_CODE_SIZE)
+        if len(head) < len(MAGIC) + BASE_CODE_SIZE or head[: len(MAGIC)] != MAGIC:
+            raise ValueError("missing micro code")
+        expand_len = int(head[-6:], 2)
+        return cls.from_buffer(head + fp.read(expand_len * BLOCK_SIZE))
+
+    def dump_mc(self, fp: "BufferedWriter") -> None:
+        """Write the header to a binary file."""
+        fp.write(self.to_bytes())
 
-    def dump_mc(self, fp: "TextIOWrapper") -> None: ...
+    def to_bytes(self) -> bytes:
+        return b"".join([MAGIC, self._mc, *self.blocks])
 
-    def set_block(self, block_num: int, block: bytes) -> None: ...
+    def set_block(self, block_num: int, block: bytes) -> None:
+        """
+        Set a block, shorter blocks are padded with zero bytes.
+
+        Raises:
+            IndexError: If the block is out of `expand_len`.
+            ValueError: If the block is longer than `BLOCK_SIZE`.
+        """
+        if not 0 <= block_num < self.expand_len:
+            raise IndexError("block_num out of expand_len")
+        if len(block) > BLOCK_SIZE:
+            raise ValueError(f"block must be at most {BLOCK_SIZE} bytes")
+        self.blocks[block_num] = bytes(block).ljust(BLOCK_SIZE, b"\x00")
+
+    def __repr__(self) -> str:
+        return (
+            f"MicroCode(version={self.version}, compact_type={self.compact_type}, "
+            f"encrypt_type={self.encrypt_type}, hash_type={self.hash_type}, "
+            f"payload_len={self.payload_len})"
+        )
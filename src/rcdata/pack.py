@@ -0,0 +1,199 @@
+"""
+Packed resource archive, holding every resource of an index in one file
+
+Layout (all integers are big endian):
+    header  magic b"RCPK", format version (H), entry count (I), names size (I)
+    table   one fixed-size block per entry: data offset (Q), data length (Q),
+            name offset (I), name length (H), compact flag (B)
+    names   utf-8 names of the entries, back to back
+    data    the resource files, unchanged
+"""
+
+import os
+import mmap
+import shutil
+import struct
+import argparse
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple, Union
+
+from .io import mkdir
+
+if TYPE_CHECKING:
+    from .res import ResourceIndex
+
+MAGIC = b"RCPK"
+VERSION = 1
+
+_HEADER = struct.Struct(">4sHII")
+_ENTRY = struct.Struct(">QQIHB")
+
+
+class PackedArchive:
+    """
+    A read-only view of a packed archive.
+
+    The archive is mapped into memory, `get` returns a memoryview over the
+    mapping, so reading a resource does not copy it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as file:
+            self._mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+        magic, version, count, names_size = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a packed archive")
+        if version != VERSION:
+            raise ValueError(f"unsupported archive version: {version}")
+        names_start = _HEADER.size + count * _ENTRY.size
+        names = self._mm[names_start : names_start + names_size]
+        self.entries: Dict[str, Tuple[int, int, bool]] = dict()
+        for i in range(count):
+            offset, length, name_offset, name_len, compact = _ENTRY.unpack_from(
+                self._mm, _HEADER.size + i * _ENTRY.size
+            )
+            name = names[name_offset : name_offset + name_len].decode("utf-8")
+            self.entries[name] = (offset, length, bool(compact))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, name: str) -> memoryview:
+        """
+        Args:
+            name (str): entry name, as listed in the index.
+
+        Returns:
+            memoryview: the encoded resource, a slice of the mapped archive.
+        """
+        offset, length, _ = self.entries[name]
+        return self._view[offset : offset + length]
+
+    def size(self, name: str) -> int:
+        return self.entries[name][1]
+
+    def close(self) -> None:
+        self._view.release()
+        self._mm.close()
+
+    def __enter__(self) -> "PackedArchive":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def pack(root: str, file_list: List[str], path: str) -> int:
+    """
+    Pack resource files into an archive.
+
+    Args:
+        root (str): directory holding the resources.
+        file_list (List[str]): resource names, relative to `root`.
+        path (str): archive path.
+
+    Returns:
+        int: number of packed resources
+    """
+    encoded = [name.encode("utf-8") for name in file_list]
+    sizes = [os.path.getsize(os.path.join(root, name)) for name in file_list]
+    names_size = sum(map(len, encoded))
+    offset = _HEADER.size + len(file_list) * _ENTRY.size + names_size
+    if not os.path.exists(path):
+        mkdir(path)
+    with open(path, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, len(file_list), names_size))
+        name_offset = 0
+        for name, raw, size in zip(file_list, encoded, sizes):
+            compact = name.endswith(".cresource")
+            file.write(_ENTRY.pack(offset, size, name_offset, len(raw), compact))
+            offset += size
+            name_offset += len(raw)
+        for raw in encoded:
+            file.write(raw)
+        for name in file_list:
+            with open(os.path.join(root, name), "rb") as res:
+                shutil.copyfileobj(res, file)
+    return len(file_list)
+
+
+def unpack(path: str, root: str) -> int:
+    """
+    Unpack an archive back into resource files.
+
+    Args:
+        path (str): archive path.
+        root (str): directory to write the resources to.
+
+    Returns:
+        int: number of unpacked resources
+
+    Raises:
+        ValueError: an entry name is absolute or leads out of `root`.
+    """
+    with PackedArchive(path) as archive:
+        # every name is checked before anything is written
+        targets = {name: _target(root, name) for name in archive}
+        for name, out in targets.items():
+            if not os.path.exists(out):
+                mkdir(out)
+            with open(out, "wb") as file:
+                file.write(archive.get(name))
+        return len(archive)
+
+
+def _target(root: str, name: str) -> str:
+    """
+    The path to unpack an entry to, the entry names come from the archive, so they are
+    resolved, symlinks included, and must stay inside `root`.
+    """
+    base = os.path.realpath(root)
+    out = os.path.realpath(os.path.join(base, name))
+    if not name or os.path.isabs(name) or os.path.commonpath([base, out]) != base or out == base:
+        raise ValueError(f"unsafe entry name in archive: {name!r}")
+    return out
+
+
+def pack_index(index: Union[str, "ResourceIndex"], path: str = None) -> int:
+    """
+    Pack every resource of an index, next to the index by default.
+
+    Args:
+        index (Union[str, ResourceIndex]): the index, or the path to it.
+        path (str, optional): archive path. Defaults to the index root with a ".pack" extension.
+
+    Returns:
+        int: number of packed resources
+    """
+    from .res import ResourceIndex
+
+    if isinstance(index, str):
+        index = ResourceIndex(index, lazy=True)
+    return pack(index.root, index.file_list, path or index.root + ".pack")
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m rcdata.pack")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack_parser = sub.add_parser("pack", help="pack the resources of an index")
+    pack_parser.add_argument("index")
+    pack_parser.add_argument("-o", "--output", default=None)
+    unpack_parser = sub.add_parser("unpack", help="unpack an archive")
+    unpack_parser.add_argument("archive")
+    unpack_parser.add_argument("root")
+    args = parser.parse_args(argv)
+    if args.command == "pack":
+        print(f"packed {pack_index(args.index, args.output)} resources")
+    else:
+        print(f"unpacked {unpack(args.archive, args.root)} resources")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,27 @@
 import os
-from typing import Tuple
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from .aio import MAX_WORKERS, gather, run
 from .base import BaseData, Field
+from .digest import file_digest, get_hash, parse_digest
+from .codec import get_codec_by_id
+from .io import (
+    _compact_type,
+    _open_write,
+    buffer_signature,
+    load,
+    read_header,
+    read_payload,
+    read_signature,
+    sync,
+    train_dict,
+)
+from .sign import get_signer
+from .pack import PackedArchive
 
 
 def get_file_extension(file_path: str) -> Tuple[str, str]:
@@ -8,7 +29,12 @@ def get_file_extension(file_path: str) -> Tuple[str, str]:
 
 
 class Resource(BaseData):
-    """The `Resource` class is a subclass of `BaseData` and is used to represent a resource file."""
+    """
+    The `Resource` class is a subclass of `BaseData` and is used to represent a resource file.
+
+    Subclasses may declare binary fields, `Field(b"", bytes)`, for images or model
+    weights, which are stored raw and loaded without copies, see `blob`.
+    """
 
     name = Field("", str)
 
@@ -18,8 +44,10 @@ class Resource(BaseData):
             compact = False
         elif extension == ".cresource":
             compact = True
-        if encrypt:
-            self.key = kw.pop("key")
+        else:
+            raise ValueError(f"unknown resource extension: {extension}")
+        key = kw.pop("key", None)
+        self.key = key if encrypt else None
         super().__init__(
             path=path,
             data_type=b"\x00\x01\x00",
@@ -33,19 +61,177 @@ class Resource(BaseData):
         )
 
 
+@lru_cache(1)
+def _open_archive(path: str) -> PackedArchive:
+    # one mapping per worker process
+    return PackedArchive(path)
+
+
+def _load_resource(
+    args: Tuple[str, str, Optional[str], Union[PackedArchive, str, None], Optional[bytes]],
+) -> Tuple[str, Optional[Resource], Optional[Exception]]:
+    """Load one resource, returning the error instead of raising, so it can run on a pool."""
+    file, path, key, archive, dict_data = args
+    try:
+        if archive is None:
+            buffer = None
+        else:
+            if isinstance(archive, str):
+                archive = _open_archive(archive)
+            buffer = archive.get(file)
+        res = Resource(
+            path, encrypt=key is not None, key=key, buffer=buffer, compact_dict=dict_data
+        )
+        return file, res, None
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        return file, None, e
+
+
+_EXECUTORS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+
+class ResourceCache:
+    """
+    A LRU cache of loaded resources.
+
+    Attributes:
+        max_entries (int): max number of cached resources, 0 for no limit.
+        max_bytes (int): max total on-disk size of cached resources, 0 for no limit.
+        hits (int): number of lookups served from the cache.
+        misses (int): number of lookups that had to load the resource.
+        evictions (int): number of resources dropped to stay within the limits.
+    """
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 0) -> None:
+        if max_entries < 0 or max_bytes < 0:
+            raise ValueError("max_entries and max_bytes must be greater than or equal to 0")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[str, Tuple[Resource, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._data
+
+    def get(self, name: str, loader: Callable[[str], Tuple[Resource, int]]) -> Resource:
+        """
+        Get a resource from the cache, loading it with `loader` on a miss.
+
+        Args:
+            name (str): resource name, as listed in the index.
+            loader (Callable): called with `name`, returns the resource and its size.
+
+        Returns:
+            Resource: the cached or newly loaded resource.
+        """
+        with self._lock:
+            item = self._data.get(name)
+            if item is not None:
+                self._data.move_to_end(name)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+        # load outside the lock, so a slow file does not block other lookups
+        res, size = loader(name)
+        with self._lock:
+            old = self._data.pop(name, None)
+            if old is not None:
+                self.size -= old[1]
+            self._data[name] = (res, size)
+            self.size += size
+            self._evict()
+        return res
+
+    def _evict(self) -> None:
+        while len(self._data) > 1 and (
+            (self.max_entries and len(self._data) > self.max_entries)
+            or (self.max_bytes and self.size > self.max_bytes)
+        ):
+            _, (_, size) = self._data.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: hits, misses, evictions, entries and bytes of the cache.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._data),
+            "bytes": self.size,
+        }
+
+
 class ResourceIndex(BaseData):
-    """The `ResourceIndex` class is a subclass of `BaseData` and is used to index resource file."""
+    """
+    The `ResourceIndex` class is a subclass of `BaseData` and is used to index resource file.
+
+    Attributes:
+        lazy (bool, optional): load resources on first access instead of on init. Defaults to False.
+        cache_size (int, optional): max number of resources kept by a lazy index, 0 for no limit.
+            Defaults to 128.
+        cache_bytes (int, optional): max on-disk size of resources kept by a lazy index,
+            0 for no limit. Defaults to 0.
+        workers (int, optional): number of pool workers used by `load_res`, 0 to load serially.
+            Defaults to 0.
+        executor (str, optional): pool used by `load_res`, "thread" or "process".
+            Defaults to "thread".
+        archive (bool, optional): read the resources from the packed archive next to the index
+            (the index root with a ".pack" extension) instead of separate files. Defaults to False.
+
+    Compact resources are read with the zstd dictionary next to the index (the index root
+    with a ".dict" extension) if there is one, see `train_dict`.
+
+    After `load_res`, `res_errors` maps every file that failed to load to its exception,
+    and `res_load_time` holds the wall-clock seconds the load took.
+
+    `file_hash` maps resources to the "name:hexdigest" digest of their file, see
+    `update_hash` and `check_hash`, and `file_stat` to the [size, mtime_ns] of the file
+    when it was hashed, see `build.build_index`.
+    """
 
     file_list = Field([], list)
     file_hash = Field({}, dict)
+    file_stat = Field({}, dict)
 
-    def __init__(self, path: str, key: str = None, /, **kw) -> None:
+    def __init__(
+        self,
+        path: str,
+        key: str = None,
+        /,
+        lazy: bool = False,
+        cache_size: int = 128,
+        cache_bytes: int = 0,
+        workers: int = 0,
+        executor: str = "thread",
+        archive: bool = False,
+        **kw,
+    ) -> None:
+        if executor not in _EXECUTORS:
+            raise ValueError(f"executor must be one of {list(_EXECUTORS)}")
         self.root, extension = get_file_extension(path)
         self.key = key
         if extension == ".index":
             compact = False
         elif extension == ".cindex":
             compact = True
+        else:
+            raise ValueError(f"unknown index extension: {extension}")
         super().__init__(
             path=path,
             data_type=b"\x00\x01\x01",
@@ -55,19 +241,293 @@ class ResourceIndex(BaseData):
             encrypt=False,
             **kw,
         )
+        self.lazy = lazy
+        self.archive = PackedArchive(self.root + ".pack") if archive else None
+        self.dict_data = self._read_dict()
+        self.workers = workers
+        self.executor = executor
         self.res_dict = dict()
-        self.load_res()
+        self.res_errors: Dict[str, Exception] = dict()
+        self.res_load_time = 0.0
+        if lazy:
+            self.res_cache = ResourceCache(cache_size, cache_bytes)
+            self._file_set = frozenset(self.file_list)
+        else:
+            self.res_cache = None
+            self.load_res()
+
+    def _read_dict(self) -> Optional[bytes]:
+        try:
+            with open(self.root + ".dict", "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _task(self, file: str, archive: Union[PackedArchive, str, None]) -> tuple:
+        return (file, os.path.join(self.root, file), self.key, archive, self.dict_data)
+
+    def _load_one(self, file: str) -> Tuple[Resource, int]:
+        _, res, error = _load_resource(self._task(file, self.archive))
+        if error is not None:
+            raise error
+        if self.archive is None:
+            return res, os.path.getsize(res._path)
+        return res, self.archive.size(file)
+
+    def load_res(self, workers: int = None, executor: str = None) -> None:
+        """
+        Load every resource of the index.
 
-    def load_res(self) -> None:
-        if self.key is not None:
-            encrypt = True
-        for file in self.file_list:
-            try:
+        Args:
+            workers (int, optional): overrides the `workers` given on init.
+            executor (str, optional): overrides the `executor` given on init.
+        """
+        workers = self.workers if workers is None else workers
+        executor = self.executor if executor is None else executor
+        archive = self.archive
+        if archive is not None and workers > 0 and executor == "process":
+            # a mapping can not be pickled, every worker maps the archive itself
+            archive = archive.path
+        tasks = [self._task(file, archive) for file in self.file_list]
+        start = time.perf_counter()
+        if workers > 0:
+            with _EXECUTORS[executor](max_workers=workers) as pool:
+                self._collect_res(pool, tasks, workers)
+        else:
+            for file, res, error in map(_load_resource, tasks):
+                self._add_res(file, res, error)
+        self.res_load_time = time.perf_counter() - start
+
+    async def aload_res(self, limit: int = None) -> None:
+        """
+        Load every resource of the index on the `aio` thread pool, see `load_res`.
+
+        Args:
+            limit (int, optional): max number of resources loaded at once. Defaults to
+                `workers`, or `aio.MAX_WORKERS` if it is 0.
+        """
+        limit = limit or self.workers or MAX_WORKERS
+        tasks = [self._task(file, self.archive) for file in self.file_list]
+        start = time.perf_counter()
+        results = await gather((partial(_load_resource, task) for task in tasks), limit)
+        for file, res, error in results:
+            self._add_res(file, res, error)
+        self.res_load_time = time.perf_counter() - start
+
+    def _collect_res(self, pool: Executor, tasks: list, workers: int) -> None:
+        # big chunks keep the pickling overhead of a process pool down
+        chunksize = max(1, len(tasks) // (workers * 4))
+        for file, res, error in pool.map(_load_resource, tasks, chunksize=chunksize):
+            self._add_res(file, res, error)
+
+    def _add_res(self, file: str, res: Optional[Resource], error: Optional[Exception]) -> None:
+        if error is None:
+            self.res_dict[file] = res
+            self.res_errors.pop(file, None)
+        else:
+            self.res_errors[file] = error
+
+    def _digest(self, file: str, name: str) -> Optional[str]:
+        try:
+            if self.archive is not None:
+                return get_hash(name)(self.archive.get(file)).hexdigest()
+            with open(os.path.join(self.root, file), "rb") as res:
+                return file_digest(res, name)
+        except (OSError, KeyError):
+            return None
+
+    def _map_digests(self, items: list, workers: Optional[int]) -> list:
+        # hashlib releases the gil on large buffers, so threads hash in parallel
+        workers = workers or self.workers or MAX_WORKERS
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda item: self._digest(*item), items))
+
+    def update_hash(self, name: str = "sha256", workers: int = None) -> Dict[str, str]:
+        """
+        Hash every resource file into `file_hash`, the index file is not written.
+
+        Args:
+            name (str, optional): hash, see `digest.HASH_NAMES`. Defaults to "sha256".
+            workers (int, optional): hashing threads. Defaults to `workers`, or
+                `aio.MAX_WORKERS` if it is 0.
+
+        Returns:
+            Dict[str, str]: the new `file_hash`, without the files that can not be read.
+        """
+        get_hash(name)
+        digests = self._map_digests([(file, name) for file in self.file_list], workers)
+        self.file_hash = {
+            file: f"{name}:{digest}"
+            for file, digest in zip(self.file_list, digests)
+            if digest is not None
+        }
+        return self.file_hash
+
+    def check_hash(self, workers: int = None) -> Dict[str, Optional[str]]:
+        """
+        Check every resource file against its digest in `file_hash`, on a thread pool.
+
+        Args:
+            workers (int, optional): hashing threads. Defaults to `workers`, or
+                `aio.MAX_WORKERS` if it is 0.
+
+        Returns:
+            Dict[str, Optional[str]]: the files that do not match, with their actual digest,
+                None if the file can not be read.
+        """
+        expected = {file: parse_digest(value) for file, value in self.file_hash.items()}
+        items = [(file, name) for file, (name, _) in expected.items()]
+        digests = self._map_digests(items, workers)
+        return {
+            file: None if digest is None else f"{name}:{digest}"
+            for (file, name), digest in zip(items, digests)
+            if digest != expected[file][1]
+        }
+
+    def _read_signature(self, file: str) -> Optional[Tuple[bytes, bytes]]:
+        try:
+            if self.archive is not None:
+                return buffer_signature(self.archive.get(file))
+            return read_signature(os.path.join(self.root, file))
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def check_signatures(self, key=None, workers: int = None) -> Dict[str, str]:
+        """
+        Check the signature of every resource, reading only their headers and digests.
+
+        The key is parsed once, and large indexes are verified on a thread pool, see
+        `sign.Signer.verify_many`. A valid signature vouches for the digests, which are
+        checked against the payload when a resource is loaded.
+
+        Args:
+            key (optional): public or private key. Defaults to the key of the index.
+            workers (int, optional): threads. Defaults to `workers`, or `aio.MAX_WORKERS`
+                if it is 0.
+
+        Returns:
+            Dict[str, str]: the resources that fail, with "unsigned" or "mismatch".
+        """
+        signer = get_signer(self.key if key is None else key)
+        if signer is None:
+            raise ValueError("checking signatures needs a key")
+        workers = workers or self.workers or MAX_WORKERS
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            signatures = list(pool.map(self._read_signature, self.file_list))
+        signed = [(file, pair) for file, pair in zip(self.file_list, signatures) if pair]
+        valid = signer.verify_many([pair for _, pair in signed], workers)
+        failed = {file: "unsigned" for file, pair in zip(self.file_list, signatures) if not pair}
+        failed.update({file: "mismatch" for (file, _), ok in zip(signed, valid) if not ok})
+        return failed
+
+    def train_dict(self, size: int = 16384, max_samples: int = 10000, rewrite: bool = True) -> bytes:
+        """
+        Train a zstd dictionary over the resources and store it next to the index.
+
+        Rewritten resources keep the settings of their micro code: codec, data type, hash
+        and signature, signed ones are signed again with the key of the index. They are
+        written to temporary files first, and only renamed over the resources once the
+        dictionary is on disk.
+
+        Args:
+            size (int, optional): max size of the dictionary in bytes. Defaults to 16384.
+            max_samples (int, optional): max number of resources to train on. Defaults to 10000.
+            rewrite (bool, optional): recompress the zstd compact resources with the
+                dictionary. Defaults to True.
+
+        Returns:
+            bytes: the dictionary
+
+        Raises:
+            ValueError: If a resource to rewrite is signed and the key of the index is not
+                a private key, nothing is written then.
+        """
+        files = self.file_list[:: max(1, len(self.file_list) // max_samples)]
+        # the payloads as compressed, binary values are references in them
+        samples = [self._read_payload(file) for file in files]
+        dict_data = train_dict(samples, size)
+        staged = self._stage_rewrites(dict_data) if rewrite else []
+        try:
+            with _open_write(self.root + ".dict", True) as file:
+                file.write(dict_data)
+        except BaseException:
+            for tmp, _ in staged:
+                os.unlink(tmp)
+            raise
+        for tmp, path in staged:
+            os.replace(tmp, path)
+        self.dict_data = dict_data
+        if self.res_cache is not None:
+            self.res_cache.clear()
+        return dict_data
+
+    def _stage_rewrites(self, dict_data: bytes) -> List[Tuple[str, str]]:
+        """
+        Write the zstd compact resources compressed with `dict_data` to temporary files.
+
+        Returns:
+            List[Tuple[str, str]]: the temporary file and the resource of every rewrite.
+        """
+        from .mc import HASH_NAMES
+
+        signer = None if self.key is None else get_signer(self.key)
+        staged: List[Tuple[str, str]] = []
+        try:
+            for file in self.file_list:
+                if not file.endswith(".cresource"):
+                    continue
                 path = os.path.join(self.root, file)
-                res = Resource(path=path, encrypt=encrypt, key=self.key)
-                self.res_dict[file] = res
-            except Exception:
-                pass
+                mc = read_header(path)
+                if mc is None:
+                    options = dict(micro_code=False, hash_type=None)
+                    doc = self._load_doc(file)
+                else:
+                    if not mc.is_compact or _compact_type(mc) != "zstd":
+                        # only zstd compresses with a dictionary
+                        continue
+                    if mc.is_encrypt and (signer is None or not signer.can_sign):
+                        raise ValueError(f"{file} is signed, rewriting it needs the private key")
+                    options = dict(
+                        micro_code=True,
+                        data_type=mc.data_type,
+                        codec=get_codec_by_id(mc.codec_id).name,
+                        hash_type=HASH_NAMES.get(mc.hash_type) if mc.is_hash else None,
+                        encrypt=mc.is_encrypt,
+                        key=signer if mc.is_encrypt else None,
+                    )
+                    # signed resources are checked before they are signed again
+                    doc = load(
+                        path,
+                        compact=True,
+                        dict_data=self.dict_data,
+                        encrypt=mc.is_encrypt,
+                        key=signer if mc.is_encrypt else None,
+                    )
+                dir_path, name = os.path.split(path)
+                tmp = os.path.join(dir_path, f".{name}.{os.getpid()}.train")
+                sync(doc, path=tmp, compact=True, dict_data=dict_data, **options)
+                staged.append((tmp, path))
+        except BaseException:
+            for tmp, _ in staged:
+                os.unlink(tmp)
+            raise
+        return staged
+
+    def _read_payload(self, file: str) -> bytes:
+        compact = file.endswith(".cresource")
+        return read_payload(os.path.join(self.root, file), compact=compact, dict_data=self.dict_data)
+
+    def _load_doc(self, file: str) -> dict:
+        compact = file.endswith(".cresource")
+        return load(os.path.join(self.root, file), compact=compact, dict_data=self.dict_data)
+
+    def get_res(self, res: str) -> Resource:
+        if not self.lazy:
+            return self.res_dict[res]
+        if res not in self._file_set:
+            raise KeyError(res)
+        return self.res_cache.get(res, self._load_one)
 
-    def get_res(self, res: str) -> str:
-        return self.res_dict[res]
+    async def aget_res(self, res: str) -> Resource:
+        """`get_res` on the `aio` thread pool, for lazy indexes."""
+        return await run(self.get_res, res)
@@ -0,0 +1,170 @@
+"""
+Selective decoding of json documents, only the wanted keys of the data object are decoded
+
+The other values are skipped without being built as python objects: strings by
+looking for their closing quote, scalars with a regular expression, and containers by
+counting their brackets. Regular expressions swallow runs of strings and scalars, and
+whole containers up to two levels deep, so python only steps through deeper brackets.
+Skipped containers are only checked for balanced brackets, not decoded.
+"""
+
+import re
+import json
+from typing import Callable, Dict, Iterable
+
+_WS = re.compile(r"[ \t\n\r]*")
+# a run of scalars and separators, never split by backtracking, and a string, unrolled so
+# that it does not backtrack on every character
+_RUN = r'[^"\[\]{}]+(?![^"\[\]{}])'
+_STR = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+# repeats are bounded, the regex engine keeps state for every repetition
+_MAX = 256
+_LEAF = r"[\[{](?:%s|%s){0,%d}[\]}]" % (_RUN, _STR, _MAX)
+_NESTED = r"[\[{](?:%s|%s|%s){0,%d}[\]}]" % (_RUN, _STR, _LEAF, _MAX)
+_CHUNK = re.compile(r"(?:%s|%s|%s){0,%d}" % (_RUN, _STR, _NESTED, _MAX), re.S)
+_SCALAR = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null|NaN|-?Infinity")
+_decoder = json.JSONDecoder()
+
+
+class _Done(Exception):
+    """Every wanted key was found, the rest of the document is not scanned."""
+
+
+def _ws(text: str, i: int) -> int:
+    return _WS.match(text, i).end()
+
+
+def _error(text: str, i: int, expected: str) -> ValueError:
+    return ValueError(f"invalid json at {i}: expected {expected}, got {text[i : i + 10]!r}")
+
+
+def _skip_string(text: str, i: int) -> int:
+    """The index after the string starting at `i`."""
+    end = text.find('"', i + 1)
+    while end != -1:
+        # the quote is escaped by an odd number of backslashes
+        j = end
+        while text[j - 1] == "\\":
+            j -= 1
+        if (end - j) % 2 == 0:
+            return end + 1
+        end = text.find('"', end + 1)
+    raise _error(text, i, "a string")
+
+
+def _skip_container(text: str, i: int) -> int:
+    """The index after the array or object starting at `i`."""
+    depth = 1
+    i += 1
+    match = _CHUNK.match
+    while True:
+        end = match(text, i).end()
+        char = text[end : end + 1]
+        if char == "[" or char == "{":
+            depth += 1
+        elif char == "]" or char == "}":
+            depth -= 1
+            if depth == 0:
+                return end + 1
+        elif end == i:
+            raise _error(text, i, '"]" or "}"')
+        else:
+            # the repeat limit was reached
+            i = end
+            continue
+        i = end + 1
+
+
+def skip(text: str, i: int) -> int:
+    """
+    Skip the json value starting at `i`, without building it.
+
+    Returns:
+        int: the index after the value.
+    """
+    char = text[i : i + 1]
+    if char == '"':
+        return _skip_string(text, i)
+    if char in ("[", "{"):
+        return _skip_container(text, i)
+    match = _SCALAR.match(text, i)
+    if match is None:
+        raise _error(text, i, "a value")
+    return match.end()
+
+
+def _key(text: str, i: int, end: int) -> str:
+    raw = text[i:end]
+    return raw[1:-1] if "\\" not in raw else json.loads(raw)
+
+
+def scan_object(text: str, i: int, on_item: Callable[[str, int], int]) -> int:
+    """
+    Walk the members of the json object starting at `i`.
+
+    Args:
+        text (str): json text.
+        i (int): index of the "{".
+        on_item (Callable[[str, int], int]): called with every key and the index of its
+            value, returns the index after the value.
+
+    Returns:
+        int: the index after the object.
+    """
+    if text[i : i + 1] != "{":
+        raise _error(text, i, "an object")
+    i = _ws(text, i + 1)
+    if text[i : i + 1] == "}":
+        return i + 1
+    while True:
+        if text[i : i + 1] != '"':
+            raise _error(text, i, "a string")
+        end = _skip_string(text, i)
+        key = _key(text, i, end)
+        i = _ws(text, end)
+        if text[i : i + 1] != ":":
+            raise _error(text, i, '":"')
+        i = _ws(text, on_item(key, _ws(text, i + 1)))
+        char = text[i : i + 1]
+        if char == "}":
+            return i + 1
+        if char != ",":
+            raise _error(text, i, '"," or "}"')
+        i = _ws(text, i + 1)
+
+
+def pick(text: str, keys: Iterable[str]) -> Dict[str, dict]:
+    """
+    Decode only some keys of the "data" object of a json document.
+
+    Args:
+        text (str): json document, an object with a "data" object.
+        keys (Iterable[str]): keys of the data object to decode.
+
+    Returns:
+        Dict[str, dict]: {"data": the decoded keys found in the document}.
+    """
+    wanted = frozenset(keys)
+    data: Dict[str, object] = dict()
+
+    def on_data(key: str, i: int) -> int:
+        if key not in wanted:
+            return skip(text, i)
+        data[key], end = _decoder.raw_decode(text, i)
+        if len(data) == len(wanted):
+            raise _Done
+        return end
+
+    def on_top(key: str, i: int) -> int:
+        if key == "data":
+            scan_object(text, i, on_data)
+            # the data object is all that is wanted
+            raise _Done
+        return skip(text, i)
+
+    if wanted:
+        try:
+            scan_object(text, _ws(text, 0), on_top)
+        except _Done:
+            pass
+    return {"data": data}
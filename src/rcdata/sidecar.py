@@ -0,0 +1,100 @@
+"""
+Sidecar files of decoded documents, for fast cold starts
+
+A file loaded with `sidecar` gets a sidecar next to it, `<path>.rcc`, holding the
+decoded document marshalled, so later processes skip the decompression and decoding
+of the file. A sidecar is only used while the size, mtime and sha256 of its file and
+the load options match the ones it was written for, otherwise it is written again.
+
+Layout (all integers are big endian):
+    header  magic b"RCSC", format version (H), size of the file (Q), mtime of the
+            file in ns (Q), sha256 of the file (32s), digest of the load options (32s)
+    body    the document, marshalled
+"""
+
+import sys
+import struct
+import marshal
+import hashlib
+from typing import Any, Optional
+
+MAGIC = b"RCSC"
+VERSION = 1
+SUFFIX = ".rcc"
+
+_HEADER = struct.Struct(">4sHQQ32s32s")
+
+
+def sidecar_path(path: str) -> str:
+    return path + SUFFIX
+
+
+def options_tag(*options) -> bytes:
+    """
+    Digest of the load options of a document, made of builtin values.
+
+    The marshal format may change between python versions, so it is part of the tag.
+    """
+    return hashlib.sha256(marshal.dumps((marshal.version, sys.version_info[:2], options))).digest()
+
+
+def read_sidecar(path: str, source, st, tag: bytes) -> Optional[Any]:
+    """
+    The document of a file from its sidecar.
+
+    Args:
+        path (str): path of the file.
+        source (bytes-like): content of the file.
+        st (os.stat_result): stat of the file, from the file that was read.
+        tag (bytes): digest of the load options, see `options_tag`.
+
+    Returns:
+        Optional[Any]: the document, None if the sidecar is missing, stale or broken.
+    """
+    try:
+        with open(sidecar_path(path), "rb") as file:
+            raw = file.read()
+    except OSError:
+        return None
+    if len(raw) < _HEADER.size:
+        return None
+    magic, version, size, mtime, digest, options = _HEADER.unpack_from(raw)
+    if (
+        magic != MAGIC
+        or version != VERSION
+        or (size, mtime, options) != (st.st_size, st.st_mtime_ns, tag)
+        # the size and mtime can match after an edit in the same clock tick
+        or hashlib.sha256(source).digest() != digest
+    ):
+        return None
+    try:
+        return marshal.loads(memoryview(raw)[_HEADER.size :])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def write_sidecar(path: str, source, st, tag: bytes, doc: Any) -> bool:
+    """
+    Write the sidecar of a file, see `read_sidecar`.
+
+    Returns:
+        bool: whether it was written, documents that are not made of builtin types only,
+            such as those with binary values of the file, and read-only directories
+            are left without a sidecar.
+    """
+    from .io import _open_write
+
+    try:
+        body = marshal.dumps(doc)
+    except ValueError:
+        return False
+    header = _HEADER.pack(
+        MAGIC, VERSION, st.st_size, st.st_mtime_ns, hashlib.sha256(source).digest(), tag
+    )
+    try:
+        with _open_write(sidecar_path(path), True) as file:
+            file.write(header)
+            file.write(body)
+    except OSError:
+        return False
+    return True
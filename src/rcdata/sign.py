@@ -0,0 +1,127 @@
+"""
+ed25519 signatures of data files, with the parsed keys cached between calls
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple, Union
+
+from .io import get_encrypt
+
+SIGNATURE_SIZE = 64
+# smaller batches are signed on the calling thread, a pool costs more than it saves
+MIN_BATCH = 64
+
+
+class Signer:
+    """
+    Sign and verify with an ed25519 key pair, parsed once.
+
+    Args:
+        private_key (bytes, optional): PEM private key, needed to sign.
+        public_key (bytes, optional): PEM or DER public key, derived from the private
+            key if not given.
+
+    Raises:
+        ValueError: If no key is given.
+    """
+
+    def __init__(self, private_key: bytes = None, public_key: bytes = None) -> None:
+        _, serialization = get_encrypt()
+        if private_key is None and public_key is None:
+            raise ValueError("a private or public key is needed")
+        self._private = None
+        if private_key is not None:
+            self._private = serialization.load_pem_private_key(private_key, password=None)
+        if public_key is None:
+            self._public = self._private.public_key()
+        elif public_key.lstrip().startswith(b"-----"):
+            self._public = serialization.load_pem_public_key(public_key)
+        else:
+            self._public = serialization.load_der_public_key(public_key)
+        self.fingerprint = self._public.public_bytes(
+            encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw
+        )
+
+    @property
+    def can_sign(self) -> bool:
+        return self._private is not None
+
+    def sign(self, data: bytes) -> bytes:
+        """
+        Raises:
+            ValueError: If the signer has no private key.
+        """
+        if self._private is None:
+            raise ValueError("signing needs a private key")
+        return self._private.sign(data)
+
+    def verify(self, data: bytes, signature: bytes) -> bool:
+        from cryptography.exceptions import InvalidSignature
+
+        try:
+            self._public.verify(signature, data)
+        except InvalidSignature:
+            return False
+        return True
+
+    def sign_many(self, items: Sequence[bytes], workers: int = None) -> List[bytes]:
+        """
+        Sign many messages, on a thread pool for large batches.
+
+        Args:
+            items (Sequence[bytes]): messages.
+            workers (int, optional): threads, 0 to sign on the calling thread.
+
+        Returns:
+            List[bytes]: the signatures, in the order of `items`.
+        """
+        if self._private is None:
+            raise ValueError("signing needs a private key")
+        return _map(self.sign, items, workers)
+
+    def verify_many(self, pairs: Sequence[Tuple[bytes, bytes]], workers: int = None) -> List[bool]:
+        """
+        Verify many signatures, on a thread pool for large batches.
+
+        Args:
+            pairs (Sequence[Tuple[bytes, bytes]]): messages and their signatures.
+            workers (int, optional): threads, 0 to verify on the calling thread.
+
+        Returns:
+            List[bool]: whether each signature is valid, in the order of `pairs`.
+        """
+        return _map(lambda pair: self.verify(*pair), pairs, workers)
+
+
+def _map(func, items: Sequence, workers: Optional[int]) -> list:
+    if workers == 0 or len(items) < MIN_BATCH:
+        return list(map(func, items))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items))
+
+
+@lru_cache(64)
+def _cached_signer(private_key: Optional[bytes], public_key: Optional[bytes]) -> Signer:
+    return Signer(private_key, public_key)
+
+
+def get_signer(key: Union[Signer, bytes, str, None]) -> Optional[Signer]:
+    """
+    The signer of a key, made once per key.
+
+    Args:
+        key (Union[Signer, bytes, str, None]): a signer, or a PEM private key,
+            or a PEM or DER public key.
+
+    Returns:
+        Optional[Signer]: the signer, None for no key.
+    """
+    if key is None or isinstance(key, Signer):
+        return key
+    if isinstance(key, str):
+        key = key.encode("ascii")
+    if b"PRIVATE KEY" in key:
+        return _cached_signer(key, None)
+    return _cached_signer(None, key)
+
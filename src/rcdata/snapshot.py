@@ -0,0 +1,346 @@
+"""
+Read-only snapshots of loaded objects, shared by worker processes
+
+One process serializes objects, such as a `ResourceIndex` and its resources, into a
+shared memory segment or a file. Workers attach to it without parsing anything up
+front: a lookup is a binary search over the sorted keys, and a field is decoded when
+it is first read, so the memory and startup time of a worker do not grow with the
+size of the snapshot.
+
+Layout (all integers are big endian):
+    header  magic b"RCSN", format version (H), entry count (I)
+    table   one fixed-size block per entry, sorted by key: key offset (Q),
+            key length (H), record offset (Q), record length (Q)
+    keys    utf-8 keys of the entries, back to back
+    records per entry, its field count (H), then per field: name length (H),
+            kind (B), value length (Q), the utf-8 name and the value, marshalled,
+            or raw for binary values, which are read as memoryviews of the snapshot
+"""
+
+import os
+import mmap
+import struct
+import marshal
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from .blob import BINARY_TYPES
+from .io import mkdir
+
+if TYPE_CHECKING:
+    from .base import BaseData
+    from .res import ResourceIndex
+
+MAGIC = b"RCSN"
+VERSION = 1
+# key of the index in the snapshot of a `ResourceIndex`
+INDEX_KEY = ""
+
+_HEADER = struct.Struct(">4sHI")
+_ENTRY = struct.Struct(">QHQQ")
+_COUNT = struct.Struct(">H")
+_FIELD = struct.Struct(">HBQ")
+_MARSHAL = 0
+_RAW = 1
+
+
+def _record(obj: "BaseData") -> List[bytes]:
+    values = obj._data()
+    parts = [_COUNT.pack(len(values))]
+    for name, value in values.items():
+        raw = name.encode("utf-8")
+        if isinstance(value, BINARY_TYPES):
+            kind, data = _RAW, memoryview(value).cast("B")
+        else:
+            kind = _MARSHAL
+            try:
+                data = marshal.dumps(value)
+            except ValueError:
+                raise ValueError(f"{name} can not be stored in a snapshot") from None
+        parts += [_FIELD.pack(len(raw), kind, len(data)), raw, data]
+    return parts
+
+
+def _layout(records: Mapping[str, "BaseData"]) -> Tuple[List[bytes], int]:
+    """The parts of a snapshot, in order, and its size."""
+    keys = sorted(records)
+    encoded = [key.encode("utf-8") for key in keys]
+    bodies = [_record(records[key]) for key in keys]
+    lengths = [sum(map(len, body)) for body in bodies]
+    key_offset = _HEADER.size + len(keys) * _ENTRY.size
+    offset = key_offset + sum(map(len, encoded))
+    parts = [_HEADER.pack(MAGIC, VERSION, len(keys))]
+    for raw, length in zip(encoded, lengths):
+        parts.append(_ENTRY.pack(key_offset, len(raw), offset, length))
+        key_offset += len(raw)
+        offset += length
+    parts += encoded
+    for body in bodies:
+        parts += body
+    return parts, offset
+
+
+def dumps(records: Mapping[str, "BaseData"]) -> bytes:
+    """
+    Serialize objects into a snapshot.
+
+    Args:
+        records (Mapping[str, BaseData]): the objects, by key.
+
+    Returns:
+        bytes: the snapshot
+    """
+    return b"".join(_layout(records)[0])
+
+
+def index_records(index: "ResourceIndex") -> Dict[str, "BaseData"]:
+    """
+    The index, under `INDEX_KEY`, and every resource it loads, by file name.
+    Resources that fail to load are left out.
+    """
+    records: Dict[str, "BaseData"] = {INDEX_KEY: index}
+    for file in index.file_list:
+        try:
+            records[file] = index.get_res(file)
+        except (KeyError, OSError, ValueError):
+            continue
+    return records
+
+
+def _attach_shared_memory(name: str):
+    from multiprocessing import shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before python 3.13 every attached process tracks the segment, and removes
+        # it when it exits, only the process that made it must
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, "shared_memory")  # pylint: disable=protected-access
+        return shm
+
+
+class View:
+    """
+    A read-only, `Resource`-like view of an object in a snapshot.
+
+    Fields are decoded when they are first read. Binary fields are memoryviews of
+    the snapshot, like the view itself, they must be dropped before the snapshot is
+    closed.
+    """
+
+    __slots__ = ("key", "_buffer", "_fields", "_values")
+
+    def __init__(self, key: str, buffer: memoryview) -> None:
+        object.__setattr__(self, "key", key)
+        object.__setattr__(self, "_buffer", buffer)
+        object.__setattr__(self, "_fields", None)
+        object.__setattr__(self, "_values", dict())
+
+    def _table(self) -> Dict[str, Tuple[int, int, int]]:
+        """The kind, offset and length of every field, read on first use."""
+        if self._fields is None:
+            buffer = self._buffer
+            (count,) = _COUNT.unpack_from(buffer, 0)
+            offset = _COUNT.size
+            fields = dict()
+            for _ in range(count):
+                name_len, kind, length = _FIELD.unpack_from(buffer, offset)
+                offset += _FIELD.size
+                name = str(buffer[offset : offset + name_len], "utf-8")
+                offset += name_len
+                fields[name] = (kind, offset, length)
+                offset += length
+            object.__setattr__(self, "_fields", fields)
+        return self._fields
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        values = self._values
+        if name in values:
+            return values[name]
+        item = self._table().get(name)
+        if item is None:
+            raise AttributeError(f"{self.key} has no field {name}")
+        kind, offset, length = item
+        view = self._buffer[offset : offset + length]
+        value = view if kind == _RAW else marshal.loads(view)
+        values[name] = value
+        return value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("snapshot views are read-only")
+
+    def __dir__(self) -> List[str]:
+        return list(self._table())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The values of every field."""
+        return {name: getattr(self, name) for name in self._table()}
+
+    def __repr__(self) -> str:
+        return f"View(key={self.key!r})"
+
+
+class Snapshot:
+    """
+    A snapshot, mapped from a file or attached from shared memory.
+
+    Make one with `create` (shared memory) or `save` (a file) in one process, and
+    open it in the workers with `attach` or `open`, or inherit it through fork.
+
+    Attributes:
+        name (Optional[str]): name of the shared memory segment, passed to `attach`.
+        path (Optional[str]): path of the snapshot file, passed to `open`.
+    """
+
+    def __init__(self, buffer, owner=None, name: str = None, path: str = None) -> None:
+        self._owner = owner
+        self._buffer = memoryview(buffer).toreadonly()
+        self.name = name
+        self.path = path
+        magic, version, count = _HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("not a snapshot")
+        if version != VERSION:
+            raise ValueError(f"unsupported snapshot version: {version}")
+        self._count = count
+
+    @classmethod
+    def create(cls, records: Mapping[str, "BaseData"], name: str = None) -> "Snapshot":
+        """
+        Serialize objects into a new shared memory segment, removed by `unlink`.
+
+        Args:
+            records (Mapping[str, BaseData]): the objects, by key, see `index_records`.
+            name (str, optional): name of the segment. Defaults to a random name.
+        """
+        from multiprocessing import shared_memory
+
+        parts, size = _layout(records)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        offset = 0
+        for part in parts:
+            shm.buf[offset : offset + len(part)] = part
+            offset += len(part)
+        return cls(shm.buf[:size], shm, name=shm.name)
+
+    @classmethod
+    def attach(cls, name: str) -> "Snapshot":
+        """Attach to the shared memory segment of a snapshot made by `create`."""
+        shm = _attach_shared_memory(name)
+        (count,) = struct.unpack_from(">I", shm.buf, _HEADER.size - 4)
+        size = _snapshot_size(shm.buf, count)
+        return cls(shm.buf[:size], shm, name=name)
+
+    @classmethod
+    def save(cls, records: Mapping[str, "BaseData"], path: str) -> "Snapshot":
+        """Serialize objects into a file, see `create`, and open it."""
+        if not os.path.exists(path):
+            mkdir(path)
+        with open(path, "wb") as file:
+            for part in _layout(records)[0]:
+                file.write(part)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path: str) -> "Snapshot":
+        """Map a snapshot file read-only."""
+        with open(path, "rb") as file:
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mm, mm, path=path)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, i: int) -> Tuple[int, int, int, int]:
+        return _ENTRY.unpack_from(self._buffer, _HEADER.size + i * _ENTRY.size)
+
+    def _key(self, i: int) -> bytes:
+        key_offset, key_len, _, _ = self._entry(i)
+        return bytes(self._buffer[key_offset : key_offset + key_len])
+
+    def _find(self, key: str) -> Optional[int]:
+        target = key.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._key(low) == target:
+            return low
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield str(self._key(i), "utf-8")
+
+    def keys(self) -> Iterator[str]:
+        return iter(self)
+
+    def get(self, key: str) -> View:
+        """
+        Raises:
+            KeyError: If the key is not in the snapshot.
+        """
+        i = self._find(key)
+        if i is None:
+            raise KeyError(key)
+        _, _, offset, length = self._entry(i)
+        return View(key, self._buffer[offset : offset + length])
+
+    def __getitem__(self, key: str) -> View:
+        return self.get(key)
+
+    @property
+    def index(self) -> View:
+        """The index of a snapshot made from `index_records`."""
+        return self.get(INDEX_KEY)
+
+    def get_res(self, res: str) -> View:
+        """A resource of a snapshot made from `index_records`, as `ResourceIndex.get_res`."""
+        return self.get(res)
+
+    def close(self) -> None:
+        """
+        Release the mapping, the views and the values of binary fields must be
+        dropped first. The shared memory segment is kept, see `unlink`.
+        """
+        self._buffer.release()
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    def unlink(self) -> None:
+        """Remove the shared memory segment, once every process closed it."""
+        from multiprocessing import shared_memory
+
+        if self.name is not None:
+            # a handle of its own, the one of `attach` is not tracked before python 3.13
+            shm = shared_memory.SharedMemory(name=self.name)
+            try:
+                shm.unlink()
+            finally:
+                shm.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def _snapshot_size(buffer, count: int) -> int:
+    """The size of a snapshot, shared memory segments may be rounded up to a page."""
+    if count == 0:
+        return _HEADER.size
+    _, _, offset, length = _ENTRY.unpack_from(buffer, _HEADER.size + (count - 1) * _ENTRY.size)
+    return offset + length
@@ -0,0 +1,366 @@
+"""
+Append-only store of many `BaseData` records in one log file
+
+Every update appends a record, so it costs the size of the record instead of the size
+of the store. An in-memory index maps every key to its last record, and compaction
+rewrites the live records once enough of the log is dead.
+
+Layout (all integers are big endian):
+    header  magic b"RCLG", format version (H)
+    records op (B), key length (H), value length (I), crc32 of the key and value (I),
+            then the utf-8 key and the value, `{"data": ...}` encoded with the codec
+            of the store; a delete record has no value
+
+A crash can only leave a partial record at the end of the log, it is cut off when the
+store is opened again. One process writes a store at a time.
+"""
+
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from typing import Dict, Iterator, Optional, Tuple, Type
+
+from .base import BaseData
+from .codec import get_codec
+from .io import _fsync_dir, _open_write, mkdir
+
+MAGIC = b"RCLG"
+VERSION = 1
+
+_HEADER = struct.Struct(">4sH")
+_RECORD = struct.Struct(">BHII")
+_PUT = 1
+_DELETE = 2
+
+
+def _record(op: int, key: bytes, value: bytes = b"") -> bytes:
+    crc = zlib.crc32(value, zlib.crc32(key))
+    return b"".join((_RECORD.pack(op, len(key), len(value), crc), key, value))
+
+
+def _scan(file, start: int) -> Iterator[Tuple[int, int, str, int, int]]:
+    """
+    Read the records of a log from `start`, stopping at the first partial or corrupt one.
+
+    Yields:
+        Tuple[int, int, str, int, int]: the op, the record offset, the key, and the
+            offset and length of the value.
+    """
+    file.seek(start)
+    offset = start
+    while True:
+        head = file.read(_RECORD.size)
+        if len(head) < _RECORD.size:
+            return
+        op, key_len, value_len, crc = _RECORD.unpack(head)
+        body = file.read(key_len + value_len)
+        if op not in (_PUT, _DELETE) or len(body) < key_len + value_len:
+            return
+        if zlib.crc32(body) != crc:
+            return
+        yield op, offset, str(body[:key_len], "utf-8"), offset + _RECORD.size + key_len, value_len
+        offset += _RECORD.size + key_len + value_len
+
+
+class LogStore:
+    """
+    A key-value store of `BaseData` records, appended to one log file.
+
+    Args:
+        path (str): log file, created if missing.
+        cls (Type[BaseData]): class of the records, made from the stored values with
+            the environment priority disabled.
+        codec (str, optional): codec of the values, see `codec.list_codecs`. Defaults to "json".
+        fsync (bool, optional): fsync the log after every update, otherwise updates are
+            only flushed to the OS. Defaults to False.
+        compact_ratio (float, optional): compact in the background once this part of the
+            log is dead records, 0 to only compact on `compact`. Defaults to 0.5.
+        min_compact_size (int, optional): logs smaller than this many bytes are not
+            compacted in the background. Defaults to 1 MiB.
+
+    Raises:
+        ValueError: If the file is not a log store, or a record before the last one is
+            corrupt, the log is then left as it is.
+
+    Attributes:
+        recovered (int): bytes of a partial record cut off the end of the log when opened.
+        compactions (int): number of compactions done.
+        error (Optional[Exception]): the last exception raised by a background compaction.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        cls: Type[BaseData],
+        codec: str = "json",
+        fsync: bool = False,
+        compact_ratio: float = 0.5,
+        min_compact_size: int = 1 << 20,
+    ) -> None:
+        if not 0 <= compact_ratio < 1:
+            raise ValueError("compact_ratio must be between 0 and 1")
+        self.path = path
+        self.cls = cls
+        self.codec = get_codec(codec).name
+        self._codec = get_codec(codec)
+        self.fsync = fsync
+        self.compact_ratio = compact_ratio
+        self.min_compact_size = min_compact_size
+        self.recovered = 0
+        self.compactions = 0
+        self.error: Optional[Exception] = None
+        # key -> offset and length of its value
+        self._index: Dict[str, Tuple[int, int]] = dict()
+        self._size = 0
+        self._dead = 0
+        self._lock = threading.RLock()
+        # one compaction at a time, updates only wait for its last step
+        self._compact_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._open()
+
+    def _open(self) -> None:
+        if not os.path.exists(self.path):
+            mkdir(self.path)
+            with _open_write(self.path, True) as file:
+                file.write(_HEADER.pack(MAGIC, VERSION))
+        self._reader = open(self.path, "rb")
+        magic, version = _HEADER.unpack(self._reader.read(_HEADER.size).ljust(_HEADER.size))
+        if magic != MAGIC:
+            self._reader.close()
+            raise ValueError(f"{self.path} is not a log store")
+        if version != VERSION:
+            self._reader.close()
+            raise ValueError(f"unsupported log version: {version}")
+        end = self._replay(self._reader, _HEADER.size, self._index)
+        size = os.path.getsize(self.path)
+        if end < size:
+            if not self._torn(end, size):
+                self._reader.close()
+                raise ValueError(
+                    f"{self.path} has a corrupt record at offset {end}, "
+                    f"followed by {size - end} bytes"
+                )
+            # the end of a record written when the process died
+            self.recovered = size - end
+            os.truncate(self.path, end)
+        self._writer = open(self.path, "ab")
+        self._size = end
+
+    def _torn(self, offset: int, size: int) -> bool:
+        """Whether the bad record at `offset` is the last one, cut off by a crash."""
+        self._reader.seek(offset)
+        head = self._reader.read(_RECORD.size)
+        if len(head) < _RECORD.size:
+            return True
+        _, key_len, value_len, _ = _RECORD.unpack(head)
+        return offset + _RECORD.size + key_len + value_len >= size
+
+    def _replay(self, file, start: int, index: Dict[str, Tuple[int, int]], shift: int = 0) -> int:
+        """
+        Apply the records of a log from `start` to an index, counting the dead bytes.
+
+        Returns:
+            int: the offset after the last whole record.
+        """
+        end = start
+        for op, offset, key, value_offset, value_len in _scan(file, start):
+            old = index.pop(key, None)
+            if old is not None:
+                self._dead += _RECORD.size + len(key.encode("utf-8")) + old[1]
+            if op == _PUT:
+                index[key] = (value_offset + shift, value_len)
+            else:
+                # the delete record itself is dead once applied
+                self._dead += value_offset - offset
+            end = value_offset + value_len
+        return end
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._index))
+
+    def keys(self) -> Iterator[str]:
+        return iter(self)
+
+    def items(self) -> Iterator[Tuple[str, BaseData]]:
+        for key in self:
+            record = self.get(key)
+            if record is not None:
+                yield key, record
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """
+        Returns:
+            Optional[bytes]: the encoded value of a key, None if the key is missing.
+        """
+        with self._lock:
+            item = self._index.get(key)
+            if item is None:
+                return None
+            offset, length = item
+            self._reader.seek(offset)
+            return self._reader.read(length)
+
+    def get(self, key: str) -> Optional[BaseData]:
+        """
+        Returns:
+            Optional[BaseData]: the record of a key, None if the key is missing.
+        """
+        value = self.get_bytes(key)
+        if value is None:
+            return None
+        return self.cls(buffer=value, env_p=-1, codec=self.codec)
+
+    def put(self, key: str, record: BaseData) -> None:
+        """Append the values of a record, replacing the previous record of the key."""
+        self.put_bytes(key, self._codec.dumps({"data": record._data()}))
+
+    def put_bytes(self, key: str, value: bytes) -> None:
+        """Append a value that is already encoded with the codec of the store."""
+        raw = key.encode("utf-8")
+        self._append(key, _record(_PUT, raw, value), len(value))
+
+    def delete(self, key: str) -> bool:
+        """
+        Returns:
+            bool: whether the key was in the store.
+        """
+        with self._lock:
+            if key not in self._index:
+                return False
+            self._append(key, _record(_DELETE, key.encode("utf-8")), None)
+            return True
+
+    def _append(self, key: str, record: bytes, value_len: Optional[int]) -> None:
+        with self._lock:
+            self._writer.write(record)
+            self._writer.flush()
+            if self.fsync:
+                os.fsync(self._writer.fileno())
+            old = self._index.pop(key, None)
+            if old is not None:
+                self._dead += len(record) - (value_len or 0) + old[1]
+            if value_len is None:
+                self._dead += len(record)
+            else:
+                self._index[key] = (self._size + len(record) - value_len, value_len)
+            self._size += len(record)
+            self._maybe_compact()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: the keys, log size, dead bytes, recovered bytes and compactions.
+        """
+        with self._lock:
+            return {
+                "keys": len(self._index),
+                "size": self._size,
+                "dead": self._dead,
+                "recovered": self.recovered,
+                "compactions": self.compactions,
+            }
+
+    def _maybe_compact(self) -> None:
+        if (
+            not self.compact_ratio
+            or self._size < self.min_compact_size
+            or self._dead < self._size * self.compact_ratio
+            or (self._compactor is not None and self._compactor.is_alive())
+        ):
+            return
+        self._compactor = threading.Thread(
+            target=self._compact_background, name="rcdata-compact", daemon=True
+        )
+        self._compactor.start()
+
+    def _compact_background(self) -> None:
+        try:
+            self.compact()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # the log is still whole, the next update tries again
+            self.error = e
+
+    def compact(self) -> int:
+        """
+        Rewrite the log with only the live records.
+
+        Updates go on while the live records are copied, the records appended
+        meanwhile are copied last, with the lock held. A compaction started while
+        another runs waits for it.
+
+        Returns:
+            int: bytes reclaimed
+        """
+        with self._compact_lock:
+            return self._compact()
+
+    def _compact(self) -> int:
+        with self._lock:
+            snapshot = dict(self._index)
+            end = self._size
+        dir_path, name = os.path.split(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=f".{name}.", suffix=".compact", dir=dir_path)
+        index: Dict[str, Tuple[int, int]] = dict()
+        try:
+            # mkstemp makes the file private, the log keeps its own mode
+            os.chmod(tmp, os.stat(self.path).st_mode & 0o7777)
+            with os.fdopen(fd, "wb") as new, open(self.path, "rb") as old:
+                new.write(_HEADER.pack(MAGIC, VERSION))
+                for key, (offset, length) in snapshot.items():
+                    old.seek(offset)
+                    record = _record(_PUT, key.encode("utf-8"), old.read(length))
+                    index[key] = (new.tell() + len(record) - length, length)
+                    new.write(record)
+                with self._lock:
+                    old.seek(end)
+                    tail = old.read(self._size - end)
+                    shift = new.tell() - end
+                    new.write(tail)
+                    new.flush()
+                    os.fsync(new.fileno())
+                    # the copied records are all live, only the tail has dead ones
+                    self._dead = 0
+                    self._replay(old, end, index, shift)
+                    self._writer.close()
+                    self._reader.close()
+                    os.replace(tmp, self.path)
+                    _fsync_dir(dir_path)
+                    self._reader = open(self.path, "rb")
+                    self._writer = open(self.path, "ab")
+                    reclaimed = self._size - new.tell()
+                    self._index = index
+                    self._size = new.tell()
+                    self.compactions += 1
+                    return reclaimed
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def flush(self) -> None:
+        """fsync the log."""
+        with self._lock:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+
+    def close(self) -> None:
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._lock:
+            self._writer.close()
+            self._reader.close()
+
+    def __enter__(self) -> "LogStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
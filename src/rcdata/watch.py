@@ -0,0 +1,143 @@
+"""
+Watch data files for changes, with inotify where available and stat polling elsewhere
+"""
+
+import os
+import sys
+import errno
+import select
+import struct
+import threading
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+# inotify events of a file that was written and closed, or moved / created in place
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_MASK = _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_IN_EVENT = struct.Struct("iIII")
+
+
+@lru_cache(1)
+def get_libc():
+    """libc with inotify, None if the platform has none"""
+    if not sys.platform.startswith("linux"):
+        return None
+    import ctypes
+    import ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1  # pylint: disable=pointless-statement
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class Watcher:
+    """
+    Call `callback` from a background thread whenever the file at `path` changes.
+
+    The parent directory is watched with inotify on linux, so files replaced by a
+    rename are noticed too. Elsewhere, or if inotify is not available, the file is
+    polled with `os.stat` every `interval` seconds.
+
+    Attributes:
+        backend (str): "inotify" or "poll".
+        error (Optional[Exception]): the last exception raised by `callback`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        callback: Callable[[], None],
+        interval: float = 1.0,
+        inotify: bool = True,
+    ) -> None:
+        self.path = os.path.abspath(path)
+        self.callback = callback
+        self.interval = interval
+        self.error: Optional[Exception] = None
+        self._fd = self._init_inotify() if inotify else None
+        self.backend = "poll" if self._fd is None else "inotify"
+        self._last = _stat_key(self.path)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"rcdata-watch-{path}", daemon=True)
+
+    def _init_inotify(self) -> Optional[int]:
+        libc = get_libc()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        directory = os.path.dirname(self.path).encode()
+        if libc.inotify_add_watch(fd, directory, _IN_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def start(self) -> "Watcher":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._fd is None:
+                self._stop.wait(self.interval)
+            elif not self._read_events():
+                continue
+            self._check()
+
+    def _read_events(self) -> bool:
+        """Wait for events of the watched file, returns False on a timeout."""
+        ready, _, _ = select.select([self._fd], [], [], self.interval)
+        if not ready:
+            return False
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return False
+            raise
+        name = os.path.basename(self.path).encode()
+        offset = 0
+        found = False
+        while offset < len(buffer):
+            _, _, _, length = _IN_EVENT.unpack_from(buffer, offset)
+            start = offset + _IN_EVENT.size
+            found = found or buffer[start : start + length].rstrip(b"\0") == name
+            offset = start + length
+        return found
+
+    def _check(self) -> None:
+        key = _stat_key(self.path)
+        if key is None or key == self._last:
+            return
+        self._last = key
+        try:
+            self.callback()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            self.error = e
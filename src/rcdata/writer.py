@@ -0,0 +1,201 @@
+"""
+Write-behind queue, writing data files from a background thread
+"""
+
+import os
+import time
+import atexit
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+if TYPE_CHECKING:
+    from .base import BaseData
+
+
+class _Pending(object):
+    __slots__ = ("key", "obj", "force", "first", "deadline")
+
+    def __init__(
+        self, key: str, obj: "BaseData", force: bool, first: float, deadline: float
+    ) -> None:
+        self.key = key
+        self.obj = obj
+        self.force = force
+        self.first = first
+        self.deadline = deadline
+
+
+class WriteBehind:
+    """
+    Write objects from a background thread, coalescing the writes of a file.
+
+    A write is done `delay` seconds after the last request to write the file, but at
+    most `max_delay` seconds after the first one, so bursts of updates cost one write.
+    Pending writes are done on `flush`, and when the interpreter exits.
+
+    Attributes:
+        max_delay (float): max seconds a write waits for the file to stop changing.
+        error (Optional[Exception]): the last exception raised by a background write.
+    """
+
+    def __init__(self, max_delay: float = 1.0) -> None:
+        if max_delay < 0:
+            raise ValueError("max_delay must be greater than or equal to 0")
+        self.max_delay = max_delay
+        self.error: Optional[Exception] = None
+        self._pending: Dict[str, _Pending] = dict()
+        self._cond = threading.Condition()
+        # writes taken off `_pending` and not done yet, so flush can wait for them
+        self._inflight: Set[_Pending] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._stats = dict.fromkeys(
+            ("submitted", "coalesced", "writes", "skipped", "errors"), 0
+        )
+        self._latency = [0.0, 0.0]
+        self._write_time = [0.0, 0.0]
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(self, obj: "BaseData", delay: float = 0.0, force: bool = False) -> None:
+        """
+        Write an object after `delay` seconds, replacing a pending write of its file.
+
+        Args:
+            obj (BaseData): the object, written with `obj._write_data`.
+            delay (float, optional): seconds to wait for more changes. Defaults to 0.
+            force (bool, optional): write even if no field changed. Defaults to False.
+        """
+        key = os.path.abspath(obj._path)
+        now = time.monotonic()
+        with self._cond:
+            closed = self._closed
+            if not closed:
+                self._stats["submitted"] += 1
+                item = self._pending.get(key)
+                if item is None:
+                    self._pending[key] = _Pending(key, obj, force, now, now + delay)
+                else:
+                    self._stats["coalesced"] += 1
+                    item.obj = obj
+                    item.force = item.force or force
+                    item.deadline = min(now + delay, item.first + self.max_delay)
+                self._start()
+                self._cond.notify_all()
+            else:
+                item = _Pending(key, obj, force, now, now)
+                self._inflight.add(item)
+        if closed:
+            self._write(item)
+
+    def flush(self, obj: "BaseData" = None) -> int:
+        """
+        Do the pending writes now, on the calling thread.
+
+        Args:
+            obj (BaseData, optional): only write the file of this object.
+
+        Returns:
+            int: number of pending writes that were done, including the ones the
+                background thread was doing, which are waited for
+        """
+        key = None if obj is None else os.path.abspath(obj._path)
+        with self._cond:
+            busy = {item for item in self._inflight if key is None or item.key == key}
+            if key is None:
+                items = list(self._pending.values())
+                self._pending.clear()
+            else:
+                item = self._pending.pop(key, None)
+                items = [] if item is None else [item]
+            self._inflight.update(items)
+        for item in items:
+            self._write(item)
+        with self._cond:
+            while busy & self._inflight:
+                self._cond.wait()
+        return len(items) + len(busy)
+
+    def close(self) -> None:
+        """Do the pending writes and stop the background thread, later writes are synchronous."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.flush()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns:
+            Dict[str, float]: queue depth, counts of submitted, coalesced, done, skipped
+                and failed writes, and the mean and max seconds from the first request to
+                the end of a write (latency) and of the write itself (write_time).
+        """
+        with self._cond:
+            stats: Dict[str, float] = {"depth": len(self._pending), **self._stats}
+            done = self._stats["writes"] + self._stats["skipped"] + self._stats["errors"]
+            for name, (total, worst) in (
+                ("latency", self._latency),
+                ("write_time", self._write_time),
+            ):
+                stats[f"{name}_avg"] = total / done if done else 0.0
+                stats[f"{name}_max"] = worst
+        return stats
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="rcdata-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            items = self._wait_due()
+            if items is None:
+                return
+            for item in items:
+                self._write(item)
+
+    def _wait_due(self) -> Optional[List[_Pending]]:
+        """Wait for writes that are due, None once closed."""
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                now = time.monotonic()
+                due = [key for key, item in self._pending.items() if item.deadline <= now]
+                if due:
+                    items = [self._pending.pop(key) for key in due]
+                    self._inflight.update(items)
+                    return items
+                timeout = min((item.deadline for item in self._pending.values()), default=None)
+                self._cond.wait(None if timeout is None else timeout - now)
+
+    def _write(self, item: _Pending) -> None:
+        """Write an item of `_inflight`, and take it off once done."""
+        start = time.monotonic()
+        outcome = "errors"
+        try:
+            written = item.obj._write_data(item.force, defer=False)
+            outcome = "writes" if written else "skipped"
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            self.error = e
+        finally:
+            end = time.monotonic()
+            with self._cond:
+                self._inflight.discard(item)
+                # flush and the background thread both wait on the condition
+                self._cond.notify_all()
+                self._stats[outcome] += 1
+                _add(self._latency, end - item.first)
+                _add(self._write_time, end - start)
+
+
+def _add(acc: List[float], value: float) -> None:
+    acc[0] += value
+    acc[1] = max(acc[1], value)
+
+
+write_behind = WriteBehind()
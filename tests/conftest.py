@@ -0,0 +1,20 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def make_index(tmp_path):
+    """Write a resource per name, `{"data": {"name": name}}`, and the index listing them."""
+
+    def make(names):
+        root = tmp_path / "res"
+        root.mkdir()
+        for name in names:
+            (root / f"{name}.resource").write_text(json.dumps({"data": {"name": name}}))
+        index = tmp_path / "res.index"
+        file_list = [f"{name}.resource" for name in names]
+        index.write_text(json.dumps({"data": {"file_list": file_list}}))
+        return str(index)
+
+    return make
@@ -0,0 +1,296 @@
+import os
+import threading
+import asyncio
+import time
+from typing import List, Optional
+
+import pytest
+
+from rcdata import BaseData, Field, base, instrument
+from rcdata.base import MISSING
+from rcdata.io import load, sync
+from rcdata.writer import write_behind
+
+
+class Parent(BaseData):
+    a = Field(1, int)
+    b = Field("b", str)
+
+
+class Child(Parent):
+    b = Field("child", str)
+    c = Field(default_type=List[int])
+    d = Field(default_type=Optional[int])
+
+
+def test_schema_inherits_fields():
+    assert Child._schema.names == ("a", "b", "c", "d")
+    assert Child._schema.defaults[:2] == (1, "child")
+    obj = Child(a=2, c=[1], d="x")
+    assert (obj.a, obj.b, obj.c) == (2, "child", [1])
+    # "x" is not an Optional[int], so it is ignored
+    assert obj.d is MISSING
+
+
+class Other(BaseData):
+    e = Field([], list)
+
+
+class Mixed(Other, Parent):
+    pass
+
+
+def test_values_per_instance():
+    first, second = Mixed(), Mixed(a=5)
+    first.e.append(1)
+    assert second.e == [] and Other().e == []
+    assert (first.a, second.a) == (1, 5)
+    assert Parent(a=3).a == 3 and Other(e=[2]).e == [2]
+    with pytest.raises(ValueError):
+        first.a = "a"
+    assert "data" not in Parent.a.__slots__
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.parametrize("inotify", [True, False])
+def test_watch_reload(tmp_path, inotify):
+    path = str(tmp_path / "data.json")
+    sync({"data": {"a": 2, "b": "file"}}, path=path)
+    obj = Parent(path=path, b="init")
+    assert (obj.a, obj.b) == (2, "init")
+    changes = []
+    obj.watch(lambda o, changed: changes.append(changed), interval=0.05, inotify=inotify)
+    try:
+        time.sleep(0.05)
+        sync({"data": {"a": 3, "b": "file"}}, path=path)
+        assert wait_for(lambda: changes)
+        # init data still wins over the file
+        assert (obj.a, obj.b) == (3, "init")
+        assert changes == [{"a"}]
+    finally:
+        obj.unwatch()
+
+
+class Tracked(BaseData):
+    a = Field(1, int)
+    items = Field([], list)
+    d = Field(default_type=Optional[int])
+
+
+def test_write_only_changed(tmp_path):
+    path = str(tmp_path / "tracked.data")
+    obj = Tracked(path=path)
+    # defaults are not in the new file yet
+    assert obj._write_data()
+    assert not obj._write_data()
+    obj.a = 1
+    assert not obj._write_data()
+    obj.items.append(2)
+    assert obj._write_data()
+    obj.a = 3
+    assert obj._write_data()
+    assert os.listdir(tmp_path) == ["tracked.data"]
+    loaded = Tracked(path=path)
+    assert (loaded.a, loaded.items, loaded.d) == (3, [2], MISSING)
+    assert not loaded._write_data()
+    assert loaded._write_data(force=True)
+
+
+def test_write_held_reference(tmp_path):
+    path = str(tmp_path / "held.data")
+    sync({"data": {"a": 1, "items": []}}, path=path)
+    obj = Tracked(path=path)
+    items = obj.items
+    assert not obj._write_data()
+    items.append(1)
+    assert obj._write_data()
+    items.append(2)
+    assert obj._write_data()
+    assert not obj._write_data()
+    assert Tracked(path=path).items == [1, 2]
+
+
+def test_read_does_not_encode(tmp_path, monkeypatch):
+    path = str(tmp_path / "read.data")
+    sync({"data": {"a": 1, "items": list(range(1000))}}, path=path)
+    encoded = []
+    fragment = base._fragment
+    monkeypatch.setattr(base, "_fragment", lambda value: encoded.append(value) or fragment(value))
+    obj = Tracked(path=path)
+    items = obj.items
+    assert len(items) == 1000 and encoded == []
+    # the value it was loaded with is read back from the file by the first write
+    assert not obj._write_data()
+    items.append(1000)
+    assert obj._write_data()
+    assert Tracked(path=path).items == list(range(1001))
+
+
+def test_write_behind(tmp_path):
+    path = str(tmp_path / "delayed.data")
+    sync({"data": {"a": 1}}, path=path)
+    obj = Tracked(path=path, write_delay=60)
+    before = write_behind.stats()
+    for a in range(2, 5):
+        obj.a = a
+        assert obj._write_data()
+    assert Tracked(path=path).a == 1
+    assert write_behind.stats()["coalesced"] - before["coalesced"] == 2
+    assert obj.flush()
+    assert not obj.flush()
+    assert Tracked(path=path).a == 4
+    assert write_behind.stats()["writes"] - before["writes"] == 1
+
+    fast = Tracked(path=path, write_delay=0.01)
+    fast.a = 5
+    fast._write_data()
+    deadline = time.time() + 5
+    while Tracked(path=path).a != 5 and time.time() < deadline:
+        time.sleep(0.01)
+    assert Tracked(path=path).a == 5
+
+
+def test_set_during_write(tmp_path):
+    path = str(tmp_path / "race.data")
+    sync({"data": {"a": 1}}, path=path)
+    obj = Tracked(path=path, write_delay=60)
+    obj.a = 2
+    write = obj._sync_bytes
+
+    def slow_write(payload):
+        obj.a = 5  # set while the background write runs
+        return write(payload)
+
+    obj._sync_bytes = slow_write
+    obj._write_data()
+    assert obj.flush()
+    assert Tracked(path=path).a == 2
+    del obj._sync_bytes
+    obj._write_data()
+    assert obj.flush()
+    assert Tracked(path=path).a == 5
+
+    def update(offset):
+        for i in range(200):
+            obj.a = offset + i
+            obj._write_data()
+
+    threads = [threading.Thread(target=update, args=(i * 1000,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        obj.flush()
+    for thread in threads:
+        thread.join()
+    obj.flush()
+    assert Tracked(path=path).a == obj.a
+
+
+def test_flush_waits_for_write(tmp_path, monkeypatch):
+    path = str(tmp_path / "inflight.data")
+    sync({"data": {"a": 1}}, path=path)
+    obj = Tracked(path=path, write_delay=0.01)
+    taken, release = threading.Event(), threading.Event()
+    write = write_behind._write
+
+    def held_write(item):
+        # the background thread took the write off the queue but did not start it
+        if item.obj is obj:
+            taken.set()
+            release.wait(5)
+        write(item)
+
+    monkeypatch.setattr(write_behind, "_write", held_write)
+    obj.a = 2
+    obj._write_data()
+    assert taken.wait(5)
+    flushed = []
+    thread = threading.Thread(target=lambda: flushed.append(obj.flush()))
+    thread.start()
+    thread.join(0.2)
+    assert thread.is_alive()
+    release.set()
+    thread.join(5)
+    assert flushed == [True] and Tracked(path=path).a == 2
+
+
+def test_async_save(tmp_path):
+    path = str(tmp_path / "async.data")
+
+    async def main():
+        obj = await Tracked.aload(path=path)
+        obj.a = 7
+        assert await obj.asave()
+        assert not await obj.asave()
+
+    asyncio.run(main())
+    assert Tracked(path=path).a == 7
+
+
+def test_load_stats(tmp_path):
+    path = str(tmp_path / "stats.data")
+    sync({"data": {"a": 2, "items": [1, 2]}}, path=path, compact=True, hash_type="sha256")
+    assert Tracked(path=path)._load_stats is None
+
+    obj = Tracked(path=path, profile=True)
+    stats = obj._load_stats
+    assert {"init", "env", "file", "default", "read", "verify", "decompress", "decode"} <= set(
+        stats
+    )
+    assert stats["bytes_read"] == os.path.getsize(path)
+    assert stats["bytes_decoded"] > 0
+    assert stats["total"] >= stats["file"] >= stats["read"]
+
+    events = []
+    hook = lambda event, obj, stats: events.append((event, sorted(stats)))
+    instrument.add_hook(hook)
+    try:
+        obj = Tracked(path=path)
+        obj.a = 3
+        obj._write_data()
+    finally:
+        instrument.remove_hook(hook)
+    assert [event for event, _ in events] == ["load", "save"]
+    assert events[1][1] == ["bytes_written", "encode", "total", "write"]
+    assert obj._save_stats["bytes_written"] == os.path.getsize(path)
+
+
+def test_selective(tmp_path):
+    path = str(tmp_path / "selective.data")
+    extra = {f"k{i}": {"v": [i] * 10} for i in range(1000)}
+    sync({"data": dict(extra, a=4, items=[1])}, path=path)
+    obj = Tracked(path=path, selective=True)
+    assert (obj.a, obj.items, obj.d) == (4, [1], MISSING)
+    obj.a = 5
+    obj._write_data()
+    assert load(path)["data"] == {"a": 5, "items": [1]}
+
+
+def test_sidecar(tmp_path):
+    path = str(tmp_path / "sidecar.data")
+    obj = Tracked(path=path, compact=True, sidecar=True)
+    obj.items = [1, 2]
+    obj._write_data()
+    assert Tracked(path=path, compact=True, sidecar=True).items == [1, 2]
+    assert (tmp_path / "sidecar.data.rcc").exists()
+    obj.items = [3]
+    obj._write_data()
+    assert Tracked(path=path, compact=True, sidecar=True).items == [3]
+
+
+def test_compact_type(tmp_path):
+    path = str(tmp_path / "gz.data")
+    obj = Tracked(path=path, compact=True, compact_type="gztar", compact_level=9)
+    obj.items = list(range(1000))
+    obj._write_data()
+    assert Tracked(path=path, compact=True).items == list(range(1000))
+    with pytest.raises(ValueError, match="between 0 and 9"):
+        Tracked(path=path, compact=True, compact_type="xztar", compact_level=10)
+    with pytest.raises(ValueError, match="sets the level"):
+        Tracked(path=path, compact=True, compact_type="auto", compact_level=9)
@@ -0,0 +1,41 @@
+import os
+import json
+
+from rcdata import ResourceIndex
+from rcdata.build import build_index, main
+
+
+def write_res(root, name, value):
+    path = root / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"data": {"name": value}}))
+    return path
+
+
+def test_build_index(tmp_path, capsys):
+    root = tmp_path / "res"
+    for name in ["a", "b", "sub/c"]:
+        write_res(root, f"{name}.resource", name)
+    (root / "notes.txt").write_text("not a resource")
+    path = str(tmp_path / "res.index")
+
+    assert build_index(path, workers=2) == {"added": 3, "changed": 0, "removed": 0, "unchanged": 0}
+    index = ResourceIndex(path)
+    assert index.file_list == ["a.resource", "b.resource", "sub/c.resource"]
+    assert index.get_res("sub/c.resource").name == "sub/c"
+    assert index.check_hash() == {}
+
+    changed = write_res(root, "b.resource", "bb")
+    st = changed.stat()
+    os.utime(changed, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    (root / "a.resource").unlink()
+    write_res(root, "d.resource", "d")
+    assert build_index(path, workers=0) == {"added": 1, "changed": 1, "removed": 1, "unchanged": 1}
+    index = ResourceIndex(path)
+    assert index.file_list == ["b.resource", "d.resource", "sub/c.resource"]
+    assert index.get_res("b.resource").name == "bb"
+    assert index.check_hash() == {}
+
+    main([path, "--workers", "0", "--hash", "sha512"])
+    assert "3 changed" in capsys.readouterr().out
+    assert ResourceIndex(path).file_hash["d.resource"].startswith("sha512:")
@@ -0,0 +1,361 @@
+import gc
+import os
+import json
+import marshal
+import threading
+import tracemalloc
+import warnings
+
+import pytest
+
+from rcdata.cache import parse_cache
+from rcdata import compress
+from rcdata.codec import get_codec
+from rcdata.digest import BLOCK_SIZE
+from rcdata.io import get_zstd_ctx, load, loads, read_header, scan, sync, sync_bytes, verify
+from rcdata.mc import CompactType, HashType, MicroCode
+from rcdata.selective import pick
+from rcdata.sidecar import sidecar_path
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_micro_code_round_trip(tmp_path, compact):
+    path = str(tmp_path / "data")
+    sync({"data": {"a": 1}}, path=path, compact=compact, micro_code=True, data_type=b"\x00\x01\x00")
+    mc = read_header(path)
+    assert mc.is_compact is compact
+    assert mc.compact_type == (CompactType.ZSTD if compact else MicroCode().compact_type)
+    assert mc.data_type == b"\x00\x01\x00"
+    assert mc.size + mc.payload_len == (tmp_path / "data").stat().st_size
+    # the header decides, not the caller
+    assert load(path, compact=not compact) == {"data": {"a": 1}}
+    assert loads((tmp_path / "data").read_bytes()) == {"data": {"a": 1}}
+
+
+def test_scan(tmp_path):
+    sync({}, path=str(tmp_path / "a"), micro_code=True)
+    sync({}, path=str(tmp_path / "b"))
+    with open(tmp_path / "a", "ab") as file:
+        file.write(b"junk")
+    result = {path[-1]: (mc is not None, intact) for path, mc, intact in scan(str(tmp_path))}
+    assert result == {"a": (True, False), "b": (False, True)}
+    with pytest.raises(ValueError):
+        load(str(tmp_path / "b"), micro_code=True)
+
+
+@pytest.mark.parametrize("micro_code", [False, True])
+@pytest.mark.parametrize("compact", [False, True])
+def test_stream_round_trip(tmp_path, compact, micro_code):
+    path = str(tmp_path / "data")
+    data = {"data": {str(i): list(range(i)) for i in range(200)}}
+    sync(data, path=path, compact=compact, micro_code=micro_code, stream=True)
+    assert load(path, compact=compact) == data
+    assert loads((tmp_path / "data").read_bytes(), compact=compact) == data
+
+
+def test_zstd_ctx_per_thread():
+    assert get_zstd_ctx(0, 3) is get_zstd_ctx(0, 3)
+    assert get_zstd_ctx(0, 3) is not get_zstd_ctx(0, 9)
+    other = []
+    thread = threading.Thread(target=lambda: other.append(get_zstd_ctx(0, 3)))
+    thread.start()
+    thread.join()
+    assert other[0] is not get_zstd_ctx(0, 3)
+
+
+@pytest.mark.parametrize("name", ["json", "marshal"])
+@pytest.mark.parametrize("compact", [False, True])
+def test_codec_round_trip(tmp_path, name, compact):
+    path = str(tmp_path / "data")
+    sync({"data": {"a": [1, 2]}}, path=path, compact=compact, codec=name)
+    # the codec is read from the micro code, or the file is plain json
+    assert load(path, compact=compact) == {"data": {"a": [1, 2]}}
+
+
+@pytest.mark.parametrize("name", ["orjson", "msgpack"])
+@pytest.mark.parametrize("compact", [False, True])
+def test_optional_codec(tmp_path, name, compact):
+    pytest.importorskip(name)
+    codec = get_codec(name, fallback=False)
+    path = str(tmp_path / "data")
+    doc = {"data": {"a": [1, 2], "b": {"c": "d"}}}
+    sync(doc, path=path, compact=compact, codec=name)
+    assert load(path, compact=compact) == doc
+    assert load(path, compact=compact, keys=["b"]) == {"data": {"b": {"c": "d"}}}
+    # the hash needs a micro code, which records the codec
+    sync(doc, path=path, compact=compact, codec=name, hash_type="sha256")
+    assert read_header(path).codec_id == codec.codec_id
+    assert load(path, compact=compact) == doc
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_load_leaves_no_open_file(tmp_path, compact):
+    path = str(tmp_path / "data")
+    sync({"data": {"a": 1}}, path=path, compact=compact)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ResourceWarning)
+        assert load(path, compact=compact) == {"data": {"a": 1}}
+        gc.collect()
+    assert [w for w in caught if issubclass(w.category, ResourceWarning)] == []
+
+
+def test_codec_fallback():
+    assert get_codec("msgpack").name in ["msgpack", "json"]
+    with pytest.raises(ValueError):
+        get_codec("yaml")
+
+
+def test_parse_cache(tmp_path):
+    path = str(tmp_path / "data")
+    sync({"data": {"a": 1}}, path=path, compact=True)
+    parse_cache.clear()
+    before = parse_cache.stats()
+    first = load(path, compact=True, cache=True)
+    first["data"]["a"] = 2  # callers get their own copy
+    assert load(path, compact=True, cache=True) == {"data": {"a": 1}}
+    sync({"data": {"a": 3}}, path=path, compact=True)
+    assert load(path, compact=True, cache=True) == {"data": {"a": 3}}
+    stats = parse_cache.stats()
+    assert stats["hits"] - before["hits"] == 1
+    assert stats["misses"] - before["misses"] == 2
+    assert stats["invalidations"] - before["invalidations"] == 1
+
+
+def test_sidecar(tmp_path):
+    path = str(tmp_path / "data")
+    sync({"data": {"a": 1, "b": "x"}}, path=path, compact=True)
+    assert load(path, compact=True, sidecar=True) == {"data": {"a": 1, "b": "x"}}
+    side = tmp_path / "data.rcc"
+    assert str(side) == sidecar_path(path) and side.exists()
+    # a valid sidecar is used instead of decoding the file
+    raw = side.read_bytes()
+    head = len(raw) - len(marshal.dumps({"data": {"a": 1, "b": "x"}}))
+    side.write_bytes(raw[:head] + marshal.dumps({"data": {"a": 2}}))
+    assert load(path, compact=True, sidecar=True) == {"data": {"a": 2}}
+    # other options get a new sidecar
+    assert load(path, compact=True, sidecar=True, keys=["b"]) == {"data": {"b": "x"}}
+    # same size and mtime, other content
+    st = os.stat(path)
+    sync({"data": {"a": 3, "b": "x"}}, path=path, compact=True)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert os.stat(path).st_size == st.st_size
+    assert load(path, compact=True, sidecar=True) == {"data": {"a": 3, "b": "x"}}
+    stats = dict()
+    assert load(path, compact=True, sidecar=True, stats=stats)["data"]["a"] == 3
+    assert "decode" not in stats and stats["bytes_read"] == st.st_size
+    # files with binary values are mapped instead
+    sync({"data": {"raw": b"123"}}, path=str(tmp_path / "blob"))
+    assert bytes(load(str(tmp_path / "blob"), sidecar=True)["data"]["raw"]) == b"123"
+    assert not (tmp_path / "blob.rcc").exists()
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("stream", [False, True])
+def test_hash_round_trip(tmp_path, compact, stream):
+    path = str(tmp_path / "data")
+    data = {"data": {"items": list(range(40000))}}
+    sync(data, path=path, compact=compact, stream=stream, hash_type="sha512")
+    mc = read_header(path)
+    assert mc.is_hash and mc.hash_type == HashType.SHA_512
+    assert mc.file_size == (tmp_path / "data").stat().st_size
+    assert load(path) == data
+    assert loads((tmp_path / "data").read_bytes()) == data
+    assert verify(path) == -(-mc.payload_len // BLOCK_SIZE)
+
+
+def test_rewrite_keeps_hash(tmp_path):
+    path = str(tmp_path / "data")
+    sync({"data": {"a": 1}}, path=path, hash_type="sha384")
+    sync({"data": {"a": 2}}, path=path, compact=True)
+    sync_bytes(b'{"data": {"a": 3}}', path=path)
+    mc = read_header(path)
+    assert mc.is_hash and mc.hash_type == HashType.SHA_384
+    assert load(path) == {"data": {"a": 3}} and verify(path) == 1
+    sync({"data": {"a": 4}}, path=path, hash_type=None)
+    assert read_header(path) is None
+
+
+def test_hash_mismatch(tmp_path):
+    path = str(tmp_path / "data")
+    sync({"data": {"items": list(range(40000))}}, path=path, hash_type="sha256")
+    mc = read_header(path)
+    assert mc.payload_len > 2 * BLOCK_SIZE
+    with open(path, "r+b") as file:
+        file.seek(mc.size + BLOCK_SIZE + 10)
+        file.write(b"9")
+    with pytest.raises(ValueError, match="block 1"):
+        load(path)
+    with pytest.raises(ValueError, match="block 1"):
+        loads((tmp_path / "data").read_bytes())
+    # only the blocks holding the range are read
+    assert verify(path, 0, BLOCK_SIZE) == 1
+    with pytest.raises(ValueError, match="block 1"):
+        verify(path, BLOCK_SIZE, BLOCK_SIZE + 1)
+
+
+def test_pick():
+    text = (
+        '{"version": 0, "data": {"skip": {"x": ["}", "\\\\"]}, "a\\u0062": [1, {"c": null}],'
+        ' "n": -1.5e3, "s": "\\"q\\"", "late": broken'
+    )
+    expected = {"ab": [1, {"c": None}], "n": -1500.0, "s": '"q"'}
+    assert pick(text, ["ab", "n", "s"]) == {"data": expected}
+    assert pick('{"data": {}}', ["a"]) == {"data": {}}
+    with pytest.raises(ValueError):
+        pick('{"data": {"a" 1}}', ["a"])
+    with pytest.raises(ValueError):
+        pick('{"data": {"skip": [1, "open], "a": 1}}', ["a"])
+
+
+def test_pick_skips_without_decoding(monkeypatch):
+    from rcdata import selective
+
+    decoded = []
+
+    class Spy(json.JSONDecoder):
+        def raw_decode(self, s, idx=0):
+            value, end = super().raw_decode(s, idx)
+            decoded.append(value)
+            return value, end
+
+    monkeypatch.setattr(selective, "_decoder", Spy())
+    deep = {"x": [{"y": {"z": [i, "s\\\"]", None]}} for i in range(2000)]}
+    # the skipped values are not even valid json, only their brackets are balanced
+    text = (
+        '{"data": {"deep": %s, "bad": [1 2 {"k" "v"}], "s": "%s", "flat": %s, "a": [1]}}'
+        % (json.dumps(deep), "x" * 100000, json.dumps(list(range(5000))))
+    )
+    tracemalloc.start()
+    try:
+        assert pick(text, ["a"]) == {"data": {"a": [1]}}
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert decoded == [[1]]
+    assert peak < len(text) // 10
+
+
+@pytest.mark.parametrize("codec", ["json", "marshal"])
+@pytest.mark.parametrize("compact", [False, True])
+def test_load_keys(tmp_path, codec, compact):
+    path = str(tmp_path / "data")
+    doc = {"data": {"a": 1, "big": ["x" * 10] * 1000, "b": {"c": [2]}}}
+    sync(doc, path=path, compact=compact, codec=codec)
+    assert load(path, compact=compact, keys=["a", "b"]) == {"data": {"a": 1, "b": {"c": [2]}}}
+    buffer = (tmp_path / "data").read_bytes()
+    assert loads(buffer, compact=compact, keys=["missing"]) == {"data": {}}
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("hash_type", [None, "sha256"])
+def test_blobs(tmp_path, compact, hash_type):
+    path = str(tmp_path / "data")
+    doc = {"data": {"a": 1, "raw": b"\x00\x01" * 1000, "empty": bytearray()}}
+    sync(doc, path=path, compact=compact, hash_type=hash_type)
+    mc = read_header(path)
+    assert mc.blob_len == 2000 and mc.file_size == (tmp_path / "data").stat().st_size
+    for data in [load(path), load(path, keys=["raw"]), loads((tmp_path / "data").read_bytes())]:
+        assert data["data"]["raw"] == doc["data"]["raw"]
+        assert isinstance(data["data"]["raw"], memoryview)
+    assert load(path)["data"]["empty"] == b""
+
+
+def test_blob_mismatch(tmp_path):
+    path = str(tmp_path / "data")
+    sync({"data": {"raw": b"abc"}}, path=path, hash_type="sha256")
+    with open(path, "r+b") as file:
+        file.seek(-1, 2)
+        file.write(b"d")
+    with pytest.raises(ValueError, match="blob raw"):
+        load(path)
+    sync({"data": {"raw": b"abc"}}, path=path, hash_type=None)
+    with open(path, "r+b") as file:
+        file.seek(-1, 2)
+        file.write(b"d")
+    assert load(path)["data"]["raw"] == b"abd"
+
+
+@pytest.mark.parametrize("name", compress.list_compressors())
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("hash_type", [None, "sha256"])
+def test_compact_types(tmp_path, name, stream, hash_type):
+    path = str(tmp_path / "data")
+    doc = {"data": {"items": list(range(20000))}}
+    sync(
+        doc,
+        path=path,
+        compact=True,
+        compact_type=name,
+        stream=stream,
+        hash_type=hash_type,
+        micro_code=True,
+    )
+    mc = read_header(path)
+    assert mc.compact_type is CompactType[name.upper()]
+    assert load(path) == doc
+    assert load(path, stats={}) == doc
+    assert loads((tmp_path / "data").read_bytes()) == doc
+
+
+def test_compact_levels(tmp_path):
+    path = str(tmp_path / "data")
+    doc = {"data": {"items": [i % 7 for i in range(100000)]}}
+    sizes = []
+    for level in [1, 19]:
+        sync(doc, path=path, compact=True, level=level)
+        sizes.append((tmp_path / "data").stat().st_size)
+    assert sizes[1] < sizes[0]
+    with pytest.raises(ValueError, match="between 1 and 9"):
+        sync(doc, path=path, compact=True, compact_type="bztar", level=0)
+    with pytest.raises(ValueError, match="unknown compact type"):
+        sync(doc, path=path, compact=True, compact_type="rar")
+    with pytest.raises(ValueError, match="dictionary"):
+        sync(doc, path=path, compact=True, compact_type="zip", dict_data=b"x")
+
+
+def test_zstd_threads(tmp_path):
+    path = str(tmp_path / "data")
+    doc = {"data": {"items": [str(i) for i in range(300000)]}}
+    sync(doc, path=path, compact=True, threads=2)
+    assert len(json.dumps(doc)) > compress.THREADS_MIN_SIZE
+    assert load(path, compact=True) == doc
+
+
+def test_auto_compact(tmp_path):
+    path = str(tmp_path / "data")
+    profile = {
+        "rules": [
+            {"max_size": 100, "type": "tar"},
+            {"max_size": None, "type": "xztar", "level": 1},
+        ]
+    }
+    compress.set_profile(profile)
+    try:
+        for items, expected in [([1], CompactType.TAR), (list(range(1000)), CompactType.XZTAR)]:
+            doc = {"data": {"items": items}}
+            sync(doc, path=path, compact=True, compact_type="auto")
+            assert read_header(path).compact_type is expected
+            assert load(path) == doc
+    finally:
+        compress.set_profile(None)
+    assert compress.choose(10) == ("zstd", 1, 0)
+    with pytest.raises(ValueError, match="sets the level"):
+        sync({"data": {}}, path=path, compact=True, compact_type="auto", level=9)
+
+
+def test_benchmark_profile(tmp_path):
+    samples = compress.sample_payloads([1000, 100000])
+    candidates = [("zstd", 1), ("tar", 0)]
+    # with instant storage nothing is worth compressing
+    profile = compress.benchmark(samples, 1e12, candidates)
+    assert profile["rules"] == [{"max_size": None, "type": "tar", "level": 0}]
+    profile = compress.benchmark(samples, 0.001, candidates)
+    assert profile["rules"][-1]["type"] == "zstd"
+    path = str(tmp_path / "profile.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(profile, file)
+    compress.set_profile(path)
+    try:
+        assert compress.choose(None)[0] == "zstd"
+    finally:
+        compress.set_profile(None)
@@ -0,0 +1,223 @@
+import os
+import hashlib
+import asyncio
+import mmap
+
+import pytest
+
+from rcdata import Field, Resource, ResourceIndex
+from rcdata.codec import get_codec
+from rcdata.io import encrypt, get_dict_id, load, new_key, read_header, sync
+from rcdata.mc import HashType
+from rcdata.pack import pack, pack_index, unpack
+from rcdata.sign import MIN_BATCH, Signer, get_signer
+
+
+def test_load_all(make_index):
+    index = ResourceIndex(make_index(["a", "b"]))
+    assert index.get_res("a.resource").name == "a"
+    assert index.get_res("b.resource").name == "b"
+
+
+def test_lazy_cache(make_index):
+    index = ResourceIndex(make_index(["a", "b", "c"]), lazy=True, cache_size=2)
+    assert index.res_dict == {}
+    for name in ["a", "b", "c", "c"]:
+        assert index.get_res(f"{name}.resource").name == name
+    stats = index.res_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+    assert "a.resource" not in index.res_cache
+
+
+def test_parallel_load(tmp_path, make_index):
+    path = make_index(["a", "b", "c"])
+    (tmp_path / "res" / "c.resource").write_text("{broken")
+    for executor in ["thread", "process"]:
+        index = ResourceIndex(path, workers=2, executor=executor)
+        assert sorted(index.res_dict) == ["a.resource", "b.resource"]
+        assert list(index.res_errors) == ["c.resource"]
+        assert isinstance(index.res_errors["c.resource"], ValueError)
+
+
+def test_archive(tmp_path, make_index):
+    path = make_index(["a", "b"])
+    assert pack_index(path) == 2
+    for lazy in [True, False]:
+        index = ResourceIndex(path, lazy=lazy, archive=True)
+        assert index.get_res("b.resource").name == "b"
+    assert unpack(str(tmp_path / "res.pack"), str(tmp_path / "out")) == 2
+    assert (tmp_path / "out" / "a.resource").read_bytes() == (
+        tmp_path / "res" / "a.resource"
+    ).read_bytes()
+
+
+def test_unpack_outside_root(tmp_path):
+    (tmp_path / "res" / "link").mkdir(parents=True)
+    (tmp_path / "res" / "link" / "evil.resource").write_text("{}")
+    (tmp_path / "evil.resource").write_text("{}")
+    out, outside = tmp_path / "out", tmp_path / "outside"
+    out.mkdir()
+    outside.mkdir()
+    (out / "link").symlink_to(outside, target_is_directory=True)
+    evil = str(tmp_path / "evil.resource")
+    for name in ["../evil.resource", evil, "link/evil.resource"]:
+        archive = str(tmp_path / "evil.pack")
+        pack(str(tmp_path / "res"), [name], archive)
+        with pytest.raises(ValueError, match="unsafe entry name"):
+            unpack(archive, str(out))
+        assert os.listdir(outside) == [] and sorted(os.listdir(out)) == ["link"]
+    assert sorted(os.listdir(tmp_path)) == ["evil.pack", "evil.resource", "out", "outside", "res"]
+
+
+def test_train_dict(tmp_path):
+    names = [f"{i}.cresource" for i in range(200)]
+    (tmp_path / "res").mkdir()
+    for i, name in enumerate(names):
+        data = {"data": {"name": name, "size": i, "tags": ["a", "b"], "owner": "someone"}}
+        sync(data, path=str(tmp_path / "res" / name), compact=True, micro_code=i % 2 == 0)
+    path = str(tmp_path / "res.index")
+    sync({"data": {"file_list": names}}, path=path)
+    before = sum(f.stat().st_size for f in (tmp_path / "res").iterdir())
+    index = ResourceIndex(path, lazy=True)
+    dict_data = index.train_dict(size=1024)
+    assert (tmp_path / "res.dict").read_bytes() == dict_data
+    assert sum(f.stat().st_size for f in (tmp_path / "res").iterdir()) < before
+    index = ResourceIndex(path)
+    assert index.res_errors == {}
+    assert index.get_res("7.cresource").name == "7.cresource"
+
+
+def test_async_load(tmp_path, make_index):
+    path = make_index(["a", "b", "c"])
+    (tmp_path / "res" / "c.resource").write_text("{broken")
+
+    async def main():
+        index = await ResourceIndex.aload(path, lazy=True)
+        assert (await index.aget_res("a.resource")).name == "a"
+        await index.aload_res(limit=2)
+        return index
+
+    index = asyncio.run(main())
+    assert sorted(index.res_dict) == ["a.resource", "b.resource"]
+    assert list(index.res_errors) == ["c.resource"]
+
+
+def test_check_hash(tmp_path, make_index):
+    index = ResourceIndex(make_index(["a", "b", "c"]), lazy=True)
+    assert index.check_hash() == {}
+    file_hash = index.update_hash(workers=2)
+    assert sorted(file_hash) == ["a.resource", "b.resource", "c.resource"]
+    assert file_hash["a.resource"].startswith("sha256:")
+    assert index.check_hash(workers=2) == {}
+    (tmp_path / "res" / "b.resource").write_text("{}")
+    (tmp_path / "res" / "c.resource").unlink()
+    assert index.check_hash() == {
+        "b.resource": "sha256:" + hashlib.sha256(b"{}").hexdigest(),
+        "c.resource": None,
+    }
+
+
+def test_signed_resources(tmp_path, make_index):
+    private_key, public_key = new_key()
+    _, other_key = new_key()
+    path = make_index(["a", "b", "c"])
+    root = tmp_path / "res"
+    for name in ["a", "b"]:
+        data = {"data": {"name": name}}
+        sync(data, path=str(root / f"{name}.resource"), encrypt=True, key=private_key)
+    index = ResourceIndex(path, public_key, lazy=True)
+    assert index.get_res("a.resource").name == "a"
+    assert index.check_signatures() == {"c.resource": "unsigned"}
+    assert index.check_signatures(other_key) == {
+        "a.resource": "mismatch",
+        "b.resource": "mismatch",
+        "c.resource": "unsigned",
+    }
+    with pytest.raises(ValueError, match="signature mismatch"):
+        ResourceIndex(path, other_key, lazy=True).get_res("a.resource")
+    with pytest.raises(ValueError, match="missing signature"):
+        index.get_res("c.resource")
+
+
+def test_train_dict_keeps_settings(tmp_path):
+    private_key, public_key = new_key()
+    names = [f"{i}.cresource" for i in range(50)]
+    (tmp_path / "res").mkdir()
+    for i, name in enumerate(names):
+        data = {"data": {"name": name, "tags": ["a", "b"] * 5}}
+        options = dict(encrypt=True, key=private_key) if i % 2 else dict(hash_type="sha384")
+        sync(data, path=str(tmp_path / "res" / name), compact=True, codec="marshal", **options)
+    path = str(tmp_path / "res.index")
+    sync({"data": {"file_list": names}}, path=path)
+    before = {name: (tmp_path / "res" / name).read_bytes() for name in names}
+    with pytest.raises(ValueError, match="needs the private key"):
+        ResourceIndex(path, public_key, lazy=True).train_dict(size=1024)
+    assert not (tmp_path / "res.dict").exists()
+    assert {name: (tmp_path / "res" / name).read_bytes() for name in names} == before
+    assert sorted(os.listdir(tmp_path / "res")) == sorted(names)
+
+    dict_data = ResourceIndex(path, private_key, lazy=True).train_dict(size=1024)
+    for i, name in enumerate(names):
+        mc = read_header(str(tmp_path / "res" / name))
+        assert (mc.dict_id, mc.codec_id) == (get_dict_id(dict_data), get_codec("marshal").codec_id)
+        assert mc.is_encrypt == bool(i % 2)
+        assert mc.hash_type == (HashType.SHA_256 if i % 2 else HashType.SHA_384)
+    index = ResourceIndex(path, public_key, lazy=True)
+    assert index.check_signatures() == {name: "unsigned" for name in names[::2]}
+    assert index.get_res("1.cresource").name == "1.cresource"
+
+
+def test_train_dict_binary(tmp_path):
+    names = [f"{i}.cresource" for i in range(50)]
+    (tmp_path / "res").mkdir()
+    for i, name in enumerate(names):
+        data = {"data": {"name": name, "raw": bytes([i]) * 100}}
+        sync(data, path=str(tmp_path / "res" / name), compact=True)
+    path = str(tmp_path / "res.index")
+    sync({"data": {"file_list": names}}, path=path)
+    ResourceIndex(path, lazy=True).train_dict(size=1024)
+    index = ResourceIndex(path)
+    assert index.res_errors == {}
+    doc = load(str(tmp_path / "res" / "7.cresource"), dict_data=index.dict_data)
+    assert (doc["data"]["name"], doc["data"]["raw"]) == ("7.cresource", bytes([7]) * 100)
+
+
+def test_signer_batches():
+    private_key, public_key = new_key()
+    signer = Signer(private_key)
+    messages = [str(i).encode() for i in range(MIN_BATCH * 2)]
+    signatures = signer.sign_many(messages, workers=4)
+    verifier = get_signer(public_key)
+    assert verifier is get_signer(public_key)
+    assert verifier.fingerprint == signer.fingerprint
+    assert all(verifier.verify_many(list(zip(messages, signatures)), workers=4))
+    assert verifier.verify_many([(b"x", signatures[0])]) == [False]
+    with pytest.raises(ValueError):
+        verifier.sign(b"x")
+    assert len(encrypt(b"x", private_key, public_key)) == 64
+
+
+class Image(Resource):
+    pixels = Field(b"", bytes)
+
+
+def test_binary_field(tmp_path):
+    path = str(tmp_path / "img.resource")
+    image = Image(path)
+    image.pixels = bytes(range(256)) * 100
+    image.name = "img"
+    image._write_data()
+    raw = (tmp_path / "img.resource").read_bytes()
+    assert bytes(range(256)) * 100 in raw
+
+    image = Image(path)
+    assert isinstance(image.pixels, memoryview) and image.pixels.readonly
+    assert isinstance(image.pixels.obj, mmap.mmap)
+    assert image.pixels == bytes(range(256)) * 100
+    # the views stay valid when the file is replaced
+    image.name = "renamed"
+    image._write_data()
+    assert Image(path).pixels == image.pixels
+
+    image = Image(path, buffer=memoryview(raw))
+    assert image.pixels.obj is raw
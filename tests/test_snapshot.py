@@ -0,0 +1,98 @@
+import gc
+import multiprocessing
+
+import pytest
+
+from rcdata import BaseData, Field, ResourceIndex
+from rcdata.snapshot import Snapshot, dumps, index_records
+
+
+class Blob(BaseData):
+    name = Field("", str)
+    content = Field(b"", bytes)
+
+
+def read_snapshot(name, queue):
+    try:
+        snapshot = Snapshot.attach(name)
+        res = snapshot.get_res("bb.resource")
+        queue.put((len(snapshot), res.name, snapshot.index.file_list[0]))
+        del res
+        snapshot.close()
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        queue.put(e)
+
+
+def test_shared_memory(make_index):
+    index = ResourceIndex(make_index(["a", "bb", "ccc"]))
+    snapshot = Snapshot.create(index_records(index))
+    try:
+        assert list(snapshot) == ["", "a.resource", "bb.resource", "ccc.resource"]
+        assert snapshot.index.file_list == index.file_list
+        assert snapshot.get_res("ccc.resource").name == "ccc"
+        assert "d.resource" not in snapshot
+        with pytest.raises(KeyError):
+            snapshot.get("d.resource")
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            queue = context.Queue()
+            workers = [
+                context.Process(target=read_snapshot, args=(snapshot.name, queue))
+                for _ in range(2)
+            ]
+            for worker in workers:
+                worker.start()
+            results = [queue.get(timeout=30) for _ in workers]
+            for worker in workers:
+                worker.join()
+            assert results == [(4, "bb", "a.resource")] * 2
+        gc.collect()
+    finally:
+        snapshot.close()
+        snapshot.unlink()
+
+
+def test_unlink_closes(monkeypatch):
+    from multiprocessing import shared_memory
+
+    snapshot = Snapshot.create({"x": Blob(name="x")})
+    snapshot.close()
+    handles = []
+    unlink = shared_memory.SharedMemory.unlink
+
+    def record(shm):
+        handles.append(shm)
+        unlink(shm)
+
+    monkeypatch.setattr(shared_memory.SharedMemory, "unlink", record)
+    snapshot.unlink()
+    # the handle opened to remove the segment is closed, not left to the gc
+    assert len(handles) == 1 and handles[0].buf is None
+    with pytest.raises(FileNotFoundError):
+        Snapshot.attach(snapshot.name)
+
+
+def test_file_views(tmp_path):
+    path = str(tmp_path / "snap" / "blobs.snapshot")
+    records = {"x": Blob(name="x", content=b"\x00" * 100), "y": Blob(name="y")}
+    snapshot = Snapshot.save(records, path)
+    assert (tmp_path / "snap" / "blobs.snapshot").read_bytes() == dumps(records)
+    view = snapshot.get("x")
+    assert isinstance(view.content, memoryview) and view.content.readonly
+    assert (view.name, bytes(view.content)) == ("x", b"\x00" * 100)
+    assert snapshot["y"].to_dict() == {"name": "y", "content": b""}
+    with pytest.raises(AttributeError, match="read-only"):
+        view.name = "z"
+    with pytest.raises(AttributeError):
+        view.missing
+    del view
+    snapshot.close()
+    with Snapshot.open(path) as snapshot:
+        assert snapshot.get("y").name == "y"
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / "other"
+    path.write_bytes(b"{}" * 8)
+    with pytest.raises(ValueError, match="not a snapshot"):
+        Snapshot.open(str(path))
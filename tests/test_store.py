@@ -0,0 +1,132 @@
+import os
+import threading
+
+import pytest
+
+from rcdata import BaseData, Field
+from rcdata.store import LogStore
+
+
+class User(BaseData):
+    name = Field("", str)
+    score = Field(0, int)
+
+
+def test_put_get_delete(tmp_path):
+    path = str(tmp_path / "users.log")
+    with LogStore(path, User) as store:
+        store.put("a", User(name="a", score=1))
+        store.put("b", User(name="b"))
+        store.put("a", User(name="a", score=2))
+        assert store.delete("b") and not store.delete("missing")
+        assert (store.get("a").score, store.get("b")) == (2, None)
+        assert sorted(store) == ["a"]
+        size = os.path.getsize(path)
+        assert store.stats()["dead"] > 0
+
+    # the index is rebuilt from the log
+    with LogStore(path, User) as store:
+        assert (len(store), store.get("a").name, store.get("a").score) == (1, "a", 2)
+        assert store.compact() > 0
+        assert os.path.getsize(path) < size
+        assert store.stats()["dead"] == 0
+        assert store.get("a").score == 2
+
+
+def test_recover_partial_record(tmp_path):
+    path = str(tmp_path / "users.log")
+    with LogStore(path, User) as store:
+        store.put("a", User(score=1))
+        store.put("b", User(score=2))
+    size = os.path.getsize(path)
+    with open(path, "r+b") as file:
+        file.truncate(size - 3)
+    with LogStore(path, User) as store:
+        assert store.recovered > 0
+        assert (sorted(store), store.get("a").score) == (["a"], 1)
+        store.put("b", User(score=3))
+    with LogStore(path, User) as store:
+        assert (store.recovered, store.get("b").score) == (0, 3)
+
+
+def test_corrupt_record(tmp_path):
+    path = str(tmp_path / "users.log")
+    with LogStore(path, User) as store:
+        for score in range(1, 4):
+            store.put(f"u{score}", User(score=score))
+    raw = bytearray((tmp_path / "users.log").read_bytes())
+    # a whole last record with a bad crc is cut off like a partial one
+    torn = bytearray(raw)
+    torn[torn.rfind(b'"score": 3') + 10] ^= 0xFF
+    (tmp_path / "users.log").write_bytes(torn)
+    with LogStore(path, User) as store:
+        assert store.recovered > 0 and sorted(store) == ["u1", "u2"]
+    # records after a corrupt one are not dropped
+    raw[raw.find(b'"score": 2') + 10] ^= 0xFF
+    (tmp_path / "users.log").write_bytes(raw)
+    with pytest.raises(ValueError, match="corrupt record"):
+        LogStore(path, User)
+    assert (tmp_path / "users.log").read_bytes() == raw
+
+
+def test_background_compaction(tmp_path):
+    path = str(tmp_path / "users.log")
+    store = LogStore(path, User, compact_ratio=0.5, min_compact_size=4096)
+
+    def update(prefix):
+        for i in range(2000):
+            store.put(f"{prefix}{i % 10}", User(name=prefix, score=i))
+
+    threads = [threading.Thread(target=update, args=(p,)) for p in "xy"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+    assert store.error is None and store.compactions > 0
+    with LogStore(path, User) as store:
+        assert len(store) == 20
+        assert {store.get(f"x{i}").score for i in range(10)} == set(range(1990, 2000))
+
+
+def test_concurrent_compaction(tmp_path):
+    path = str(tmp_path / "users.log")
+    store = LogStore(path, User, compact_ratio=0.5, min_compact_size=4096)
+    done = threading.Event()
+    errors = []
+
+    def update():
+        try:
+            for i in range(2000):
+                store.put(f"x{i % 10}", User(name="x", score=i))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            errors.append(e)
+        finally:
+            done.set()
+
+    def compact():
+        while not done.is_set():
+            try:
+                store.compact()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=update)]
+    threads += [threading.Thread(target=compact) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+    assert not errors and store.error is None and store.compactions > 2
+    assert os.listdir(tmp_path) == ["users.log"]
+    with LogStore(path, User) as store:
+        assert {store.get(f"x{i}").score for i in range(10)} == set(range(1990, 2000))
+
+
+def test_not_a_log(tmp_path):
+    path = tmp_path / "other"
+    path.write_bytes(b"{}")
+    with pytest.raises(ValueError, match="not a log store"):
+        LogStore(str(path), User)